@@ -0,0 +1,456 @@
+"""Realized PnL analytics over the trade log.
+
+    python3 -m analytics.trade_log summary
+    python3 -m analytics.trade_log pairs | days | top | trade <trade_id>
+    python3 -m analytics.trade_log bench --trades 1000000
+
+The log is append-only, so aggregates are materialized once and then kept
+current by reading only the bytes appended since the last update. Each new
+row updates the per-trade, per-pair, per-day and total aggregates in O(1).
+The aggregates and the log offset are snapshotted to TRADE_STATS_FILE, so a
+restart reads the snapshot and the tail instead of the whole log.
+
+PnL is gross: leg quantity times the move between the logged open and close
+prices, without fees or funding.
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import logging
+import tempfile
+from datetime import datetime, date
+from collections import OrderedDict
+import numpy as np
+from config.config import *
+from orders.pear import basket_label
+
+logger = logging.getLogger(__name__)
+
+HEADER = "timestamp,trade_id,trade_type,symbol1,qty1,price1,symbol2,qty2,price2"
+SNAPSHOT_VERSION = 1
+READ_CHUNK = 16 * 2**20
+TAIL_CHECK_BYTES = 256
+RECENT_TRADES = 1024  # Closed trades still accepting close rows (one per basket leg pairing)
+
+def parse_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+def leg_pnl(leg, qty, price):
+    # A logged price may be missing ('None') when the price request failed; that leg then adds nothing
+    price = parse_float(price)
+    if price is None or leg[1] is None:
+        return 0.0
+    return math.copysign(float(qty), leg[0]) * (price - leg[1])
+
+def parse_timestamp(value):
+    return datetime.fromisoformat(value).timestamp()
+
+class ClosedTrades:
+    """Closed trades as growable columns, so a million of them stay compact and
+    lookups or rankings are single vectorised passes."""
+
+    COLUMNS = {'trade_id': 'S36', 'pair': np.int32, 'direction': np.int8,
+               'open_ts': np.float64, 'close_ts': np.float64, 'pnl': np.float64}
+
+    def __init__(self, columns=None):
+        if columns is None:
+            columns = {name: np.empty(0, dtype=dtype) for name, dtype in self.COLUMNS.items()}
+        self.size = len(columns['pnl'])
+        self.columns = columns
+
+    def __len__(self):
+        return self.size
+
+    def append(self, trade_id, pair, direction, open_ts, close_ts):
+        if self.size == len(self.columns['pnl']):
+            capacity = max(1024, self.size * 2)
+            for name, column in self.columns.items():
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[:self.size] = column[:self.size]
+                self.columns[name] = grown
+        row = self.size
+        columns = self.columns
+        columns['trade_id'][row] = trade_id.encode()
+        columns['pair'][row] = pair
+        columns['direction'][row] = direction
+        columns['open_ts'][row] = open_ts
+        columns['close_ts'][row] = close_ts
+        columns['pnl'][row] = 0.0
+        self.size += 1
+        return row
+
+    def view(self, name):
+        return self.columns[name][:self.size]
+
+    def find(self, trade_id):
+        rows = np.flatnonzero(self.view('trade_id') == trade_id.encode())
+        return int(rows[-1]) if len(rows) else None
+
+class TradeStats:
+    def __init__(self, log_path=TRADE_LOG_FILE, snapshot_path=TRADE_STATS_FILE):
+        self.log_path = log_path
+        self.snapshot_path = snapshot_path
+        self.offset = 0
+        self.unsaved_rows = 0
+        self.skipped_rows = 0
+        self.unmatched_closes = 0
+        # trade_id -> [direction, open_ts, {symbol: (signed qty, price)}, base symbols, quote symbols]
+        self.open = {}
+        # trade_id -> [row, legs, pair index, day] for trades whose close rows may still be arriving
+        self.recent = OrderedDict()
+        self.closed = ClosedTrades()
+        self.pairs = []  # pair labels, indexed by ClosedTrades 'pair'
+        self.pair_index = {}
+        self.pair_keys = {}  # (quote symbols, base symbols) -> pair index
+        self.by_pair = []  # per pair index: [pnl, trades, wins, holding seconds]
+        self.by_day = {}  # 'YYYY-MM-DD' of the close -> [pnl, trades, wins]
+        self.trades = 0
+        self.wins = 0
+        self.pnl = 0.0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.holding = 0.0
+
+    # Incremental maintenance
+
+    def update(self):
+        """Apply rows appended to the log since the last call; returns how many were applied."""
+        if not os.path.exists(self.log_path):
+            return 0
+        size = os.path.getsize(self.log_path)
+        if size < self.offset:
+            logger.warning("%s shrank; rebuilding trade statistics", self.log_path)
+            self.__init__(self.log_path, self.snapshot_path)
+        if size == self.offset:
+            return 0
+        applied = 0
+        with open(self.log_path, 'rb') as f:
+            f.seek(self.offset)
+            pending = b''
+            while True:
+                chunk = f.read(READ_CHUNK)
+                if not chunk:
+                    break
+                data = pending + chunk
+                end = data.rfind(b'\n') + 1  # A partly written last line waits for the next update
+                pending = data[end:]
+                applied += self.apply_lines(data[:end].decode())
+                self.offset += end
+        self.unsaved_rows += applied
+        if self.unsaved_rows >= TRADE_STATS_SAVE_ROWS:
+            self.save()
+        return applied
+
+    def apply_lines(self, text):
+        applied = 0
+        for line in text.splitlines():
+            fields = line.split(',')
+            if len(fields) != 9 or fields[0] == 'timestamp':
+                if line and fields[0] != 'timestamp':
+                    self.skipped_rows += 1
+                continue
+            try:
+                self.apply_row(fields)
+                applied += 1
+            except ValueError:
+                self.skipped_rows += 1
+        return applied
+
+    def apply_row(self, fields):
+        timestamp, trade_id, trade_type, symbol1, qty1, price1, symbol2, qty2, price2 = fields
+        if trade_type == 'CLOSE':
+            recent = self.recent.get(trade_id)
+            if recent is None:
+                trade = self.open.pop(trade_id, None)
+                if trade is None:
+                    self.unmatched_closes += 1
+                    return
+                recent = self.close_trade(trade_id, trade, timestamp)
+            row, legs, pair, day = recent
+            delta = 0.0
+            leg = legs.get(symbol1)
+            if leg is not None:
+                delta += leg_pnl(leg, qty1, price1)
+            leg = legs.get(symbol2)
+            if leg is not None:
+                delta += leg_pnl(leg, qty2, price2)
+            if delta:
+                pnl = self.closed.columns['pnl']
+                old = float(pnl[row])
+                self.set_pnl(pair, day, old, old + delta)
+                pnl[row] = old + delta
+        elif trade_type in ('LONG', 'SHORT'):
+            trade = self.open.get(trade_id)
+            if trade is None:
+                trade = self.open[trade_id] = [1 if trade_type == 'LONG' else -1, parse_timestamp(timestamp), {}, [], []]
+            # A long sells the symbol1 (base) legs and buys the symbol2 (quote) legs
+            direction, legs = trade[0], trade[2]
+            if symbol1:
+                legs[symbol1] = (-direction * float(qty1), parse_float(price1))
+                trade[3].append(symbol1)
+            if symbol2:
+                legs[symbol2] = (direction * float(qty2), parse_float(price2))
+                trade[4].append(symbol2)
+
+    def close_trade(self, trade_id, trade, timestamp):
+        # The first close row of a trade fixes its pair, close time and day; PnL follows per row
+        direction, open_ts, legs, base, quote = trade
+        close_ts = parse_timestamp(timestamp)
+        key = (tuple(quote), tuple(base))
+        pair = self.pair_keys.get(key)
+        if pair is None:
+            pair = self.pair_keys[key] = self.pair_id(basket_label(quote, base))
+        day = timestamp[:10]
+        row = self.closed.append(trade_id, pair, direction, open_ts, close_ts)
+        holding = close_ts - open_ts
+        self.trades += 1
+        self.holding += holding
+        stats = self.by_pair[pair]
+        stats[1] += 1
+        stats[3] += holding
+        day_stats = self.by_day.get(day)
+        if day_stats is None:
+            day_stats = self.by_day[day] = [0.0, 0, 0]
+        day_stats[1] += 1
+        recent = self.recent[trade_id] = [row, legs, pair, day]
+        if len(self.recent) > RECENT_TRADES:
+            self.recent.popitem(last=False)
+        return recent
+
+    def pair_id(self, label):
+        pair = self.pair_index.get(label)
+        if pair is None:
+            pair = self.pair_index[label] = len(self.pairs)
+            self.pairs.append(label)
+            self.by_pair.append([0.0, 0, 0, 0.0])
+        return pair
+
+    def set_pnl(self, pair, day, old, new):
+        # A basket's PnL arrives one close row at a time, so its win and gross contributions are swapped, not added
+        win = (new > 0) - (old > 0)
+        self.pnl += new - old
+        self.wins += win
+        self.gross_profit += max(new, 0.0) - max(old, 0.0)
+        self.gross_loss += min(new, 0.0) - min(old, 0.0)
+        for stats in (self.by_pair[pair], self.by_day[day]):
+            stats[0] += new - old
+            stats[2] += win
+
+    # Snapshot
+
+    def tail_check(self, f):
+        start = max(0, self.offset - TAIL_CHECK_BYTES)
+        f.seek(start)
+        return f.read(self.offset - start).hex()
+
+    def save(self):
+        meta = {
+            'version': SNAPSHOT_VERSION, 'offset': self.offset, 'skipped_rows': self.skipped_rows,
+            'unmatched_closes': self.unmatched_closes, 'open': self.open,
+            'recent': [[trade_id] + recent for trade_id, recent in self.recent.items()],
+            'pairs': self.pairs, 'by_pair': self.by_pair, 'by_day': self.by_day,
+            'totals': [self.trades, self.wins, self.pnl, self.gross_profit, self.gross_loss, self.holding],
+        }
+        with open(self.log_path, 'rb') as f:
+            meta['tail'] = self.tail_check(f)
+        columns = {name: self.closed.view(name) for name in ClosedTrades.COLUMNS}
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), **columns)
+        os.replace(tmp_path, self.snapshot_path)
+        self.unsaved_rows = 0
+
+    @classmethod
+    def load(cls, log_path=TRADE_LOG_FILE, snapshot_path=TRADE_STATS_FILE):
+        """Statistics from the snapshot, or None if it is missing or no longer matches the log."""
+        if not os.path.exists(snapshot_path) or not os.path.exists(log_path):
+            return None
+        try:
+            with np.load(snapshot_path, allow_pickle=False) as data:
+                meta = json.loads(str(data['meta']))
+                columns = {name: data[name] for name in ClosedTrades.COLUMNS}
+        except (OSError, ValueError, KeyError) as e:
+            logger.error("Could not read %s: %s", snapshot_path, e)
+            return None
+        if meta.get('version') != SNAPSHOT_VERSION:
+            return None
+        stats = cls(log_path, snapshot_path)
+        stats.offset = meta['offset']
+        with open(log_path, 'rb') as f:
+            if os.path.getsize(log_path) < stats.offset or stats.tail_check(f) != meta['tail']:
+                logger.info("%s does not match %s; rebuilding trade statistics", snapshot_path, log_path)
+                return None
+        stats.skipped_rows = meta['skipped_rows']
+        stats.unmatched_closes = meta['unmatched_closes']
+        stats.open = {trade_id: [t[0], t[1], {s: tuple(leg) for s, leg in t[2].items()}, t[3], t[4]]
+                      for trade_id, t in meta['open'].items()}
+        stats.recent = OrderedDict((r[0], [r[1], {s: tuple(leg) for s, leg in r[2].items()}, r[3], r[4]])
+                                   for r in meta['recent'])
+        stats.closed = ClosedTrades(columns)
+        stats.pairs = meta['pairs']
+        stats.pair_index = {label: i for i, label in enumerate(stats.pairs)}
+        stats.by_pair = meta['by_pair']
+        stats.by_day = meta['by_day']
+        stats.trades, stats.wins, stats.pnl, stats.gross_profit, stats.gross_loss, stats.holding = meta['totals']
+        return stats
+
+    @classmethod
+    def open_or_build(cls, log_path=TRADE_LOG_FILE, snapshot_path=TRADE_STATS_FILE):
+        stats = cls.load(log_path, snapshot_path) or cls(log_path, snapshot_path)
+        stats.update()
+        return stats
+
+    # Queries
+
+    def summary(self):
+        return {
+            'trades': self.trades,
+            'open_trades': len(self.open),
+            'wins': self.wins,
+            'win_rate': self.wins / self.trades * 100 if self.trades else 0.0,
+            'pnl': self.pnl,
+            'avg_pnl': self.pnl / self.trades if self.trades else 0.0,
+            'profit_factor': self.gross_profit / -self.gross_loss if self.gross_loss else None,
+            'avg_holding_hours': self.holding / self.trades / 3600 if self.trades else 0.0,
+            'today_pnl': self.by_day.get(date.today().isoformat(), [0.0])[0],
+        }
+
+    def pair_table(self):
+        # [(pair, pnl, trades, win rate %, average holding hours)], best first
+        rows = [(label, pnl, trades, wins / trades * 100, holding / trades / 3600)
+                for label, (pnl, trades, wins, holding) in zip(self.pairs, self.by_pair) if trades]
+        return sorted(rows, key=lambda row: row[1], reverse=True)
+
+    def day_table(self):
+        return [(day, pnl, trades, wins / trades * 100 if trades else 0.0)
+                for day, (pnl, trades, wins) in sorted(self.by_day.items())]
+
+    def trade(self, trade_id):
+        row = self.closed.find(trade_id)
+        if row is None:
+            return None
+        view = {name: self.closed.view(name)[row] for name in ClosedTrades.COLUMNS}
+        return {
+            'trade_id': trade_id,
+            'pair': self.pairs[view['pair']],
+            'direction': 'long' if view['direction'] > 0 else 'short',
+            'opened': datetime.fromtimestamp(view['open_ts']).isoformat(),
+            'closed': datetime.fromtimestamp(view['close_ts']).isoformat(),
+            'holding_hours': float(view['close_ts'] - view['open_ts']) / 3600,
+            'pnl': float(view['pnl']),
+        }
+
+    def top(self, n=10, worst=False):
+        pnl = self.closed.view('pnl')
+        if not len(pnl):
+            return []
+        n = min(n, len(pnl))
+        keys = pnl if worst else -pnl
+        rows = np.argpartition(keys, n - 1)[:n]
+        rows = rows[np.argsort(keys[rows])]
+        ids = self.closed.view('trade_id')
+        return [self.trade(ids[row].decode()) for row in rows]
+
+    def status_text(self):
+        s = self.summary()
+        return (f"  Realized: ${s['pnl']:.2f} (today ${s['today_pnl']:.2f})\n"
+                f"  Win rate: {s['win_rate']:.0f}% of {s['trades']} | Avg hold: {s['avg_holding_hours']:.1f}h")
+
+def write_synthetic_log(path, trades, seed=0):
+    # Two-leg pears opened and closed in sequence, one row each, like log_pear writes them
+    rng = np.random.default_rng(seed)
+    symbols = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "DOGEUSDT", "XRPUSDT", "ADAUSDT"]
+    start = datetime(2024, 1, 1).timestamp()
+    with open(path, 'w') as f:
+        f.write(HEADER + "\n")
+        for i in range(trades):
+            base, quote = rng.choice(len(symbols), 2, replace=False)
+            opened = start + i * 600
+            closed = opened + rng.integers(60, 86400)
+            price1, price2 = rng.uniform(1, 100, 2)
+            move1, move2 = rng.normal(1, 0.02, 2)
+            trade_id = f"{i:08d}-0000-4000-8000-{rng.integers(16**12):012x}"
+            direction = 'LONG' if i % 2 else 'SHORT'
+            f.write(f"{datetime.fromtimestamp(opened).isoformat()},{trade_id},{direction},{symbols[base]},1.5,{price1},{symbols[quote]},2.5,{price2}\n")
+            f.write(f"{datetime.fromtimestamp(closed).isoformat()},{trade_id},CLOSE,{symbols[base]},1.5,{price1 * move1},{symbols[quote]},2.5,{price2 * move2}\n")
+
+def benchmark(trades):
+    workdir = tempfile.mkdtemp(prefix='trade_log_bench_')
+    log_path = os.path.join(workdir, 'trade_log.csv')
+    snapshot_path = os.path.join(workdir, 'trade_log_stats.npz')
+    write_synthetic_log(log_path, trades)
+    print(f"{trades:,} trades, {os.path.getsize(log_path) / 2**20:.0f} MB log in {workdir}")
+
+    start = time.perf_counter()
+    stats = TradeStats(log_path, snapshot_path)
+    stats.update()
+    print(f"full build: {time.perf_counter() - start:.2f} s")
+    start = time.perf_counter()
+    stats.save()
+    print(f"snapshot save: {(time.perf_counter() - start) * 1000:.0f} ms ({os.path.getsize(snapshot_path) / 2**20:.0f} MB)")
+    start = time.perf_counter()
+    stats = TradeStats.open_or_build(log_path, snapshot_path)
+    print(f"restart from snapshot: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    appended = 1000
+    write_synthetic_log(os.path.join(workdir, 'tail.csv'), appended, seed=1)
+    with open(os.path.join(workdir, 'tail.csv')) as tail, open(log_path, 'a') as f:
+        f.writelines(line.replace('-0000-4000-', '-1111-4000-') for line in list(tail)[1:])
+    start = time.perf_counter()
+    stats.update()
+    print(f"incremental update: {(time.perf_counter() - start) / (appended * 2) * 1e6:.1f} us per appended row")
+    start = time.perf_counter()
+    stats.summary(), stats.pair_table(), stats.day_table()
+    print(f"summary + pair + day tables: {(time.perf_counter() - start) * 1000:.1f} ms")
+    start = time.perf_counter()
+    stats.top(10)
+    print(f"top 10 of {len(stats.closed):,}: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+def print_rows(header, rows):
+    print(header)
+    for row in rows:
+        print("  ".join(f"{value:>12.2f}" if isinstance(value, float) else f"{value!s:>12}" for value in row))
+
+def main():
+    parser = argparse.ArgumentParser(description="Realized PnL statistics from the trade log")
+    parser.add_argument('command', nargs='?', default='summary', choices=['summary', 'pairs', 'days', 'top', 'worst', 'trade', 'bench'])
+    parser.add_argument('trade_id', nargs='?')
+    parser.add_argument('--log', default=TRADE_LOG_FILE)
+    parser.add_argument('--snapshot', default=TRADE_STATS_FILE)
+    parser.add_argument('-n', type=int, default=10, help="Rows for top/worst")
+    parser.add_argument('--trades', type=int, default=1_000_000, help="Synthetic trades for bench")
+    args = parser.parse_args()
+
+    if args.command == 'bench':
+        benchmark(args.trades)
+        return
+    stats = TradeStats.open_or_build(args.log, args.snapshot)
+    if stats.unsaved_rows:
+        stats.save()
+    if args.command == 'summary':
+        for key, value in stats.summary().items():
+            print(f"{key:>18}: {value:.2f}" if isinstance(value, float) else f"{key:>18}: {value}")
+        if stats.skipped_rows or stats.unmatched_closes:
+            print(f"({stats.skipped_rows} unreadable rows, {stats.unmatched_closes} closes without an open row)")
+    elif args.command == 'pairs':
+        print_rows(f"{'pair':>12}  {'pnl':>12}  {'trades':>12}  {'win %':>12}  {'hold h':>12}", stats.pair_table())
+    elif args.command == 'days':
+        print_rows(f"{'day':>12}  {'pnl':>12}  {'trades':>12}  {'win %':>12}", stats.day_table())
+    elif args.command in ('top', 'worst'):
+        for trade in stats.top(args.n, worst=args.command == 'worst'):
+            print(f"{trade['trade_id']}  {trade['pair']:>12}  {trade['direction']:>5}  {trade['pnl']:>12.2f}  {trade['holding_hours']:.1f}h")
+    elif args.command == 'trade':
+        trade = stats.trade(args.trade_id or '')
+        if trade is None:
+            sys.exit(f"No closed trade {args.trade_id}")
+        for key, value in trade.items():
+            print(f"{key:>14}: {value}")
+
+if __name__ == "__main__":
+    main()
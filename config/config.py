@@ -1,28 +1,40 @@
 # Trading parameters
-UPDATE_INTERVAL = 10000  # Update interval in milliseconds
+RECONCILE_INTERVAL = 60000  # REST reconciliation of streamed account state in milliseconds
+ACCOUNT_PUSH_COALESCE_MS = 50  # Batch bursts of private stream pushes into one UI refresh
 
 # Other settings
 TESTNET = False  # Set to True for testnet, False for live trading
+PAPER_TRADING = False  # Set to True to trade against the in-process simulated exchange
 
 # Chart settings
 CHART_FIGSIZE = (12, 8)
-CHART_INTERVAL = "1"
 CHART_LIMIT = 300
 
 # UI settings
 CONTROL_PANEL_WIDTH = 400
 CONTROL_PANEL_HEIGHT = 200
 TRADING_DIALOG_WIDTH = 400
-TRADING_DIALOG_HEIGHT = 250
+TRADING_DIALOG_HEIGHT = 370
 
 # Order settings
 DEFAULT_ORDER_SIZE = 1000
 MIN_ORDER_SIZE = 10
 MAX_ORDER_SIZE = 1000000
 
+# Trigger settings
+ZSCORE_WINDOW = 300  # Minute closes per pair that z-score triggers score the live pair price against
+ZSCORE_KLINE_INTERVAL = 60000  # in milliseconds; how often the legs of armed z-score pairs get new minute candles
+ZSCORE_MIN_OBSERVATIONS = 30
+TRIGGER_RETRY_INTERVAL = 10000  # in milliseconds; a trigger whose order failed is re-armed but does not fire again for this long
+
 # File paths
 CURRENT_POSITION_FILE = 'current_position.json'
 TRADE_LOG_FILE = 'trade_log.csv'
+TRADE_STATS_FILE = 'trade_log_stats.npz'  # Materialized PnL aggregates and the log offset they cover
+TRADE_STATS_SAVE_ROWS = 10000  # Snapshot the aggregates after this many new log rows
+TRIGGERS_FILE = 'triggers.json'
+WATCHLIST_FILE = 'watchlist.json'
+FUNDING_CACHE_FILE = 'funding_rates.npz'  # Settled funding rates of pear symbols, fetched incrementally
 
 # API settings
 API_KEY_ENV_VAR = "API_KEY"
@@ -31,7 +43,137 @@ API_SECRET_ENV_VAR = "API_SECRET"
 # Bybit API settings
 BYBIT_CATEGORY = "linear"
 BYBIT_SETTLE_COIN = "USDT"
+BYBIT_ACCOUNT_TYPE = "UNIFIED"
+BYBIT_RECV_WINDOW = 5000  # in milliseconds, for locally signed requests
+
+# Async HTTP transport (trading_api/async_bybit_api.py)
+ASYNC_HTTP_ENABLED = False  # Route REST calls through the pooled asyncio client instead of pybit
+ASYNC_HTTP_POOL_SIZE = 100  # Keep-alive connections shared by all in-flight requests
+ASYNC_HTTP_TIMEOUT = 10  # in seconds
+ASYNC_ENDPOINT_DEFAULT_LIMIT = 10  # Concurrent requests per endpoint unless listed below
+ASYNC_ENDPOINT_LIMITS = {
+    '/v5/market/kline': 20,
+    '/v5/market/tickers': 5,
+    '/v5/market/funding/history': 10,
+    '/v5/order/create': 10,
+    '/v5/position/list': 5,
+    '/v5/account/wallet-balance': 5,
+}
+PRIVATE_STREAM_ENABLED = True  # Push positions, fills, orders and wallet over the private websocket
+LIVE_PRICES_ENABLED = True  # Stream tickers for charted and pear symbols between candle fetches
+LIVE_PRICE_FLUSH_MS = 100  # Coalesce ticks into at most 10 chart and risk redraws per second
+LIVE_PRICE_STALENESS_MS = 10000  # A leg without a tick for this long is not combined into a live pear price
 
 # Default symbols
 DEFAULT_SYMBOL1 = "BTCUSDT"
 DEFAULT_SYMBOL2 = "POPCATUSDT"
+
+# Paper trading settings
+PAPER_STARTING_BALANCE = 10000
+PAPER_HISTORY_MINUTES = 10080  # Minute candles kept by the simulator (7 days)
+PAPER_MINUTES_PER_SECOND = 1.0  # Simulated minutes per wall-clock second
+PAPER_TAKER_FEE = 0.00055
+PAPER_SPREAD_BPS = 2
+PAPER_BOOK_LEVELS = 20
+PAPER_LEVEL_STEP_BPS = 1
+PAPER_BOOK_DEPTH_USD = 50000  # Liquidity per book level
+PAPER_LEVERAGE = 10
+PAPER_FUNDING_HISTORY = 5000
+PAPER_TICK_INTERVAL_MS = 100  # How often the simulated ticker stream publishes changed prices
+
+# Shared-memory market data bus
+DATA_BUS_ENABLED = False  # Read klines and tickers from a local feeder (python -m market_data.data_bus feed)
+DATA_BUS_NAME = "pear_market_data"
+DATA_BUS_CONTROL_PATH = "/tmp/pear_market_data.sock"
+DATA_BUS_CONTROL_PORT = 47615  # Used where Unix sockets are unavailable
+DATA_BUS_MAX_SYMBOLS = 256
+DATA_BUS_CANDLE_CAPACITY = 1440  # Minute candles kept per symbol
+DATA_BUS_TICKER_INTERVAL = 1000  # in milliseconds
+DATA_BUS_KLINE_INTERVAL = 5000  # in milliseconds
+DATA_BUS_KLINE_REFRESH_LIMIT = 3  # Candles re-fetched per symbol after the initial backfill
+
+# Multi-account execution
+MULTI_ACCOUNT_ENABLED = False  # Fan pear orders out to every account in ACCOUNTS_FILE
+ACCOUNTS_FILE = 'accounts.json'
+ACCOUNT_WORKER_THREADS = 8  # Concurrent legs per account worker
+ACCOUNT_CALL_TIMEOUT = 15  # in seconds
+PAPER_ACCOUNT_SEED = 7  # Paper accounts share one simulated market
+
+# Position reconciliation
+RECONCILE_QTY_TOLERANCE = 1e-9  # Quantities closer than this are treated as equal
+
+# Profiling and stall detection
+PROFILER_ENABLED = False  # Record slot, timer and API spans and watch for event loop stalls
+PROFILER_MAX_EVENTS = 200000  # Most recent trace events kept in memory
+PROFILER_OUTPUT_DIR = 'profiles'
+PROFILER_CAPTURE_MODE = 'cprofile'  # 'cprofile' or 'sampling'
+PROFILER_SAMPLE_INTERVAL_MS = 5
+STALL_THRESHOLD_MS = 250  # Dump the GUI thread's stack when the event loop is blocked this long
+WATCHDOG_HEARTBEAT_MS = 50
+
+# Logging
+LOG_LEVEL = 'INFO'
+LOG_FILE = 'logs/pear.jsonl'  # One JSON record per line; None logs to the console only
+LOG_FILE_MAX_BYTES = 10 * 2 ** 20
+LOG_FILE_BACKUPS = 5
+LOG_QUEUE_SIZE = 10000  # Records waiting for the writer thread; past this, records are dropped instead of blocking
+LOG_RATE_LIMIT_SECONDS = 60  # The same warning or error (message and arguments) is written once per this many seconds
+
+# Chart history and downsampling
+CHART_DEFAULT_INTERVAL = "1m"  # One of market_data.candles.CHART_INTERVALS
+CANDLE_HISTORY_MINUTES = 20160  # Minute candles backfilled per symbol (14 days)
+CANDLE_CACHE_MAX_MINUTES = 86400  # Minute candles kept per symbol (60 days)
+KLINE_PAGE_LIMIT = 1000  # Bybit's maximum candles per kline request
+CHART_DOWNSAMPLE = 'minmax'  # 'minmax' or 'lttb'
+CHART_POINTS_PER_PIXEL = 1  # Plotted points per horizontal pixel of the visible range
+
+# Symbol universe
+SYMBOL_INDEX_FILE = 'symbols.json'  # Instruments of BYBIT_CATEGORY cached between runs
+SYMBOL_INDEX_MAX_AGE = 86400  # in seconds; older caches are refetched at startup
+SYMBOL_COMPLETIONS = 15  # Suggestions shown by the symbol completer
+SYMBOL_FUZZY_DISTANCE = 2  # Maximum edit distance for typo suggestions
+
+# Polling cadence per feed (milliseconds); one timer drives them all
+PEARS_POLL_INTERVAL = 10000  # Tickers for pear legs and trigger evaluation
+PEARS_POLL_FAST = 2000  # While a trigger is close or the market is moving fast
+PEARS_POLL_IDLE = 60000  # No open pears and no armed triggers
+POSITIONS_POLL_INTERVAL = 15000  # Exchange positions
+POSITIONS_POLL_IDLE = 60000  # While the private stream keeps positions current
+ACCOUNT_POLL_INTERVAL = 30000  # Wallet balance
+ACCOUNT_POLL_IDLE = 120000  # While the private stream keeps the wallet current
+CHART_POLL_INTERVAL = 10000  # Klines for the charted pear; paused while the chart window is hidden
+CHART_POLL_FAST = 3000
+TRADE_STATS_POLL_INTERVAL = 30000  # Realized PnL statistics from the trade log
+WATCHLIST_POLL_INTERVAL = 5000  # Bulk tickers for every watchlist leg; paused while the watchlist is hidden
+FUNDING_POLL_INTERVAL = 60000  # Cheap due check; the exchange is only asked once per funding epoch
+BETAS_POLL_INTERVAL = 60000  # Re-estimates pear leg betas; candles are only fetched once they are BETA_REFRESH_INTERVAL old
+POLL_MAX_BACKOFF = 300000  # Longest wait after repeated failures
+POLL_BOOST_DURATION = 60000  # How long a boost keeps a feed on its fast interval
+POLL_BOOST_TRIGGER_PCT = 1.0  # Boost when a price or UPnL trigger is this close (% / percentage points)
+POLL_BOOST_TRIGGER_Z = 0.25  # Boost when a z-score trigger is this close
+POLL_VOLATILITY_SHORT = 15  # Minutes of recent returns compared against...
+POLL_VOLATILITY_LONG = 240  # ...this many minutes of baseline returns
+POLL_VOLATILITY_RATIO = 2.0  # Boost when recent volatility is this multiple of the baseline
+
+# Funding carry (risk/funding.py)
+FUNDING_AVERAGE_DAYS = 7  # Trailing window for the average carry shown for the loaded pear
+FUNDING_SETTLE_DELAY = 60000  # in milliseconds; wait this long after a settlement before fetching it
+FUNDING_HISTORY_PAGE = 200  # Bybit's maximum rows per funding history request
+FUNDING_FETCH_WORKERS = 8  # Concurrent history requests during an epoch refresh
+
+# Beta-weighted exposure (risk/risk_engine.py)
+BETA_BENCHMARK = 'BTCUSDT'  # Pear legs are regressed against this symbol's minute returns
+BETA_WINDOW = 1440  # Minute returns per regression
+BETA_MIN_OBSERVATIONS = 120  # Fewer shared minutes keep the previous beta (1.0 until estimated)
+BETA_REFRESH_INTERVAL = 3600000  # in milliseconds; how often leg candles are topped up for the regression
+
+# Watchlist (market_data/watchlist.py); entries are "QUOTE/BASE" pairs or baskets
+DEFAULT_WATCHLIST = ["ETH/BTC", "SOL/BTC", "SOL/ETH", "BNB/BTC", "XRP/BTC", "DOGE/BTC", "AVAX/BTC", "LINK/BTC"]
+WATCHLIST_MAX_TILES = 30
+WATCHLIST_COLUMNS = 5
+WATCHLIST_TILE_WIDTH = 220
+WATCHLIST_TILE_HEIGHT = 110
+WATCHLIST_MINUTES = 240  # Minutes of pear price drawn per tile
+WATCHLIST_HISTORY_MINUTES = 1000  # Minute candles loaded per leg: one kline page
+WATCHLIST_KLINE_INTERVAL = 60000  # in milliseconds; legs refreshed more recently by any chart are skipped
+WATCHLIST_FETCH_WORKERS = 8  # Concurrent kline requests during a watchlist refresh
@@ -0,0 +1,202 @@
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from config.config import *
+
+logger = logging.getLogger(__name__)
+
+CONSOLE_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+# Attributes every LogRecord has; anything else came in through extra= and is a structured field
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, thread and message,
+    plus every field passed with extra=, such as trade_id or latency_ms."""
+
+    def format(self, record):
+        entry = {'ts': int(record.created * 1000), 'level': record.levelname, 'logger': record.name,
+                 'thread': record.threadName, 'msg': record.getMessage()}
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class ConsoleFormatter(logging.Formatter):
+    def format(self, record):
+        text = super().format(record)
+        suppressed = getattr(record, 'suppressed', 0)
+        return f"{text} (repeated {suppressed} more times)" if suppressed else text
+
+class RateLimitFilter(logging.Filter):
+    """Lets the same warning or error through once per interval.
+
+    Records are keyed by logger, message template and arguments, so a dead
+    symbol failing on every tick is written once per interval, carrying the
+    number of repeats it hid, while errors for other symbols still pass.
+    """
+
+    def __init__(self, interval=LOG_RATE_LIMIT_SECONDS, level=logging.WARNING, max_keys=4096):
+        super().__init__()
+        self.interval = interval
+        self.level = level
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.seen = {}  # key -> [monotonic seconds last written, repeats hidden since]
+
+    def filter(self, record):
+        if record.levelno < self.level or not self.interval:
+            return True
+        key = (record.name, record.msg, repr(record.args))
+        now = time.monotonic()
+        with self.lock:
+            entry = self.seen.get(key)
+            if entry is not None and now - entry[0] < self.interval:
+                entry[1] += 1
+                return False
+            if len(self.seen) >= self.max_keys:
+                self.seen = {k: v for k, v in self.seen.items() if now - v[0] < self.interval}
+            self.seen[key] = [now, 0]
+        if entry is not None and entry[1]:
+            record.suppressed = entry[1]
+        return True
+
+class AsyncQueueHandler(QueueHandler):
+    """Hands records to the writer thread without formatting them.
+
+    The stdlib QueueHandler formats the message on the calling thread.
+    Here the caller only builds the record and enqueues it; the message is
+    formatted from its arguments on the writer thread, so they must not be
+    mutated after the call. A full queue drops the record instead of
+    blocking, and the next record that fits carries the drop count.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            if self.dropped:
+                record.dropped, self.dropped = self.dropped, 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1 + getattr(record, 'dropped', 0)
+
+_listener = None
+
+def setup_logging(level=LOG_LEVEL, path=LOG_FILE, console=True):
+    """Route the root logger through a queue to a background writer thread.
+
+    Plain lines go to the console and JSON lines to a rotating file. Safe
+    to call more than once; later calls keep the first configuration.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+    handlers = []
+    if console:
+        stream = logging.StreamHandler()
+        stream.setFormatter(ConsoleFormatter(CONSOLE_FORMAT))
+        handlers.append(stream)
+    if path:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        file_handler = RotatingFileHandler(path, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS, encoding='utf-8')
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+
+    handler = AsyncQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    handler.addFilter(RateLimitFilter())
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+    _listener = QueueListener(handler.queue, *handlers)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+def stop_logging():
+    # Writes out whatever is still queued, then stops the writer thread
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    try:
+        listener.stop()
+    except queue.Full:
+        pass
+
+def elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 3)
+
+def benchmark(orders=20000, legs=2):
+    """Logging cost a pear order pays on its own thread: one record per leg and one per pear."""
+    import tempfile
+    path = os.path.join(tempfile.mkdtemp(), 'bench.jsonl')
+    bench_logger = logging.getLogger('bench')
+    bench_logger.propagate = False
+    bench_logger.setLevel(logging.INFO)
+    response = {'retCode': 0, 'retMsg': 'OK', 'result': {'orderId': '1a2b3c'}}
+
+    def place(count):
+        start = time.perf_counter()
+        for i in range(count):
+            trade_id = f"trade-{i}"
+            for leg in range(legs):
+                bench_logger.info("Order %s: %s %s %.8f (%.2f USD), retCode %s, %.1f ms", trade_id, 'Buy', f"SYM{leg}USDT",
+                                  0.1234, 100.0, response['retCode'], 12.5,
+                                  extra={'trade_id': trade_id, 'symbol': f"SYM{leg}USDT", 'latency_ms': 12.5})
+            bench_logger.info("Opened long pear %s: %s", trade_id, "SYM0USDT/SYM1USDT",
+                              extra={'trade_id': trade_id, 'latency_ms': 25.0})
+        return (time.perf_counter() - start) / count * 1e6
+
+    sync_handler = RotatingFileHandler(path, maxBytes=LOG_FILE_MAX_BYTES, backupCount=1)
+    sync_handler.setFormatter(JsonFormatter())
+    bench_logger.addHandler(sync_handler)
+    sync_us = place(orders)
+    bench_logger.removeHandler(sync_handler)
+    sync_handler.close()
+
+    file_handler = RotatingFileHandler(path, maxBytes=LOG_FILE_MAX_BYTES, backupCount=1)
+    file_handler.setFormatter(JsonFormatter())
+    handler = AsyncQueueHandler(queue.Queue(orders * (legs + 1)))
+    handler.addFilter(RateLimitFilter())
+    bench_logger.addHandler(handler)
+    listener = QueueListener(handler.queue, file_handler)
+    listener.start()
+    queued_us = place(orders)
+    start = time.perf_counter()
+    listener.stop()
+    drain = time.perf_counter() - start
+    bench_logger.removeHandler(handler)
+    file_handler.close()
+
+    bench_logger.setLevel(logging.WARNING)
+    bench_logger.addHandler(handler)
+    disabled_us = place(orders)
+    bench_logger.removeHandler(handler)
+
+    repeated = RateLimitFilter()
+    record = logging.LogRecord('bench', logging.ERROR, '', 0, "Error getting current price for %s: %s", ('DEADUSDT', 'Symbol is invalid'), None)
+    start = time.perf_counter()
+    written = sum(repeated.filter(record) for _ in range(orders))
+    repeated_us = (time.perf_counter() - start) / orders * 1e6
+
+    print(f"{legs}-leg pear order, {legs + 1} records: {queued_us:.1f} us queued "
+          f"(writer drained in {drain * 1000:.0f} ms), {sync_us:.1f} us writing JSON synchronously")
+    print(f"level disabled: {disabled_us:.2f} us per order")
+    print(f"repeated error: {repeated_us:.2f} us per record, {written} of {orders} written")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,235 @@
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import logging
+import functools
+import threading
+import traceback
+from collections import deque, Counter
+from contextlib import contextmanager, nullcontext
+from config.config import *
+
+logger = logging.getLogger(__name__)
+
+_NO_SPAN = nullcontext()
+
+class Tracer:
+    """Records wall-time spans as Chrome trace events ("X" complete events).
+
+    Saved files open in chrome://tracing or ui.perfetto.dev. Events go into
+    a bounded deque, so the tracer can stay on for a whole session and a
+    save always holds the most recent activity.
+    """
+
+    def __init__(self, enabled=PROFILER_ENABLED, max_events=PROFILER_MAX_EVENTS):
+        self.enabled = enabled
+        self.events = deque(maxlen=max_events)
+        self.pid = os.getpid()
+        self.origin = time.perf_counter()
+
+    def now_us(self):
+        return (time.perf_counter() - self.origin) * 1e6
+
+    def add_complete(self, name, cat, start_us, duration_us, args=None):
+        event = {'name': name, 'cat': cat, 'ph': 'X', 'ts': start_us, 'dur': duration_us,
+                 'pid': self.pid, 'tid': threading.get_ident()}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def add_instant(self, name, cat, args=None, tid=None):
+        self.events.append({'name': name, 'cat': cat, 'ph': 'i', 's': 't', 'ts': self.now_us(),
+                            'pid': self.pid, 'tid': tid or threading.get_ident(), 'args': args or {}})
+
+    @contextmanager
+    def _span(self, name, cat, args):
+        start = self.now_us()
+        try:
+            yield
+        finally:
+            self.add_complete(name, cat, start, self.now_us() - start, args)
+
+    def span(self, name, cat='app', args=None):
+        return self._span(name, cat, args) if self.enabled else _NO_SPAN
+
+    def save(self, path):
+        threads = {thread.ident: thread.name for thread in threading.enumerate()}
+        metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid, 'args': {'name': name}}
+                    for tid, name in threads.items()]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': metadata + list(self.events), 'displayTimeUnit': 'ms'}, f)
+        logger.info("Wrote %s trace events to %s", len(self.events), path)
+        return path
+
+tracer = Tracer()
+
+def traced(name, cat='slot'):
+    """Decorator recording each call as a span. A no-op when profiling is off."""
+    def decorator(func):
+        if not tracer.enabled:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name, cat):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class TracedClient:
+    """Proxy recording every API client method call as an "api" span."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr) or name.startswith('_'):
+            return attr
+
+        @functools.wraps(attr)
+        def call(*args, **kwargs):
+            with tracer.span(name, 'api', {'args': repr(args)[:200]} if args else None):
+                return attr(*args, **kwargs)
+        return call
+
+def trace_client(client):
+    return TracedClient(client) if tracer.enabled else client
+
+class StallWatchdog:
+    """Dumps the GUI thread's stack when its event loop stops beating.
+
+    The GUI calls beat() from a short repeating timer. A background thread
+    checks how long ago the last beat was; past the threshold it logs the
+    GUI thread's current stack once per stall, and when beats resume the
+    stall is recorded as a span in the trace.
+    """
+
+    def __init__(self, threshold_ms=STALL_THRESHOLD_MS, thread_id=None):
+        self.threshold = threshold_ms / 1000
+        self.thread_id = thread_id or threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.stall_started = None
+        self.stalls = 0
+        self.running = False
+        self.thread = None
+
+    def beat(self):
+        now = time.monotonic()
+        if self.stall_started is not None:
+            duration = now - self.stall_started
+            start_us = tracer.now_us() - duration * 1e6
+            tracer.add_complete('event loop stall', 'stall', start_us, duration * 1e6)
+            logger.warning("GUI event loop was blocked for %.0f ms", duration * 1000)
+            self.stall_started = None
+        self.last_beat = now
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="stall-watchdog", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def _run(self):
+        while self.running:
+            time.sleep(self.threshold / 4)
+            blocked = time.monotonic() - self.last_beat
+            if blocked > self.threshold and self.stall_started is None:
+                self.stall_started = self.last_beat
+                self.stalls += 1
+                stack = self.gui_stack()
+                logger.warning("GUI event loop blocked for %.0f ms, stack:\n%s", blocked * 1000, stack)
+                tracer.add_instant('stall stack', 'stall', {'blocked_ms': round(blocked * 1000), 'stack': stack}, tid=self.thread_id)
+
+    def gui_stack(self):
+        frame = sys._current_frames().get(self.thread_id)
+        return "".join(traceback.format_stack(frame)) if frame is not None else "<GUI thread not found>"
+
+class StackSampler:
+    """Samples one thread's stack at a fixed interval into folded-stack counts
+    (the input format of flamegraph.pl and speedscope)."""
+
+    def __init__(self, thread_id, interval_ms=PROFILER_SAMPLE_INTERVAL_MS):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000
+        self.samples = Counter()
+        self.running = False
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._run, name="stack-sampler", daemon=True).start()
+
+    def stop(self):
+        self.running = False
+
+    def _run(self):
+        while self.running:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+class ProfileCapture:
+    """On-demand capture of the GUI thread, toggled from the control panel.
+
+    "cprofile" mode profiles every call deterministically (more overhead);
+    "sampling" mode takes stack samples from a side thread. Either way the
+    span trace is saved alongside the profile.
+    """
+
+    def __init__(self, mode=PROFILER_CAPTURE_MODE, directory=PROFILER_OUTPUT_DIR):
+        self.mode = mode
+        self.directory = directory
+        self.profiler = None
+        self.sampler = None
+
+    @property
+    def active(self):
+        return self.profiler is not None or self.sampler is not None
+
+    def start(self):
+        if self.mode == 'sampling':
+            self.sampler = StackSampler(threading.get_ident())
+            self.sampler.start()
+        else:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        tracer.add_instant('capture started', 'profiler')
+
+    def stop(self):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        tracer.add_instant('capture stopped', 'profiler')
+        paths = [tracer.save(os.path.join(self.directory, f"trace_{stamp}.json"))]
+        if self.profiler is not None:
+            self.profiler.disable()
+            path = os.path.join(self.directory, f"profile_{stamp}.prof")
+            self.profiler.dump_stats(path)
+            paths.append(path)
+            # The top of the cumulative listing, readable without loading the .prof file
+            summary_path = os.path.join(self.directory, f"profile_{stamp}.txt")
+            with open(summary_path, 'w') as f:
+                pstats.Stats(self.profiler, stream=f).sort_stats('cumulative').print_stats(15)
+            paths.append(summary_path)
+            self.profiler = None
+        if self.sampler is not None:
+            self.sampler.stop()
+            paths.append(self.sampler.save(os.path.join(self.directory, f"profile_{stamp}.folded")))
+            self.sampler = None
+        return paths
@@ -3,97 +3,316 @@ import pandas as pd
 import numpy as np
 from dotenv import load_dotenv
 import os
+import time
 import logging
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
+from matplotlib.figure import Figure
 from config.config import *
-from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QPushButton, QWidget, QLineEdit, QLabel, QMessageBox, QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QDoubleSpinBox, QComboBox, QSpacerItem, QSizePolicy
+from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QPushButton, QWidget, QLineEdit, QLabel, QMessageBox, QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QDoubleSpinBox, QComboBox, QSpacerItem, QSizePolicy, QCompleter, QGridLayout
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 import matplotlib.dates as mdates
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtCore import Qt, QTimer, QObject, QEvent, pyqtSignal, QStringListModel, QPointF
 import json
-from PyQt5.QtGui import QPalette, QColor
+from PyQt5.QtGui import QPalette, QColor, QPainter, QPolygonF
 from datetime import datetime
 import uuid
+from itertools import zip_longest
+from concurrent.futures import ThreadPoolExecutor
 from trading_api.bybit_api import BybitAPIClient
+from trading_api.async_bybit_api import SyncBybitAPIClient
+from trading_api.paper_exchange import PaperExchangeClient, PaperTickerStream
+from trading_api.bybit_ws import BybitPrivateStream, BybitPublicStream
+from trading_api.account_state import AccountState
+from risk.risk_engine import RiskEngine, estimate_betas
+from risk.funding import FundingBook, DAY_MS
+from orders.pear import Pear, Leg, PearRegistry, basket_label
+from market_data.data_bus import connect_data_bus
+from market_data.candles import CandleCache, CHART_INTERVALS, MINUTE_MS, TS as CANDLE_TS, CLOSE as CANDLE_CLOSE, aggregate_last, downsample, visible_slice
+from market_data.symbols import SymbolIndex
+from market_data.watchlist import Watchlist, parse_entry
+from market_data.live_price import LivePrices
+from market_data.polling import PollScheduler, volatility_ratio
+from market_data.pricing import align_closes, basket_price, parse_basket, pair_weights, weights_pair, is_unit_pair
+from orders.triggers import TriggerEngine, ZSCORE, BELOW, ABOVE, CLOSE
+from orders.account_manager import AccountManager, load_accounts, aggregate_fills, aggregate_summary, partial_fills
+from orders.reconciliation import PositionReconciler
+from analytics.trade_log import TradeStats
+from diagnostics.profiler import tracer, traced, trace_client, StallWatchdog, ProfileCapture
+from diagnostics.logs import setup_logging, elapsed_ms
 
-# Set up logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
+# Created by the first MainWindow. Nothing here runs at import time, because spawned
+# account workers re-import this module and must not build clients or log handlers of their own.
+bybit_client = None
 
-# Initialize the Bybit API client
-if TESTNET:
-    try:
-        bybit_client = BybitAPIClient(
-            api_key=os.getenv("API_KEY_TESTNET"),
-            api_secret=os.getenv("API_SECRET_TESTNET"),
-            testnet=TESTNET
-        )
-    except Exception as e:
-        logger.error(f"Failed to initialize Bybit API client: {e}")
-        exit(1)
-else:
-    try:
-        bybit_client = BybitAPIClient(
-            api_key=os.getenv("API_KEY"),
-            api_secret=os.getenv("API_SECRET"),
-            testnet=TESTNET
-        )
-    except Exception as e:
-        logger.error(f"Failed to initialize Bybit API client: {e}")
-        exit(1)
-
-def get_kline_data(symbol, interval=CHART_INTERVAL, limit=CHART_LIMIT):
-    response = bybit_client.get_kline_data(symbol, interval, limit)
-    if response is None or response.get('retCode') != 0:
-        logger.error(f"Error getting kline data for {symbol}: {response.get('retMsg', 'No response')}")
-        return None
-    return response
-
-def calculate_pair_price(symbol1, symbol2):
-    try:
-        data1 = get_kline_data(symbol1)
-        data2 = get_kline_data(symbol2)
-        
-        if data1 is None or data2 is None:
-            logger.error("Received None for kline data.")
-            return None
-        
-        if 'result' in data1 and 'list' in data1['result']:
-            df1 = pd.DataFrame(data1['result']['list'], columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'turnover'])
-        else:
-            logger.error("Invalid data structure for data1.")
-            return None
-        
-        if 'result' in data2 and 'list' in data2['result']:
-            df2 = pd.DataFrame(data2['result']['list'], columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'turnover'])
+def create_bybit_client():
+    load_dotenv()
+    if PAPER_TRADING:
+        client = PaperExchangeClient()
+        client.start()
+    elif TESTNET:
+        try:
+            client = (SyncBybitAPIClient if ASYNC_HTTP_ENABLED else BybitAPIClient)(
+                api_key=os.getenv("API_KEY_TESTNET"),
+                api_secret=os.getenv("API_SECRET_TESTNET"),
+                testnet=TESTNET
+            )
+        except Exception as e:
+            logger.error("Failed to initialize Bybit API client: %s", e)
+            exit(1)
+    else:
+        try:
+            client = (SyncBybitAPIClient if ASYNC_HTTP_ENABLED else BybitAPIClient)(
+                api_key=os.getenv("API_KEY"),
+                api_secret=os.getenv("API_SECRET"),
+                testnet=TESTNET
+            )
+        except Exception as e:
+            logger.error("Failed to initialize Bybit API client: %s", e)
+            exit(1)
+
+    # Share one feeder's klines and tickers with every other local instance.
+    # Paper mode keeps its own simulated market so fills match the charted prices.
+    if DATA_BUS_ENABLED and not PAPER_TRADING:
+        client = connect_data_bus(client)
+    return trace_client(client)
+
+def exchange_source():
+    # Which exchange the app trades against; caches that differ between them are keyed on it
+    return 'paper' if PAPER_TRADING else 'testnet' if TESTNET else 'mainnet'
+
+def log_order(action, trade_id, symbol, side, qty, response, started):
+    # One structured record per exchange order; the trade_id in the message keeps failures out of rate limiting
+    latency_ms = elapsed_ms(started)
+    ret_code = response['retCode'] if response else None
+    fields = {'trade_id': trade_id, 'symbol': symbol, 'side': side, 'qty': qty, 'ret_code': ret_code, 'latency_ms': latency_ms}
+    if ret_code == 0:
+        logger.info("%s order %s: %s %s %s in %.1f ms", action, trade_id, side, qty, symbol, latency_ms, extra=fields)
+    else:
+        logger.error("%s order %s failed: %s %s %s: %s", action, trade_id, side, qty, symbol,
+                     response['retMsg'] if response else 'No response', extra=fields)
+
+class AccountStateSignals(QObject):
+    # Carries private stream pushes from the websocket thread to the GUI thread
+    updated = pyqtSignal(str)
+
+class AccountSummarySignals(QObject):
+    # Hands finished multi-account summaries from the summary thread to the GUI thread
+    ready = pyqtSignal(object)
+
+class CandleHistorySignals(QObject):
+    # Tells the GUI thread that older candles of a symbol finished backfilling
+    loaded = pyqtSignal(str)
+
+class LivePriceSignals(QObject):
+    # Tells the GUI thread that streamed ticks are waiting to be flushed
+    updated = pyqtSignal()
+
+class SymbolCompleter(QCompleter):
+    """Completer whose candidates come from the symbol index on every edit,
+    so prefix and typo matches are shown as-is rather than re-filtered by Qt."""
+
+    def __init__(self, line_edit, index):
+        super().__init__(line_edit)
+        self.index = index
+        self.model = QStringListModel(self)
+        self.setModel(self.model)
+        self.setCaseSensitivity(Qt.CaseInsensitive)
+        self.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.setMaxVisibleItems(SYMBOL_COMPLETIONS)
+        line_edit.setCompleter(self)
+        line_edit.textEdited.connect(self.update_candidates)
+
+    def update_candidates(self, text):
+        self.model.setStringList(self.index.complete(text))
+
+class PositionRows:
+    """Row widgets for one positions list, reused across refreshes.
+
+    Rows are relabelled in place and surplus rows hidden, so a refresh
+    never creates widgets unless the list grew past its largest size
+    so far, and nothing waits on deleteLater.
+    """
+
+    def __init__(self, layout, on_close=None):
+        self.layout = layout
+        self.on_close = on_close
+        self.rows = []  # [widget, label, close button or None, trade_id]
+        self.used = 0
+
+    def begin(self):
+        self.used = 0
+
+    def add(self, text, trade_id=None):
+        if self.used == len(self.rows):
+            widget = QWidget()
+            row_layout = QHBoxLayout(widget)
+            row_layout.setContentsMargins(0, 5, 0, 5)  # Adjust top and bottom margins
+            label = QLabel()
+            row_layout.addWidget(label)
+            row = [widget, label, None, None]
+            if self.on_close is not None:
+                close_button = QPushButton("Close")
+                close_button.clicked.connect(lambda checked, row=row: self.on_close(row[3]))
+                row_layout.addWidget(close_button)
+                row[2] = close_button
+            self.layout.addWidget(widget)
+            self.rows.append(row)
+        row = self.rows[self.used]
+        self.used += 1
+        row[1].setText(text)
+        row[3] = trade_id
+        if row[2] is not None:
+            row[2].setVisible(trade_id is not None)
+        row[0].setVisible(True)
+
+    def end(self):
+        for row in self.rows[self.used:]:
+            row[0].setVisible(False)
+            row[3] = None
+
+class WatchlistTile(QWidget):
+    """One mini pear chart, painted directly; repainted only when its data changed."""
+
+    def __init__(self, on_click, on_remove):
+        super().__init__()
+        self.on_click = on_click
+        self.on_remove = on_remove
+        self.index = None
+        self.label = ""
+        self.values = np.zeros(0)
+        self.ratio = self.zscore = self.change = np.nan
+        self.paints = 0
+        self.setMinimumSize(WATCHLIST_TILE_WIDTH, WATCHLIST_TILE_HEIGHT)
+        self.setToolTip("Click to chart, right-click to remove")
+
+    def set_data(self, index, label, values, ratio, zscore, change):
+        self.index = index
+        self.label = label
+        self.values = values
+        self.ratio, self.zscore, self.change = ratio, zscore, change
+        self.update()
+
+    def paintEvent(self, event):
+        self.paints += 1
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor('#252525'))
+        painter.setPen(QColor('white'))
+        painter.drawText(6, 15, self.label)
+        z = f"z {self.zscore:+.2f}" if np.isfinite(self.zscore) else "z -"
+        change = f"24h {self.change * 100:+.2f}%" if np.isfinite(self.change) else "24h -"
+        painter.drawText(6, 31, f"{self.ratio:.6g}  {z}  {change}" if np.isfinite(self.ratio) else "loading...")
+
+        values = self.values[np.isfinite(self.values)]
+        if len(values) < 2:
+            return
+        # Sparkline scaled into the area below the text
+        top, bottom, width = 38, self.height() - 4, self.width() - 8
+        low, high = float(values.min()), float(values.max())
+        span = (high - low) or 1.0
+        xs = 4 + np.linspace(0, width, len(values))
+        ys = bottom - (values - low) / span * (bottom - top)
+        painter.setPen(QColor('#2A82DA' if not np.isfinite(self.change) or self.change >= 0 else '#DA4A2A'))
+        painter.drawPolyline(QPolygonF([QPointF(x, y) for x, y in zip(xs, ys)]))
+
+    def mousePressEvent(self, event):
+        if self.index is None:
+            return
+        if event.button() == Qt.LeftButton:
+            self.on_click(self.index)
+        elif event.button() == Qt.RightButton:
+            self.on_remove(self.index)
+
+class WatchlistWindow(QWidget):
+    def __init__(self, parent):
+        super().__init__(parent, Qt.Window)
+        self.setWindowTitle("Pear Tradooor - Watchlist")
+        self.watchlist = Watchlist.load()
+        self.tiles = []  # Reused across refreshes like PositionRows
+
+        layout = QVBoxLayout(self)
+        self.entry_input = QLineEdit()
+        self.entry_input.setPlaceholderText("Add pear (e.g., SOL/BTC or ETHUSDT:1,SOLUSDT:1,BTCUSDT:-2)")
+        self.entry_input.returnPressed.connect(self.add_entry)
+        layout.addWidget(self.entry_input)
+        self.grid = QGridLayout()
+        layout.addLayout(self.grid)
+        layout.addStretch()
+        self.setStyleSheet("QWidget { background-color: #353535; color: white; } "
+                           "QLineEdit { background-color: #252525; border: 1px solid #555555; }")
+
+    def refresh(self):
+        parent = self.parent()
+        ok = self.watchlist.refresh(parent.bybit_client, parent.candle_cache)
+        self.render(self.watchlist.compute(parent.candle_cache))
+        return ok
+
+    def render(self, changed):
+        watchlist = self.watchlist
+        while len(self.tiles) < len(watchlist):
+            tile = WatchlistTile(self.promote, self.remove_entry)
+            self.grid.addWidget(tile, len(self.tiles) // WATCHLIST_COLUMNS, len(self.tiles) % WATCHLIST_COLUMNS)
+            self.tiles.append(tile)
+        for index, tile in enumerate(self.tiles):
+            tile.setVisible(index < len(watchlist))
+        for index in changed:
+            self.tiles[index].set_data(index, watchlist.labels[index], watchlist.values[index],
+                                       watchlist.ratio[index], watchlist.zscore[index], watchlist.change[index])
+
+    def add_entry(self):
+        text = self.entry_input.text().strip()
+        if not text:
+            return
+        try:
+            weights = parse_entry(text)
+        except ValueError as e:
+            QMessageBox.warning(self, "Invalid Pear", str(e))
+            return
+        errors = self.parent().symbol_errors(weights)
+        if errors:
+            QMessageBox.warning(self, "Invalid Symbols", "\n".join(errors))
+            return
+        if len(self.watchlist) >= WATCHLIST_MAX_TILES:
+            QMessageBox.warning(self, "Watchlist Full", f"The watchlist holds at most {WATCHLIST_MAX_TILES} pears.")
+            return
+        if self.watchlist.add(weights):
+            self.watchlist.save()
+            self.entry_input.clear()
+            self.refresh()
+
+    def remove_entry(self, index):
+        self.watchlist.remove(index)
+        self.watchlist.save()
+        # Indices shift after a removal, so every tile is relabelled from the cache
+        self.render(self.watchlist.compute(self.parent().candle_cache))
+
+    def promote(self, index):
+        self.parent().promote_pear(self.watchlist.entries[index])
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.set_polling(True)
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.set_polling(False)
+
+    def set_polling(self, active):
+        scheduler = self.parent().scheduler
+        if 'watchlist' not in scheduler.subscriptions:
+            return
+        if active:
+            scheduler.resume('watchlist')
         else:
-            logger.error("Invalid data structure for data2.")
-            return None
-        
-        df1['close'] = df1['close'].astype(float)
-        df2['close'] = df2['close'].astype(float)
-        
-        # Convert timestamp to datetime
-        df1['timestamp'] = pd.to_datetime(df1['timestamp'].astype(int), unit='ms')
-        df2['timestamp'] = pd.to_datetime(df2['timestamp'].astype(int), unit='ms')
-        
-        # Set timestamp as index
-        df1.set_index('timestamp', inplace=True)
-        df2.set_index('timestamp', inplace=True)
-        
-        # Align the dataframes and calculate the pair_price
-        df1, df2 = df1.align(df2, join='inner')
-        pair_price = df2['close'] / df1['close']
-        
-        return pair_price
-    except Exception as e:
-        logger.error(f"Error calculating pair price: {e}")
-        logger.debug(f"Data1: {data1}, Data2: {data2}")  # Log the data for debugging
-        return None
+            scheduler.pause('watchlist')
+        if scheduler.running:
+            self.parent().schedule_polls()
+
+    def closeEvent(self, event):
+        self.hide()
+        self.parent().control_panel.toggle_watchlist_button.setText("Show Watchlist")
+        event.ignore()
 
 class ControlPanel(QWidget):
     def __init__(self, parent=None):
@@ -101,6 +320,13 @@ class ControlPanel(QWidget):
         self.setWindowTitle("Pear Tradooor - Control Panel")
         self.setWindowFlags(self.windowFlags() | Qt.WindowStaysOnTopHint)
         self.bybit_client = parent.bybit_client  # Add this line to use the Bybit API client
+        self.account_state = parent.account_state
+        self.private_stream = parent.private_stream
+        self.account_manager = parent.account_manager
+        self.risk_engine = RiskEngine(funding=parent.funding_book)
+        self.profile_capture = ProfileCapture()
+        # Multi-account pears hold totals across accounts, so only single-account pears are reconciled
+        self.reconciler = None if self.account_manager else PositionReconciler()
         self.positions_text = None  # Initialize positions_text
 
         layout = QVBoxLayout()
@@ -108,12 +334,33 @@ class ControlPanel(QWidget):
         self.account_info_label = QLabel("Account Balance: $0.00")
         layout.addWidget(self.account_info_label)
 
+        # Per-account equity when orders fan out to several accounts
+        self.accounts_label = QLabel("")
+        self.accounts_label.setVisible(bool(self.account_manager))
+        layout.addWidget(self.accounts_label)
+        # Worker replies can take up to ACCOUNT_CALL_TIMEOUT, so summaries are requested off the GUI thread
+        self.account_summary_executor = ThreadPoolExecutor(max_workers=1)
+        self.account_summary_future = None
+        self.account_summary_signals = AccountSummarySignals()
+        self.account_summary_signals.ready.connect(self.show_account_summary)
+
         self.combined_upnl_label = QLabel("Pear UPnL: $0.00")
         layout.addWidget(self.combined_upnl_label)
 
+        # Net pear exposure with each leg scaled by its beta to BETA_BENCHMARK
+        self.beta_exposure_label = QLabel("Beta Exposure: $0.00")
+        layout.addWidget(self.beta_exposure_label)
+
         self.apple_upnl_label = QLabel("Apple UPnL: $0.00")
         layout.addWidget(self.apple_upnl_label)
 
+        # Realized PnL from the trade log; a first build of a large log runs off the GUI thread
+        self.trade_stats = None
+        self.trade_stats_executor = ThreadPoolExecutor(max_workers=1)
+        self.trade_stats_future = self.trade_stats_executor.submit(TradeStats.open_or_build)
+        self.trade_stats_label = QLabel("  Realized: reading trade log...")
+        layout.addWidget(self.trade_stats_label)
+
         # Add toggle buttons for trading panel and chart window
         toggle_buttons_layout = QHBoxLayout()
 
@@ -125,6 +372,16 @@ class ControlPanel(QWidget):
         self.toggle_chart_window_button.clicked.connect(self.toggle_chart_window)
         toggle_buttons_layout.addWidget(self.toggle_chart_window_button)
 
+        self.profile_button = QPushButton("Start Profile")
+        self.profile_button.clicked.connect(self.toggle_profile_capture)
+        # Slots and API calls are only traced when PROFILER_ENABLED is set at startup
+        self.profile_button.setVisible(tracer.enabled)
+        toggle_buttons_layout.addWidget(self.profile_button)
+
+        self.toggle_watchlist_button = QPushButton("Show Watchlist")
+        self.toggle_watchlist_button.clicked.connect(self.toggle_watchlist)
+        toggle_buttons_layout.addWidget(self.toggle_watchlist_button)
+
         layout.addLayout(toggle_buttons_layout)
 
         self.script_positions_label = QLabel("  Open Pears:")
@@ -134,10 +391,28 @@ class ControlPanel(QWidget):
         script_positions_widget = QWidget()
         script_positions_widget.setLayout(self.script_positions_layout)
         layout.addWidget(script_positions_widget)
+        self.pear_rows = PositionRows(self.script_positions_layout, on_close=self.close_position)
 
         self.close_all_button = QPushButton("Close All Pears")
         layout.addWidget(self.close_all_button)
 
+        # Pear legs the exchange no longer fully holds
+        self.reconcile_label = QLabel("")
+        self.reconcile_label.setVisible(False)
+        layout.addWidget(self.reconcile_label)
+
+        self.fix_legs_button = QPushButton("Fix Legs")
+        self.fix_legs_button.clicked.connect(self.fix_mismatched_legs)
+        self.fix_legs_button.setVisible(False)
+        layout.addWidget(self.fix_legs_button)
+
+        # Triggers whose order failed; they stay armed and are retried
+        self.failed_triggers = {}  # trigger_id -> description
+        self.trigger_alert_label = QLabel("")
+        self.trigger_alert_label.setStyleSheet("color: red;")
+        self.trigger_alert_label.setVisible(False)
+        layout.addWidget(self.trigger_alert_label)
+
         self.all_positions_label = QLabel("  Open Apples:")
         layout.addWidget(self.all_positions_label)
 
@@ -145,6 +420,7 @@ class ControlPanel(QWidget):
         all_positions_widget = QWidget()
         all_positions_widget.setLayout(self.all_positions_layout)
         layout.addWidget(all_positions_widget)
+        self.apple_rows = PositionRows(self.all_positions_layout)
 
         self.setLayout(layout)
 
@@ -174,20 +450,54 @@ class ControlPanel(QWidget):
             }
             QLabel { color: white; }
         """)
+    @traced('ControlPanel.update_positions')
     def update_positions(self, positions):
         self.update_account_info()
+        self.update_pear_positions(positions)
+        self.update_apple_positions()
 
-        # Clear existing layouts
-        self.clear_layout(self.script_positions_layout)
-        self.clear_layout(self.all_positions_layout)
+        # Force update of the layout
+        self.updateGeometry()
 
-        # Update script positions
-        if positions and isinstance(positions, list):
+    def update_pear_positions(self, positions):
+        # Price every pear leg (and every symbol a trigger watches) in one pass before building the rows
+        self.risk_engine.set_pears(positions)
+        symbols = set(self.risk_engine.active_symbols())
+        if hasattr(self.parent(), 'trigger_engine'):
+            symbols |= self.parent().trigger_engine.symbols()
+        prices = self.bybit_client.get_last_prices(symbols)
+        self.risk_engine.update_prices(prices)
+        if self.reconciler is not None:
+            self.reconciler.sync_pears(positions)
+        self.render_pear_positions(positions)
+        # get_last_prices leaves out symbols it could not price and returns {} on failure
+        return symbols <= prices.keys()
+
+    def apply_live_prices(self, prices, positions):
+        # Streamed ticks between polls reprice the last pass without any request
+        if [position.trade_id for position in positions] != self.risk_engine.trade_ids:
+            return  # Pears changed since the last poll, which will rebuild the rows
+        self.risk_engine.update_prices(prices)
+        self.render_pear_positions(positions)
+
+    def render_pear_positions(self, positions):
+        self.risk_engine.compute()
+        self.pear_rows.begin()
+        if positions:
             for index, position in enumerate(positions):
-                self.add_position_to_layout(position, index, self.script_positions_layout, is_script_position=True)
+                self.add_position_to_layout(position, index, self.pear_rows, is_script_position=True)
         else:
-            no_positions_label = QLabel("- - - - -")
-            self.script_positions_layout.addWidget(no_positions_label)
+            self.pear_rows.add("- - - - -")
+        self.pear_rows.end()
+
+        # Display combined UPnL for Pears
+        engine = self.risk_engine
+        self.combined_upnl_label.setText(f"  Pear UPnL: ${engine.total_upnl + engine.total_funding:.2f} "
+                                         f"(funding ${engine.total_funding:+.2f}, next ${engine.total_projected_funding:+.2f})")
+        self.beta_exposure_label.setText(f"  Beta Exposure: ${engine.total_beta_exposure:+.2f} (vs {BETA_BENCHMARK})")
+
+    def update_apple_positions(self):
+        self.apple_rows.begin()
 
         # Update all positions
         all_positions = self.get_all_open_positions()
@@ -195,121 +505,131 @@ class ControlPanel(QWidget):
             # Handle the case when all_positions is None
             if self.positions_text is not None:
                 self.positions_text.set_text("No positions data available")
-            return
+            self.apple_rows.end()
+            return False
+
+        if self.reconciler is not None:
+            self.reconciler.apply_positions(all_positions)
+            self.update_reconciliation_view()
 
-        combined_apple_upnl = sum(float(position.get('unrealisedPnl', 0)) for position in all_positions if isinstance(position, dict))
+        combined_apple_upnl = float(np.fromiter((float(position.get('unrealisedPnl', 0) or 0) for position in all_positions if isinstance(position, dict)), dtype=float).sum())
         self.apple_upnl_label.setText(f"  Apple UPnL: ${combined_apple_upnl:.2f}")
 
         if all_positions:
             for index, position in enumerate(all_positions):
-                self.add_position_to_layout(position, index, self.all_positions_layout, is_script_position=False)
+                self.add_position_to_layout(position, index, self.apple_rows, is_script_position=False)
         else:
-            no_positions_label = QLabel("- - - - -")
-            self.all_positions_layout.addWidget(no_positions_label)
-
-        # Calculate and display combined UPnL for Pears
-        combined_pear_upnl = sum(position.get('combined_upnl', 0) for position in positions if isinstance(position, dict))
-        self.combined_upnl_label.setText(f"  Pear UPnL: ${combined_pear_upnl:.2f}")
-
-        # Force update of the layout
-        self.updateGeometry()
+            self.apple_rows.add("- - - - -")
+        self.apple_rows.end()
+        return True
+
+    def update_reconciliation_view(self):
+        mismatches = self.reconciler.refresh()
+        self.reconcile_label.setVisible(bool(mismatches))
+        self.fix_legs_button.setVisible(bool(mismatches))
+        if mismatches:
+            self.reconcile_label.setText("  Mismatched legs:\n" + "\n".join(
+                f"    {mismatch.symbol} {mismatch.kind}: pears {mismatch.expected:.8g}, exchange {mismatch.actual:.8g}"
+                for mismatch in mismatches
+            ))
+            self.reconcile_label.setStyleSheet("color: orange;")
+
+    def show_trigger_failure(self, trigger):
+        target = trigger.trade_id or "/".join(trigger.pair or ())
+        self.failed_triggers[trigger.trigger_id] = f"{trigger.kind} {trigger.action} {target}"
+        self.update_trigger_alerts()
+
+    def clear_trigger_failure(self, trigger_id):
+        if self.failed_triggers.pop(trigger_id, None) is not None:
+            self.update_trigger_alerts()
+
+    def update_trigger_alerts(self):
+        # Drop alerts for triggers that are gone, e.g. because their pear was closed by hand
+        armed = self.parent().trigger_engine.triggers
+        self.failed_triggers = {trigger_id: text for trigger_id, text in self.failed_triggers.items() if trigger_id in armed}
+        self.trigger_alert_label.setVisible(bool(self.failed_triggers))
+        self.trigger_alert_label.setText("  Failed triggers, re-armed:\n" + "\n".join(
+            f"    {text}" for text in self.failed_triggers.values()
+        ))
+
+    def fix_mismatched_legs(self):
+        orders = self.reconciler.corrective_orders()
+        if not orders:
+            return
+        summary = "\n".join(f"{side} {qty:.8g} {symbol}" for symbol, side, qty in orders)
+        if QMessageBox.question(self, "Fix Legs", f"Place corrective market orders?\n{summary}") != QMessageBox.Yes:
+            return
+        failed = []
+        for symbol, side, qty in orders:
+            qty = round(qty, self.bybit_client.get_quantity_precision(symbol))
+            started = time.perf_counter()
+            response = self.bybit_client.place_order(symbol=symbol, side=side, order_type="Market", qty=qty)
+            log_order("Corrective", None, symbol, side, qty, response, started)
+            if not response or response['retCode'] != 0:
+                failed.append(f"{symbol}: {response['retMsg'] if response else 'No response'}")
+        if failed:
+            QMessageBox.warning(self, "Error", "Failed corrective orders:\n" + "\n".join(failed))
+        self.parent().refresh_positions()
+
+    def stream_is_live(self):
+        return self.private_stream is not None and self.private_stream.is_connected()
+
+    def add_position_to_layout(self, position, index, rows, is_script_position):
+        if is_script_position:
+            # Single-leg pears are legs kept after a failed unwind and must stay visible
+            if isinstance(position, Pear) and position.legs:
+                position_type = position.type.upper()[:1]
+                if index < self.risk_engine.pear_count:
+                    # UPnL and dollar value come from the risk engine's last pass
+                    average_dollar_value = self.risk_engine.pear_entry_value[index]
+                    combined_upnl = float(self.risk_engine.pear_upnl[index])
+                    position.combined_upnl = combined_upnl
+                    # Shown PnL includes the funding both legs have paid or received
+                    funding = float(self.risk_engine.pear_funding[index])
+                    pnl = combined_upnl + funding
 
-    def clear_layout(self, layout):
-        while layout.count():
-            item = layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-
-    def add_position_to_layout(self, position, index, layout, is_script_position):
-        if isinstance(position, dict):
-            if is_script_position:
-                position_type = position.get('type', '').upper()[0]
-                symbols = [key for key in position.keys() if key not in ['type', 'timestamp', 'timestamp_rounded', 'combined_upnl', 'trade_id']]
-                if len(symbols) >= 2:
-                    symbol1, symbol2 = symbols[:2]
-                    pos1 = position.get(symbol1, {})
-                    pos2 = position.get(symbol2, {})
-                    if isinstance(pos1, dict) and isinstance(pos2, dict):
-                        qty1 = pos1.get('qty', 0)
-                        qty2 = pos2.get('qty', 0)
-                        entry_price1 = pos1.get('entry_price', 0)
-                        entry_price2 = pos2.get('entry_price', 0)
-                        
-                        # Calculate dollar values
-                        dollar_value1 = qty1 * entry_price1
-                        dollar_value2 = qty2 * entry_price2
-                        average_dollar_value = (dollar_value1 + dollar_value2) / 2
-                        
-                        # Calculate combined UPNL
-                        current_price1 = self.get_current_price(symbol1)
-                        current_price2 = self.get_current_price(symbol2)
-                        upnl1 = (current_price1 - entry_price1) * qty1 * (-1 if pos1['side'] == 'Sell' else 1)
-                        upnl2 = (current_price2 - entry_price2) * qty2 * (-1 if pos2['side'] == 'Sell' else 1)
-                        combined_upnl = upnl1 + upnl2
-                        position['combined_upnl'] = combined_upnl
-                        
-                        # Calculate percentage UPNL
-                        order_size = self.get_order_size()
-                        upnl_percentage = (combined_upnl / order_size) * 100 if order_size else 0
-                        
-                        # Truncate symbols
-                        symbol1_truncated = symbol1[:-4] if symbol1.endswith(('USDT', 'USDC')) else symbol1
-                        symbol2_truncated = symbol2[:-4] if symbol2.endswith(('USDT', 'USDC')) else symbol2
-                        
-                        position_text = f"{position_type} ${average_dollar_value:.2f} {symbol2_truncated}/{symbol1_truncated} ${combined_upnl:.2f} {upnl_percentage:.2f}%"
-                        
-                        position_widget = QWidget()
-                        position_layout = QHBoxLayout(position_widget)
-                        position_layout.setContentsMargins(0, 5, 0, 5)  # Adjust top and bottom margins
-                        position_label = QLabel(position_text)
-                        position_layout.addWidget(position_label)
-                        
-                        close_button = QPushButton("Close")
-                        close_button.clicked.connect(lambda checked, idx=index: self.close_position(idx))
-                        position_layout.addWidget(close_button)
-                        
-                        layout.addWidget(position_widget)
-                    else:
-                        logger.error(f"Invalid position data structure for {symbol1} or {symbol2}")
-            else:
-                try:
-                    symbol = position['symbol']
-                    qty = float(position['size'])
-                    entry_price = float(position.get('entryPrice', position.get('entry_price', 0)))
-                    side = position['side']
-                    unrealised_pnl = float(position.get('unrealisedPnl', position.get('unrealized_pnl', 0)))
-                    
-                    # Get current price
-                    current_price = self.get_current_price(symbol)
-                    
-                    # Calculate dollar value using current price
-                    dollar_value = qty * current_price if current_price else 0
-
-                    # Calculate initial position value
-                    initial_position_value = dollar_value - unrealised_pnl
-                    
                     # Calculate percentage UPNL
                     order_size = self.get_order_size()
-                    upnl_percentage = (unrealised_pnl / initial_position_value) * 100 if initial_position_value else 0
-                    
-                    # Truncate symbol
-                    symbol_truncated = symbol[:-4] if symbol.endswith(('USDT', 'USDC')) else symbol
-                    
-                    position_text = f"{'L' if side == 'Buy' else 'S'} ${initial_position_value:.2f} {symbol_truncated} ${unrealised_pnl:.2f} {upnl_percentage:.2f}%"
-                    
-                    position_widget = QWidget()
-                    position_layout = QHBoxLayout(position_widget)
-                    position_layout.setContentsMargins(0, 5, 0, 5)  # Adjust top and bottom margins
-                    position_label = QLabel(position_text)
-                    position_layout.addWidget(position_label)
-                    
-                    layout.addWidget(position_widget)
-                except KeyError as e:
-                    logger.error(f"KeyError in position data: {e}")
-                    logger.error(f"Position data: {position}")
-                except Exception as e:
-                    logger.error(f"Error processing position: {e}")
-                    logger.error(f"Position data: {position}")
+                    upnl_percentage = (pnl / order_size) * 100 if order_size else 0
+
+                    position_text = f"{position_type} ${average_dollar_value:.2f} {position.label()} ${pnl:.2f} {upnl_percentage:.2f}% (fund ${funding:+.2f})"
+                    rows.add(position_text, trade_id=position.trade_id)
+                else:
+                    logger.error("No risk data for pear %s", position.label())
+            else:
+                logger.error("Invalid pear data: %s", position)
+        elif isinstance(position, dict):
+            try:
+                symbol = position['symbol']
+                qty = float(position['size'])
+                entry_price = float(position.get('entryPrice', position.get('entry_price', 0)))
+                side = position['side']
+                unrealised_pnl = float(position.get('unrealisedPnl', position.get('unrealized_pnl', 0)))
+                
+                # Use the mark price carried by the position itself, falling back to a ticker call
+                current_price = float(position.get('markPrice') or 0) or self.get_current_price(symbol)
+                
+                # Calculate dollar value using current price
+                dollar_value = qty * current_price if current_price else 0
+
+                # Calculate initial position value
+                initial_position_value = dollar_value - unrealised_pnl
+                
+                # Calculate percentage UPNL
+                order_size = self.get_order_size()
+                upnl_percentage = (unrealised_pnl / initial_position_value) * 100 if initial_position_value else 0
+                
+                # Truncate symbol
+                symbol_truncated = symbol[:-4] if symbol.endswith(('USDT', 'USDC')) else symbol
+                
+                position_text = f"{'L' if side == 'Buy' else 'S'} ${initial_position_value:.2f} {symbol_truncated} ${unrealised_pnl:.2f} {upnl_percentage:.2f}%"
+                rows.add(position_text)
+            except KeyError as e:
+                logger.error("KeyError in position data: %s", e)
+                logger.error("Position data: %s", position)
+            except Exception as e:
+                logger.error("Error processing position: %s", e)
+                logger.error("Position data: %s", position)
 
     def get_current_price(self, symbol):
         try:
@@ -317,10 +637,10 @@ class ControlPanel(QWidget):
             if ticker and ticker['retCode'] == 0:
                 return float(ticker['result']['list'][0]['lastPrice'])
             else:
-                logger.error(f"Error getting current price for {symbol}: {ticker['retMsg'] if ticker else 'No response'}")
+                logger.error("Error getting current price for %s: %s", symbol, ticker['retMsg'] if ticker else 'No response')
                 return None
         except Exception as e:
-            logger.error(f"Error getting current price for {symbol}: {e}")
+            logger.error("Error getting current price for %s: %s", symbol, e)
             return None
 
     def get_order_size(self):
@@ -333,32 +653,72 @@ class ControlPanel(QWidget):
         self.parent().close()
         event.accept()
 
-    def close_position(self, index):
+    def close_position(self, trade_id):
         if hasattr(self.parent(), 'trading_dialog'):
-            self.parent().trading_dialog.close_position(index)
+            self.parent().trading_dialog.close_position(trade_id)
         else:
             QMessageBox.warning(self, "Error", "Trading dialog not initialized.")
 
     def get_account_info(self):
+        if self.stream_is_live() and self.account_state.wallet_synced:
+            return self.account_state.get_total_equity()
         try:
-            account_info = self.bybit_client.get_wallet_balance(accountType="UNIFIED")
+            account_info = self.bybit_client.get_wallet_balance(accountType=BYBIT_ACCOUNT_TYPE)
             if account_info and account_info['retCode'] == 0:
                 wallet_info = account_info['result']['list'][0]
                 total_equity = float(wallet_info['totalEquity'])
                 return total_equity
             else:
-                logger.error(f"Error getting account info: {account_info['retMsg'] if account_info else 'No response'}")
+                logger.error("Error getting account info: %s", account_info['retMsg'] if account_info else 'No response')
                 return None
         except Exception as e:
-            logger.error(f"Error getting account info: {e}")
+            logger.error("Error getting account info: %s", e)
             return None
         
+    @traced('ControlPanel.update_account_info')
     def update_account_info(self):
+        if self.account_manager:
+            if self.account_summary_future is None or self.account_summary_future.done():
+                self.account_summary_future = self.account_summary_executor.submit(self.account_manager.summary)
+                self.account_summary_future.add_done_callback(self.account_summary_signals.ready.emit)
+            return True
         total_equity = self.get_account_info()
         if total_equity is not None:
             self.account_info_label.setText(f"  Account Balance: ${total_equity:.2f}")
         else:
             self.account_info_label.setText("  Account Balance: N/A")
+        return total_equity is not None
+
+    @traced('ControlPanel.show_account_summary')
+    def show_account_summary(self, future):
+        try:
+            view = aggregate_summary(future.result())
+        except Exception as e:
+            logger.error("Error getting account summaries: %s", e)
+            self.account_info_label.setText("  Account Balance: N/A")
+            return
+        self.account_info_label.setText(f"  Account Balance: ${view['total_equity']:.2f} ({len(view['lines'])} accounts)")
+        self.accounts_label.setText("\n".join(f"    {line}" for line in view['lines']))
+
+    @traced('ControlPanel.update_trade_stats')
+    def update_trade_stats(self):
+        if self.trade_stats is None:
+            if not self.trade_stats_future.done():
+                return True
+            self.trade_stats = self.trade_stats_future.result()
+            self.trade_stats_executor.shutdown(wait=False)
+        self.trade_stats.update()
+        self.trade_stats_label.setText(self.trade_stats.status_text())
+        return True
+
+    def toggle_profile_capture(self):
+        if self.profile_capture.active:
+            paths = self.profile_capture.stop()
+            self.profile_button.setText("Start Profile")
+            QMessageBox.information(self, "Profile saved", "\n".join(paths))
+        else:
+            self.profile_capture.start()
+            self.profile_button.setText("Stop Profile")
 
     def toggle_trading_panel(self):
         parent = self.parent()
@@ -367,6 +727,13 @@ class ControlPanel(QWidget):
         else:
             logger.warning("Parent does not have toggle_trading_panel method")
 
+    def toggle_watchlist(self):
+        parent = self.parent()
+        if hasattr(parent, 'toggle_watchlist'):
+            parent.toggle_watchlist()
+        else:
+            logger.warning("Parent does not have toggle_watchlist method")
+
     def toggle_chart_window(self):
         parent = self.parent()
         if hasattr(parent, 'toggle_chart_window'):
@@ -375,6 +742,8 @@ class ControlPanel(QWidget):
             logger.warning("Parent does not have toggle_chart_window method")
 
     def get_all_open_positions(self):
+        if self.stream_is_live() and self.account_state.positions_synced:
+            return self.account_state.get_open_positions()
         try:
             positions = self.bybit_client.get_positions(
                 category=BYBIT_CATEGORY,
@@ -383,20 +752,40 @@ class ControlPanel(QWidget):
             if positions and positions['retCode'] == 0:
                 return [pos for pos in positions['result']['list'] if float(pos['size']) > 0]
             else:
-                logger.error(f"Error getting all open positions: {positions['retMsg'] if positions else 'No response'}")
+                logger.error("Error getting all open positions: %s", positions['retMsg'] if positions else 'No response')
                 return None
         except Exception as e:
-            logger.error(f"Error getting all open positions: {e}")
+            logger.error("Error getting all open positions: %s", e)
             return None
 
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Pear Tradooor - Chart")
+        self.scheduler = PollScheduler()
         screen = QApplication.primaryScreen().geometry()
 
         # Initialize the bybit_client before creating the ControlPanel
         self.bybit_client = self.initialize_bybit_client()
+        self.account_state = AccountState()
+        self.private_stream = self.initialize_private_stream()
+        # Streamed tickers move the chart and pear UPnL between polls, flushed at most every LIVE_PRICE_FLUSH_MS
+        self.live_prices = LivePrices()
+        self.live_price_signals = LivePriceSignals()
+        self.live_price_signals.updated.connect(self.on_live_prices)
+        self.live_prices.add_listener(self.live_price_signals.updated.emit)
+        self.live_price_timer = QTimer(self)
+        self.live_price_timer.setSingleShot(True)
+        self.live_price_timer.timeout.connect(self.flush_live_prices)
+        self.public_stream = self.initialize_public_stream()
+        self.trigger_engine = TriggerEngine()
+        self.account_manager = self.initialize_account_manager()
+        # Paper, testnet and mainnet list different instruments, so the cache records which one it holds
+        self.symbol_index = SymbolIndex.load_or_fetch(self.bybit_client, source=exchange_source())
+        if not len(self.symbol_index):
+            logger.warning("Symbol index unavailable; symbols are only checked when orders are sent")
+        # The paper exchange's clock runs PAPER_MINUTES_PER_SECOND simulated minutes per second
+        self.funding_book = FundingBook.load(clock_rate=PAPER_MINUTES_PER_SECOND * 60 if PAPER_TRADING else 1.0)
 
         self.control_panel = ControlPanel(self)
         control_panel_width = self.control_panel.width()
@@ -411,46 +800,328 @@ class MainWindow(QMainWindow):
         self.chart_layout = QVBoxLayout(self.chart_widget)
         self.layout.addWidget(self.chart_widget)
 
+        interval_layout = QHBoxLayout()
+        interval_layout.addWidget(QLabel("Interval:"))
+        self.interval_combo = QComboBox()
+        self.interval_combo.addItems(CHART_INTERVALS)
+        self.interval_combo.setCurrentText(CHART_DEFAULT_INTERVAL)
+        self.interval_combo.currentTextChanged.connect(self.set_chart_interval)
+        interval_layout.addWidget(self.interval_combo)
+        interval_layout.addStretch()
+        self.chart_layout.addLayout(interval_layout)
+
         # Initialize trading dialog with default symbols
         self.symbol1 = DEFAULT_SYMBOL1
         self.symbol2 = DEFAULT_SYMBOL2
+        self.weights = pair_weights(self.symbol1, self.symbol2)  # Basket weights of the charted pear
         self.trading_dialog = TradingDialog(self, self.symbol1, self.symbol2)
         self.trading_dialog.show()
 
-        # Create control panel as a separate window
-        self.control_panel = ControlPanel(self)
+        # The control panel created above is the only one; it is a separate window
         self.control_panel.close_all_button.clicked.connect(self.close_all_positions)
         self.control_panel.show()
 
+        # One figure, canvas and animation for the whole session; switching pears only changes the data
         self.fig = None
         self.ax = None
         self.canvas = None
-        self.ani = None
-
-        # Set up a timer to refresh positions
-        self.refresh_timer = QTimer(self)
-        self.refresh_timer.timeout.connect(self.refresh_positions)
-        self.refresh_timer.start(UPDATE_INTERVAL)  # Refresh every 10 seconds
-
-        # Load position information
+        self.price_line = None
+        self.price_level = None
+        self.position_markers = []
+
+        # Minute candles are cached per symbol; every interval is aggregated from them
+        self.candle_cache = CandleCache(self.bybit_client)
+        # The recent page is drawn first; older pages are fetched off the GUI thread and redrawn on arrival
+        self.backfill_executor = ThreadPoolExecutor(max_workers=2)
+        self.backfilling = set()
+        self.candle_history_signals = CandleHistorySignals()
+        self.candle_history_signals.loaded.connect(self.history_loaded)
+        self.chart_interval = CHART_DEFAULT_INTERVAL
+        self.basket_key = None
+        self.basket_series = None
+        self.chart_series_interval = None
+        self.chart_ms = self.chart_x = self.chart_y = None
+        self.chart_view = None  # None follows the latest candles, else (x_min, x_max, follow)
+        self.chart_drag = None
+
+        # Watchlist tiles read the same candle cache, so promoting one to the chart needs no fetch
+        self.watchlist_window = WatchlistWindow(self)
+        self.watchlist_window.resize(WATCHLIST_COLUMNS * (WATCHLIST_TILE_WIDTH + 8), 4 * (WATCHLIST_TILE_HEIGHT + 8))
+
+        # Private stream pushes are coalesced so a fill refreshes the panel once
+        self.account_signals = AccountStateSignals()
+        self.account_signals.updated.connect(self.on_account_update)
+        self.account_state.add_listener(self.account_signals.updated.emit)
+        self.account_push_timer = QTimer(self)
+        self.account_push_timer.setSingleShot(True)
+        self.account_push_timer.timeout.connect(self.refresh_account_view)
+
+        # Every polled feed runs on its own cadence from one single-shot timer
+        self.scheduler.add('pears', self.poll_pears, PEARS_POLL_INTERVAL, PEARS_POLL_FAST, PEARS_POLL_IDLE)
+        self.scheduler.add('positions', self.control_panel.update_apple_positions, POSITIONS_POLL_INTERVAL,
+                           idle_interval=POSITIONS_POLL_IDLE)
+        self.scheduler.add('account', self.control_panel.update_account_info, ACCOUNT_POLL_INTERVAL,
+                           idle_interval=ACCOUNT_POLL_IDLE)
+        self.scheduler.add('chart', self.poll_chart, CHART_POLL_INTERVAL, CHART_POLL_FAST)
+        self.scheduler.add('trade_stats', self.control_panel.update_trade_stats, TRADE_STATS_POLL_INTERVAL)
+        self.scheduler.add('funding', self.refresh_funding, FUNDING_POLL_INTERVAL)
+        self.scheduler.add('betas', self.refresh_betas, BETAS_POLL_INTERVAL)
+        self.scheduler.add('watchlist', self.watchlist_window.refresh, WATCHLIST_POLL_INTERVAL)
+        self.scheduler.pause('chart')  # Until the chart window is shown
+        self.scheduler.pause('watchlist')  # Until the watchlist is shown
+        if self.private_stream is not None:
+            # REST reconciliation is only a safety net for the streamed state
+            self.scheduler.add('reconcile', self.reconcile_account_state, RECONCILE_INTERVAL)
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setSingleShot(True)
+        self.poll_timer.timeout.connect(self.run_polls)
+
+        # A short heartbeat lets the watchdog thread notice when the event loop stops turning
+        self.stall_watchdog = None
+        if tracer.enabled:
+            self.stall_watchdog = StallWatchdog()
+            self.heartbeat_timer = QTimer(self)
+            self.heartbeat_timer.timeout.connect(self.stall_watchdog.beat)
+            self.heartbeat_timer.start(WATCHDOG_HEARTBEAT_MS)
+            self.stall_watchdog.start()
+
+        # Load position information; the first poll refreshes the panels
         self.current_position = self.load_position()
-        self.refresh_positions()
+        self.poll_timer.start(0)
 
     def initialize_bybit_client(self):
-        # Initialize the Bybit API client with the API key and secret from environment variables
+        # One client per process, already wrapped for the data bus and tracing; a second one would
+        # open its own bus connection and, in paper mode, its own simulated market
+        global bybit_client
+        if bybit_client is None:
+            bybit_client = create_bybit_client()
+        return bybit_client
+
+    def initialize_account_manager(self):
+        if not MULTI_ACCOUNT_ENABLED:
+            return None
+        accounts = load_accounts()
+        if not accounts:
+            logger.warning("MULTI_ACCOUNT_ENABLED is set but %s lists no accounts", ACCOUNTS_FILE)
+            return None
+        manager = AccountManager(accounts)
+        manager.start()
+        return manager
+
+    def initialize_private_stream(self):
+        if not PRIVATE_STREAM_ENABLED or PAPER_TRADING:
+            return None
         if TESTNET:
             api_key = os.getenv("API_KEY_TESTNET")
             api_secret = os.getenv("API_SECRET_TESTNET")
         else:
             api_key = os.getenv("API_KEY")
             api_secret = os.getenv("API_SECRET")
-        return BybitAPIClient(api_key, api_secret)
+        stream = BybitPrivateStream(api_key, api_secret, self.account_state)
+        if not stream.start():
+            logger.warning("Private stream unavailable, falling back to REST polling")
+            return None
+        return stream
+
+    def initialize_public_stream(self):
+        if not LIVE_PRICES_ENABLED:
+            return None
+        stream = PaperTickerStream(self.bybit_client, self.live_prices) if PAPER_TRADING else BybitPublicStream(self.live_prices)
+        if not stream.start():
+            logger.warning("Public stream unavailable, prices update on polls only")
+            return None
+        return stream
+
+    def subscribe_live_prices(self):
+        if self.public_stream is not None:
+            self.public_stream.subscribe(set(self.weights) | set(self.control_panel.risk_engine.active_symbols())
+                                         | self.trigger_engine.symbols())
+
+    def on_live_prices(self):
+        if not self.live_price_timer.isActive():
+            self.live_price_timer.start(LIVE_PRICE_FLUSH_MS)
+
+    @traced('MainWindow.flush_live_prices', 'timer')
+    def flush_live_prices(self):
+        dirty = self.live_prices.take_dirty()
+        if self.fig is not None and dirty & set(self.weights):
+            self.apply_live_chart_price()
+        watched = dirty & (set(self.control_panel.risk_engine.active_symbols()) | self.trigger_engine.symbols())
+        if watched:
+            positions = self.trading_dialog.current_position if hasattr(self, 'trading_dialog') else self.current_position
+            self.control_panel.apply_live_prices(self.live_prices.fresh_prices(watched), positions)
+            # Stops fire on the tick that crossed them, not on the next pears poll
+            self.evaluate_triggers()
+
+    def apply_live_chart_price(self):
+        # The streamed pear price becomes the close of the forming candle until the next kline fetch replaces it
+        live = self.live_prices.basket_price(self.weights)
+        if live is None or self.basket_series is None or self.chart_ms is None:
+            return
+        price, ts = live
+        timestamps, values = self.basket_series
+        minute = ts // MINUTE_MS * MINUTE_MS
+        if minute < timestamps[-1]:
+            return  # Older than the fetched candles
+        if minute == timestamps[-1]:
+            values = values.copy()
+            values[-1] = price
+        else:
+            timestamps, values = np.append(timestamps, minute), np.append(values, price)
+        self.basket_series = (timestamps, values)
+
+        interval_ms = CHART_INTERVALS[self.chart_interval] * MINUTE_MS
+        bucket = minute // interval_ms * interval_ms
+        if bucket == self.chart_ms[-1]:
+            self.chart_y = self.chart_y.copy()
+            self.chart_y[-1] = price
+        elif bucket > self.chart_ms[-1]:
+            self.chart_ms = np.append(self.chart_ms, bucket)
+            self.chart_x = self.chart_ms / 86400000.0
+            self.chart_y = np.append(self.chart_y, price)
+        self.price_level.set_ydata([price, price])
+        self.redraw_visible()
+
+    @traced('MainWindow.run_polls', 'timer')
+    def run_polls(self):
+        self.update_poll_modes()
+        self.schedule_polls(self.scheduler.run_due())
+
+    def schedule_polls(self, delay=None):
+        # Re-arm the single poll timer for whichever feed is due next
+        if delay is None:
+            delay = self.scheduler.next_delay()
+        if delay is None:
+            self.poll_timer.stop()
+        else:
+            self.poll_timer.start(delay)
+
+    def update_poll_modes(self):
+        # Feeds with nothing to show, or kept current by the private stream, slow to their idle interval
+        positions = self.trading_dialog.current_position if hasattr(self, 'trading_dialog') else self.current_position
+        self.scheduler.set_idle('pears', not positions and not self.trigger_engine.triggers)
+        # Without streamed ticks armed triggers are only evaluated when pears are polled, so a failing feed keeps retrying at its normal pace
+        self.scheduler.set_max_interval('pears', PEARS_POLL_INTERVAL if self.trigger_engine.triggers else POLL_MAX_BACKOFF)
+        streamed = self.control_panel.stream_is_live() and not self.account_manager
+        self.scheduler.set_idle('positions', streamed and self.account_state.positions_synced)
+        self.scheduler.set_idle('account', streamed and self.account_state.wallet_synced)
+
+    def poll_pears(self):
+        positions = self.trading_dialog.current_position if hasattr(self, 'trading_dialog') else self.current_position
+        ok = self.control_panel.update_pear_positions(positions)
+        self.subscribe_live_prices()
+        ok = self.refresh_zscore_history() and ok
+        self.evaluate_triggers()
+        return ok
+
+    def refresh_zscore_history(self):
+        # Z-score windows are minute closes: top up the legs of armed z-score pairs once a minute
+        due = {symbol for pair in self.trigger_engine.zscore_index for symbol in pair
+               if self.candle_cache.age(symbol) >= ZSCORE_KLINE_INTERVAL}
+        ok = all([self.candle_cache.refresh(symbol, ZSCORE_WINDOW) for symbol in due])
+        self.trigger_engine.update_history(self.candle_cache)
+        return ok
+
+    def refresh_betas(self):
+        # Leg candles are topped up hourly; the regression itself is cheap and reruns on every poll
+        engine = self.control_panel.risk_engine
+        symbols = set(engine.active_symbols())
+        if not symbols:
+            return True
+        symbols.add(BETA_BENCHMARK)
+        due = {symbol for symbol in symbols if self.candle_cache.age(symbol) >= BETA_REFRESH_INTERVAL}
+        ok = all([self.candle_cache.refresh(symbol, BETA_WINDOW) for symbol in due])
+        engine.set_betas(estimate_betas({symbol: self.candle_cache.get(symbol) for symbol in symbols}, BETA_BENCHMARK))
+        return ok
+
+    def refresh_funding(self):
+        # Pear legs need settlements since they opened; the loaded pear needs its trailing average window
+        now_ms = self.funding_book.now_ms()
+        window_start = int(now_ms - FUNDING_AVERAGE_DAYS * DAY_MS)
+        since = {symbol: window_start for symbol in self.weights}
+        engine = self.control_panel.risk_engine
+        for symbol_id, opened in zip(engine.leg_symbol, engine.leg_opened):
+            symbol = engine.symbols[symbol_id]
+            since[symbol] = min(since.get(symbol, window_start), int(opened))
+        if not self.funding_book.refresh_due(since, now_ms):
+            return True
+        ok = self.funding_book.refresh(self.bybit_client, since, now_ms)
+        if hasattr(self, 'trading_dialog'):
+            self.trading_dialog.update_carry()
+        return ok
+
+    def poll_chart(self):
+        if self.fig is None:
+            return True
+        return self.update_chart(None)
+
+    def on_account_update(self, topic):
+        if not self.account_push_timer.isActive():
+            self.account_push_timer.start(ACCOUNT_PUSH_COALESCE_MS)
+
+    @traced('MainWindow.refresh_account_view')
+    def refresh_account_view(self):
+        self.control_panel.update_account_info()
+        self.control_panel.update_apple_positions()
+
+    @traced('MainWindow.reconcile_account_state', 'timer')
+    def reconcile_account_state(self):
+        if self.private_stream is None:
+            return
+        positions = self.bybit_client.get_positions(category=BYBIT_CATEGORY, settleCoin=BYBIT_SETTLE_COIN)
+        if positions and positions['retCode'] == 0:
+            self.account_state.reconcile_positions(positions['result']['list'])
+        else:
+            logger.error("Error reconciling positions: %s", positions['retMsg'] if positions else 'No response')
+        wallet = self.bybit_client.get_wallet_balance(accountType=BYBIT_ACCOUNT_TYPE)
+        if wallet and wallet['retCode'] == 0:
+            self.account_state.apply_wallet(wallet['result']['list'], BYBIT_ACCOUNT_TYPE)
+        else:
+            logger.error("Error reconciling wallet: %s", wallet['retMsg'] if wallet else 'No response')
+
+    def closeEvent(self, event):
+        self.scheduler.stop()
+        self.poll_timer.stop()
+        if self.private_stream is not None:
+            self.private_stream.stop()
+        if self.public_stream is not None:
+            self.public_stream.stop()
+        self.live_price_timer.stop()
+        self.control_panel.account_summary_executor.shutdown(wait=False)
+        self.backfill_executor.shutdown(wait=False, cancel_futures=True)
+        if self.account_manager is not None:
+            self.account_manager.stop()
+        if self.stall_watchdog is not None:
+            self.stall_watchdog.stop()
+        trade_stats = self.control_panel.trade_stats
+        if trade_stats is not None and trade_stats.unsaved_rows:
+            trade_stats.save()
+        super().closeEvent(event)
 
     def showEvent(self, event):
         super().showEvent(event)
         self.control_panel.show()
         self.control_panel.raise_()
         self.control_panel.activateWindow()
+        self.set_chart_polling(True)
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.set_chart_polling(False)
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.WindowStateChange:
+            self.set_chart_polling(not self.isMinimized())
+
+    def set_chart_polling(self, active):
+        # Klines are only fetched while someone can see the chart
+        if active:
+            self.scheduler.resume('chart')
+        else:
+            self.scheduler.pause('chart')
+        if self.scheduler.running:
+            self.schedule_polls()
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
@@ -460,100 +1131,290 @@ class MainWindow(QMainWindow):
             dialog_height = TRADING_DIALOG_HEIGHT
             self.trading_dialog.setGeometry(screen.left(), screen.bottom() - dialog_height, dialog_width, dialog_height)
 
-    def validate_symbols(self, symbol1, symbol2):
-        # Add your symbol validation logic here
-        # For now, we'll just check if they're not empty
-        return bool(symbol1 and symbol2)
-
-    def create_chart(self, symbol1, symbol2):
-        if self.fig:
-            self.chart_layout.removeWidget(self.canvas)
-            self.canvas.deleteLater()
-            plt.close(self.fig)
-
-        self.fig, self.ax = plt.subplots(figsize=CHART_FIGSIZE)
-        self.canvas = FigureCanvas(self.fig)
-        self.canvas.setStyleSheet("background-color: #353535;")
-        self.chart_layout.addWidget(self.canvas)
+    def symbol_errors(self, weights, order_size=None):
+        """Reasons the basket cannot be traded, checked against the in-memory symbol index.
+
+        With an order size each leg's notional (order size * |weight|) must meet
+        the symbol's minimum. Empty when the basket is valid.
+        """
+        if len(weights) < 2 or not all(weights):
+            return ["Enter at least two symbols."]
+        if not len(self.symbol_index):
+            return []
+        errors = []
+        for symbol, weight in weights.items():
+            error = self.symbol_index.validate(symbol, None if order_size is None else order_size * abs(weight))
+            if error:
+                errors.append(error)
+        return errors
+
+    def create_chart(self, symbol1, symbol2, cached=False):
+        if self.fig is None:
+            # Built directly from Figure so pyplot's global figure registry never holds a reference
+            self.fig = Figure(figsize=CHART_FIGSIZE)
+            self.ax = self.fig.add_subplot()
+            self.canvas = FigureCanvas(self.fig)
+            self.canvas.setStyleSheet("background-color: #353535;")
+            self.chart_layout.addWidget(self.canvas)
 
-        self.ani = FuncAnimation(self.fig, self.update_chart, interval=UPDATE_INTERVAL, 
-                                 blit=False, save_count=100)
-        self.canvas.draw()
-
-    def update_chart(self, frame):
-        pair_price = calculate_pair_price(self.symbol1, self.symbol2)
-        positions = self.trading_dialog.current_position if hasattr(self, 'trading_dialog') else []
-        if pair_price is not None:
-            self.ax.clear()
-            self.ax.plot(pair_price.index, pair_price.values, color='#2A82DA')
-            symbol1_truncated = self.symbol1[:-4] if self.symbol1.endswith(('USDT', 'USDC')) else self.symbol1
-            symbol2_truncated = self.symbol2[:-4] if self.symbol2.endswith(('USDT', 'USDC')) else self.symbol2
-            self.ax.set_title(f"{symbol2_truncated}/{symbol1_truncated} Pear Price", color='white')
             self.ax.set_xlabel("Time", color='white')
             self.ax.set_ylabel("Pear Price", color='white')
-            
-            # Add horizontal dotted line at current price
-            try:
-                current_price = pair_price.iloc[0]
-                self.ax.axhline(y=current_price, color='white', linestyle=':', linewidth=0.5)
-            except IndexError:
-                logger.warning("Unable to get current price: pair_price is empty")
-            
-            # Plot arrows for positions
-            if positions:  # Add this check
-                for position in positions:
-                    if 'timestamp_rounded' in position:
-                        timestamp = datetime.fromisoformat(position['timestamp_rounded'])
-                        if timestamp in pair_price.index:
-                            price = pair_price.loc[timestamp]
-                            if position['type'] == 'long':
-                                self.ax.annotate('↑', (timestamp, price), xytext=(0, -20), 
-                                                 textcoords='offset points', ha='center', va='bottom',
-                                                 color='green', fontsize=15)
-                            elif position['type'] == 'short':
-                                self.ax.annotate('↓', (timestamp, price), xytext=(0, 20), 
-                                                 textcoords='offset points', ha='center', va='top',
-                                                 color='red', fontsize=15)
-                    else:
-                        logger.warning(f"Position without rounded timestamp: {position}")
-            
-            self.ax.xaxis.set_major_formatter(plt.matplotlib.dates.DateFormatter('%Y-%m-%d %H:%M:%S'))
-            plt.xticks(rotation=45, ha='right', color='white')
-            plt.yticks(color='white')
-            
+            self.ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d %H:%M:%S'))
+            self.ax.tick_params(axis='x', colors='white', labelrotation=45)
+            self.ax.tick_params(axis='y', colors='white')
             self.ax.set_facecolor('#252525')
             self.fig.patch.set_facecolor('#353535')
-            
-            plt.tight_layout()
-            self.canvas.draw()
-        else:
+            self.price_line, = self.ax.plot([], [], color='#2A82DA')
+            self.price_level = self.ax.axhline(y=0, color='white', linestyle=':', linewidth=0.5, visible=False)
+            self.canvas.mpl_connect('scroll_event', self.on_chart_scroll)
+            self.canvas.mpl_connect('button_press_event', self.on_chart_press)
+            self.canvas.mpl_connect('motion_notify_event', self.on_chart_motion)
+            self.canvas.mpl_connect('button_release_event', self.on_chart_release)
+        self.chart_view = None
+        self.subscribe_live_prices()
+        # With cached=True a pear whose legs are already cached is drawn without any request
+        if not (cached and self.draw_chart()):
+            self.update_chart(None)
+
+    @traced('MainWindow.update_chart', 'timer')
+    def update_chart(self, frame):
+        # Top up the minute cache for every leg (only the minutes since the last refresh are fetched).
+        # A new leg gets one kline page here; the rest of CANDLE_HISTORY_MINUTES is backfilled in the background.
+        symbols = list(self.weights)
+        with ThreadPoolExecutor(max_workers=len(symbols)) as executor:
+            refreshed = list(executor.map(lambda symbol: self.candle_cache.refresh(symbol, KLINE_PAGE_LIMIT), symbols))
+        if not all(refreshed):
+            logger.warning("Unable to update chart: pair_price is None or empty")
+            return False
+        self.backfill_history(symbols)
+        return self.draw_chart()
+
+    def backfill_history(self, symbols):
+        for symbol in symbols:
+            if symbol in self.backfilling or self.candle_cache.depth(symbol) >= CANDLE_HISTORY_MINUTES:
+                continue
+            self.backfilling.add(symbol)
+            future = self.backfill_executor.submit(self.candle_cache.refresh, symbol)
+            future.add_done_callback(lambda _, symbol=symbol: self.candle_history_signals.loaded.emit(symbol))
+
+    @traced('MainWindow.history_loaded')
+    def history_loaded(self, symbol):
+        # The cache version moved, so the chart rebuilds its series; a failed backfill is retried on the next chart poll
+        self.backfilling.discard(symbol)
+        if self.fig is not None and symbol in self.weights and self.isVisible():
+            self.draw_chart()
+
+    def draw_chart(self):
+        if self.build_chart_series() is None:
             logger.warning("Unable to update chart: pair_price is None or empty")
+            return False
+
+        timestamps, values = self.basket_series
+        self.ax.set_title(f"{self.weights_label()} Pear Price", color='white')
+
+        # Add horizontal dotted line at current price
+        current_price = values[-1]
+        self.price_level.set_ydata([current_price, current_price])
+        self.price_level.set_visible(True)
 
+        # Plot arrows for positions
+        for marker in self.position_markers:
+            marker.remove()
+        self.position_markers.clear()
+        positions = self.trading_dialog.current_position if hasattr(self, 'trading_dialog') else []
+        minutes = CHART_INTERVALS[self.chart_interval]
+        for position in positions:
+            if set(position.symbols) != set(self.weights):
+                continue
+            if not position.timestamp_rounded:
+                logger.warning("Position without rounded timestamp: %s", position)
+                continue
+            # Mark the candle of the chosen interval that contains the entry minute
+            entry_ms = datetime.fromisoformat(position.timestamp_rounded).timestamp() * 1000
+            bucket_ms = entry_ms // (minutes * 60000) * minutes * 60000
+            index = np.searchsorted(self.chart_ms, bucket_ms)
+            if index < len(self.chart_ms) and self.chart_ms[index] == bucket_ms:
+                point = (self.chart_x[index], self.chart_y[index])
+                if position.type == 'long':
+                    self.position_markers.append(self.ax.annotate('↑', point, xytext=(0, -20),
+                                                 textcoords='offset points', ha='center', va='bottom',
+                                                 color='green', fontsize=15))
+                elif position.type == 'short':
+                    self.position_markers.append(self.ax.annotate('↓', point, xytext=(0, 20),
+                                                 textcoords='offset points', ha='center', va='top',
+                                                 color='red', fontsize=15))
+
+        # A fast-moving pear is polled faster until it calms down
+        if volatility_ratio(values) >= POLL_VOLATILITY_RATIO:
+            self.scheduler.boost('chart')
+            self.scheduler.boost('pears')
+
+        self.redraw_visible(layout=True)
+        return True
+
+    def build_chart_series(self):
+        """Minute basket price from the candle cache, then aggregated to the chart interval.
+
+        The basket is recomputed only when a leg's candles changed, and
+        switching intervals only re-aggregates it.
+        """
+        key = (tuple(self.weights.items()), self.candle_cache.version(self.weights))
+        if key != self.basket_key:
+            closes = {}
+            for symbol in self.weights:
+                candles = self.candle_cache.get(symbol)
+                if candles is None or not len(candles):
+                    return None
+                closes[symbol] = pd.Series(candles[:, CANDLE_CLOSE], index=candles[:, CANDLE_TS].astype('int64'), name=symbol)
+            prices = basket_price(align_closes(closes), self.weights)
+            if not len(prices):
+                return None
+            self.basket_series = (prices.index.to_numpy(dtype='int64'), prices.to_numpy())
+            self.basket_key = key
+            self.chart_series_interval = None
+        if self.chart_series_interval != self.chart_interval:
+            self.chart_ms, self.chart_y = aggregate_last(*self.basket_series, CHART_INTERVALS[self.chart_interval])
+            self.chart_x = self.chart_ms / 86400000.0  # Matplotlib date numbers (days since 1970)
+            self.chart_series_interval = self.chart_interval
+        return self.chart_x
+
+    def visible_range(self):
+        x = self.chart_x
+        if self.chart_view is None:
+            # Default view: the latest CHART_LIMIT candles, following new data
+            return x[max(0, len(x) - CHART_LIMIT)], x[-1]
+        x_min, x_max, follow = self.chart_view
+        if follow:
+            return x[-1] - (x_max - x_min), x[-1]
+        return x_min, x_max
+
+    def redraw_visible(self, layout=False):
+        """Plot only the visible range, downsampled to about one point per pixel."""
+        if self.chart_x is None or not len(self.chart_x):
+            return
+        x_min, x_max = self.visible_range()
+        visible = visible_slice(self.chart_x, x_min, x_max)
+        points = max(self.canvas.width(), 100) * CHART_POINTS_PER_PIXEL
+        xs, ys = downsample(self.chart_x[visible], self.chart_y[visible], points)
+        self.price_line.set_data(xs, ys)
+        self.ax.set_xlim(x_min, x_max if x_max > x_min else x_min + 1 / 1440)
+        if len(ys):
+            low, high = float(ys.min()), float(ys.max())
+            margin = (high - low) * 0.05 or abs(high) * 0.001 or 1.0
+            self.ax.set_ylim(low - margin, high + margin)
+
+        if layout:
+            for label in self.ax.get_xticklabels():
+                label.set_ha('right')
+            with tracer.span('tight_layout', 'matplotlib'):
+                self.fig.tight_layout()
+        with tracer.span('canvas.draw', 'matplotlib'):
+            self.canvas.draw_idle()
+
+    def set_chart_interval(self, interval):
+        self.chart_interval = interval
+        self.chart_view = None
+        if self.fig is not None and self.build_chart_series() is not None:
+            self.update_chart(None)
+
+    def on_chart_scroll(self, event):
+        # Wheel zooms the time axis around the cursor
+        if self.chart_x is None or event.xdata is None:
+            return
+        x_min, x_max = self.visible_range()
+        factor = 0.8 if event.button == 'up' else 1.25
+        min_width = 10 * CHART_INTERVALS[self.chart_interval] / 1440
+        max_width = self.chart_x[-1] - self.chart_x[0] + min_width
+        width = min(max(min_width, (x_max - x_min) * factor), max_width)
+        ratio = (event.xdata - x_min) / (x_max - x_min) if x_max > x_min else 1.0
+        self.set_chart_view(event.xdata - width * ratio, event.xdata + width * (1 - ratio))
+
+    def on_chart_press(self, event):
+        if event.button == 1 and event.inaxes is self.ax:
+            if event.dblclick:
+                # Double-click returns to the latest candles
+                self.chart_view = None
+                self.redraw_visible()
+                return
+            self.chart_drag = (event.x, self.visible_range())
+
+    def on_chart_motion(self, event):
+        # Left-drag pans through history
+        if self.chart_drag is None or event.x is None:
+            return
+        start_x, (x_min, x_max) = self.chart_drag
+        axes_width = self.ax.bbox.width or 1
+        shift = (start_x - event.x) * (x_max - x_min) / axes_width
+        self.set_chart_view(x_min + shift, x_max + shift)
+
+    def on_chart_release(self, event):
+        self.chart_drag = None
+
+    def set_chart_view(self, x_min, x_max):
+        # Keep the window inside the data; touching the latest candle resumes following it
+        width = x_max - x_min
+        first, last = self.chart_x[0], self.chart_x[-1]
+        if x_max >= last:
+            x_min, x_max = last - width, last
+        if x_min < first:
+            x_min, x_max = first, first + width
+        self.chart_view = (x_min, x_max, x_max >= last)
+        self.redraw_visible()
+
+    def weights_label(self):
+        return basket_label([s for s, w in self.weights.items() if w > 0], [s for s, w in self.weights.items() if w < 0])
+
+    @traced('MainWindow.refresh_positions', 'timer')
     def refresh_positions(self):
         positions = []
         if hasattr(self, 'trading_dialog'):
-            positions = self.trading_dialog.current_position or []
+            positions = self.trading_dialog.current_position
         else:
-            positions = self.current_position or []
+            positions = self.current_position
         
         self.control_panel.update_positions(positions)
-        self.control_panel.update_account_info()
-        
-        if self.ani:
-            self.ani.event_source.stop()
-            self.ani = FuncAnimation(self.fig, self.update_chart, interval=UPDATE_INTERVAL, 
-                                     blit=False, save_count=100)
-            self.canvas.draw()
+        self.control_panel.update_trade_stats()
+        if self.control_panel.failed_triggers:
+            self.control_panel.update_trigger_alerts()
+        self.evaluate_triggers()
 
     def load_position(self):
-        if os.path.exists(CURRENT_POSITION_FILE) and os.path.getsize(CURRENT_POSITION_FILE) > 0:
-            with open(CURRENT_POSITION_FILE, 'r') as f:
-                try:
-                    return json.load(f)
-                except json.JSONDecodeError:
-                    return None
-        else:
-            return None
+        return PearRegistry.load(CURRENT_POSITION_FILE)
+
+    @traced('MainWindow.evaluate_triggers')
+    def evaluate_triggers(self):
+        if not self.trigger_engine.triggers:
+            return
+        risk_engine = self.control_panel.risk_engine
+        prices = {symbol: risk_engine.prices[i] for symbol, i in risk_engine.symbol_index.items() if not np.isnan(risk_engine.prices[i])}
+        fired = self.trigger_engine.evaluate(prices, risk_engine.trade_ids, risk_engine.pear_upnl_pct, risk_engine.pear_priced)
+        if self.trigger_engine.is_near(prices, risk_engine.trade_ids, risk_engine.pear_upnl_pct, risk_engine.pear_priced):
+            self.scheduler.boost('pears')
+        if fired:
+            # Run the open/close paths after this refresh has finished
+            QTimer.singleShot(0, lambda: self.execute_triggers(fired))
+
+    def execute_triggers(self, fired):
+        for trigger in fired:
+            logger.info("Trigger fired: %s", trigger)
+            if trigger.action == CLOSE:
+                if trigger.trade_id not in self.trading_dialog.current_position:
+                    continue
+                ok = self.trading_dialog.close_position(trigger.trade_id, interactive=False)
+            else:
+                ok = self.trading_dialog.place_pair_order(trigger.action, trigger.pair[0], trigger.pair[1], trigger.order_size, interactive=False)
+                if ok:
+                    # An entry filled: disarm the opposite entry on the same pair
+                    for other in list(self.trigger_engine.triggers.values()):
+                        if other.kind == ZSCORE and other.pair == trigger.pair and other.action != CLOSE:
+                            self.trigger_engine.remove(other.trigger_id)
+            if ok:
+                self.control_panel.clear_trigger_failure(trigger.trigger_id)
+            else:
+                # A stop must not disappear because its order failed; it is retried after TRIGGER_RETRY_INTERVAL
+                self.trigger_engine.rearm(trigger)
+                logger.error("Trigger %s failed to execute and was re-armed", trigger, extra={'trade_id': trigger.trade_id})
+                self.control_panel.show_trigger_failure(trigger)
 
     def close_all_positions(self):
         if hasattr(self, 'trading_dialog'):
@@ -581,6 +1442,21 @@ class MainWindow(QMainWindow):
         dialog_height = TRADING_DIALOG_HEIGHT
         self.trading_dialog.setGeometry(screen.left(), screen.bottom() - dialog_height, dialog_width, dialog_height)
 
+    def toggle_watchlist(self):
+        if self.watchlist_window.isVisible():
+            self.watchlist_window.hide()
+            self.control_panel.toggle_watchlist_button.setText("Show Watchlist")
+        else:
+            self.watchlist_window.show()
+            self.watchlist_window.raise_()
+            self.control_panel.toggle_watchlist_button.setText("Hide Watchlist")
+
+    def promote_pear(self, weights):
+        # Charted straight from the shared candle cache; the next chart poll tops it up
+        self.trading_dialog.load_weights(weights, cached=True)
+        if not self.isVisible():
+            self.toggle_chart_window()
+
     def toggle_chart_window(self):
         if self.isVisible():
             self.hide()
@@ -596,8 +1472,10 @@ class TradingDialog(QDialog):
         self.setWindowFlags(self.windowFlags() | Qt.WindowStaysOnTopHint)
         self.symbol1 = symbol1
         self.symbol2 = symbol2
+        self.weights = dict(getattr(parent, 'weights', None) or pair_weights(symbol1, symbol2))
         self.bybit_client = parent.bybit_client  # Use the Bybit API client from the parent
-        self.current_position = None  # Add this line to store the current position
+        self.account_manager = getattr(parent, 'account_manager', None)
+        self.current_position = PearRegistry()  # Open pears, indexed by trade_id and symbol
         self.is_closed = False
 
         self.setFixedSize(TRADING_DIALOG_WIDTH, TRADING_DIALOG_HEIGHT)
@@ -609,22 +1487,33 @@ class TradingDialog(QDialog):
         self.symbol2_input = QLineEdit(self.symbol2)
         self.symbol1_input.setPlaceholderText("Base (e.g., BTCUSDT)")
         self.symbol2_input.setPlaceholderText("Quote (e.g., ETHUSDT)")
+        symbol_index = getattr(parent, 'symbol_index', None)
+        if symbol_index is not None:
+            self.symbol1_completer = SymbolCompleter(self.symbol1_input, symbol_index)
+            self.symbol2_completer = SymbolCompleter(self.symbol2_input, symbol_index)
 
         layout.addWidget(QLabel("Quote:"))
         layout.addWidget(self.symbol2_input)
         layout.addWidget(QLabel("Base:"))
         layout.addWidget(self.symbol1_input)
+
+        # Optional N-leg basket; overrides the pair inputs when set
+        self.basket_input = QLineEdit()
+        self.basket_input.setPlaceholderText("Basket (e.g., ETHUSDT:1,SOLUSDT:1,BTCUSDT:-2)")
+        layout.addWidget(self.basket_input)
         
         # Add Chart button
         self.load_pair_button = QPushButton("Load Pear")
         layout.addWidget(self.load_pair_button)
 
         # Pair information
-        symbol1_truncated = symbol1[:-4] if symbol1.endswith(('USDT', 'USDC')) else symbol1
-        symbol2_truncated = symbol2[:-4] if symbol2.endswith(('USDT', 'USDC')) else symbol2
-        self.pair_label = QLabel(f"Trading Pair: {symbol2_truncated}/{symbol1_truncated}")
+        self.pair_label = QLabel(f"Trading Pair: {self.weights_label()}")
         layout.addWidget(self.pair_label)
 
+        # Funding carry of the loaded pear at the current order size
+        self.carry_label = QLabel("")
+        layout.addWidget(self.carry_label)
+
         # Long and Short buttons
         button_layout = QHBoxLayout()
         self.long_button = QPushButton("LONG")
@@ -640,15 +1529,37 @@ class TradingDialog(QDialog):
         self.order_size.setRange(MIN_ORDER_SIZE, MAX_ORDER_SIZE)
         self.order_size.setValue(DEFAULT_ORDER_SIZE)
         self.order_size.setPrefix("$")
+        self.order_size.valueChanged.connect(self.update_carry)
         size_layout.addWidget(self.order_size)
         layout.addLayout(size_layout)
 
+        # Local triggers attached to new pears (0 = off)
+        trigger_layout = QHBoxLayout()
+        self.stop_loss_pct = self.create_trigger_spinbox(trigger_layout, "SL %:", 0, 100)
+        self.take_profit_pct = self.create_trigger_spinbox(trigger_layout, "TP %:", 0, 1000)
+        self.trailing_pct = self.create_trigger_spinbox(trigger_layout, "Trail %:", 0, 100)
+        layout.addLayout(trigger_layout)
+
+        # Stop-loss and take-profit on the pair price itself, as % from the entry ratio (-1/+1 pairs only)
+        price_trigger_layout = QHBoxLayout()
+        self.price_stop_pct = self.create_trigger_spinbox(price_trigger_layout, "Px SL %:", 0, 100)
+        self.price_take_pct = self.create_trigger_spinbox(price_trigger_layout, "Px TP %:", 0, 1000)
+        layout.addLayout(price_trigger_layout)
+
+        zscore_layout = QHBoxLayout()
+        self.z_entry = self.create_trigger_spinbox(zscore_layout, "Z entry:", 0, 10)
+        self.z_exit = self.create_trigger_spinbox(zscore_layout, "Z exit:", 0, 10)
+        self.arm_z_entry_button = QPushButton("Arm")
+        zscore_layout.addWidget(self.arm_z_entry_button)
+        layout.addLayout(zscore_layout)
+
         self.setLayout(layout)
 
         # Connect buttons to trading methods
         self.long_button.clicked.connect(self.long_pair)
         self.short_button.clicked.connect(self.short_pair)
         self.load_pair_button.clicked.connect(self.update_chart)
+        self.arm_z_entry_button.clicked.connect(self.arm_z_entry)
 
         self.load_position()
         self.set_dark_theme()
@@ -675,79 +1586,325 @@ class TradingDialog(QDialog):
             }
         """)
 
-    def get_current_prices(self):
-        return self.bybit_client.get_current_prices(self.symbol1, self.symbol2)
+    def create_trigger_spinbox(self, layout, label, minimum, maximum):
+        layout.addWidget(QLabel(label))
+        spinbox = QDoubleSpinBox()
+        spinbox.setRange(minimum, maximum)
+        spinbox.setSingleStep(0.5)
+        spinbox.setSpecialValueText("Off")
+        layout.addWidget(spinbox)
+        return spinbox
+
+    def get_current_prices(self, symbol1=None, symbol2=None):
+        return self.bybit_client.get_current_prices(symbol1 or self.symbol1, symbol2 or self.symbol2)
 
     def get_quantity_precision(self, symbol):
         return self.bybit_client.get_quantity_precision(symbol)
 
-    def calculate_quantities(self, price1, price2):
-        total_order_size = self.order_size.value()
-        precision1 = self.get_quantity_precision(self.symbol1)
-        precision2 = self.get_quantity_precision(self.symbol2)
-        qty1 = round(total_order_size / price1, precision1)
-        qty2 = round(total_order_size / price2, precision2)
-        return qty1, qty2
+    def calculate_quantity(self, symbol, notional, price):
+        return round(notional / price, self.get_quantity_precision(symbol))
 
     def calculate_dollar_value(self, quantity, price):
         return quantity * price
 
-    def place_pair_order(self, direction):
-        price1, price2 = self.get_current_prices()
-        if price1 is None or price2 is None:
-            QMessageBox.warning(self, "Error", "Failed to get current prices.")
-            return
+    def weights_label(self):
+        return basket_label([s for s, w in self.weights.items() if w > 0], [s for s, w in self.weights.items() if w < 0])
 
-        qty1, qty2 = self.calculate_quantities(price1, price2)
-        dollar_value1 = self.calculate_dollar_value(qty1, price1)
-        dollar_value2 = self.calculate_dollar_value(qty2, price2)
+    def report(self, interactive, title, text, error=True):
+        # Orders run by triggers are unattended, so their outcome goes to the log instead of a modal box
+        if interactive:
+            (QMessageBox.warning if error else QMessageBox.information)(self, title, text)
+        else:
+            (logger.error if error else logger.info)("%s: %s", title, text.replace("\n", "; "))
 
-        print(f"{direction.capitalize()} Pair Order:")
-        print(f"{'Short' if direction == 'long' else 'Long'} {self.symbol1}: {qty1:.8f} ({dollar_value1:.2f} USD)")
-        print(f"{'Long' if direction == 'long' else 'Short'} {self.symbol2}: {qty2:.8f} ({dollar_value2:.2f} USD)")
+    def place_pair_order(self, direction, symbol1=None, symbol2=None, order_size=None, interactive=True):
+        if symbol1 and symbol2:
+            weights = pair_weights(symbol1, symbol2)
+        else:
+            weights = self.weights
+        return self.place_basket_order(direction, weights, order_size, interactive)
+
+    def execute_leg(self, trade_id, symbol, side, notional, price):
+        qty = self.calculate_quantity(symbol, notional, price)
+        started = time.perf_counter()
+        response = self.bybit_client.place_order(
+            symbol=symbol,
+            side=side,
+            order_type="Market",
+            qty=qty
+        )
+        log_order("Open", trade_id, symbol, side, qty, response, started)
+        return qty, response
+
+    @traced('TradingDialog.place_basket_order')
+    def place_basket_order(self, direction, weights, order_size=None, interactive=True):
+        # True when every leg filled
+        symbols = list(weights)
+        total_order_size = order_size or self.order_size.value()
+        # Rejected locally before any request, so a bad leg never leaves the other legs filled
+        errors = self.parent().symbol_errors(weights, total_order_size)
+        if errors:
+            self.report(interactive, "Invalid Order", "\n".join(errors))
+            return False
+
+        prices = self.bybit_client.get_last_prices(symbols)
+        if any(prices.get(symbol) is None for symbol in symbols):
+            self.report(interactive, "Error", "Failed to get current prices.")
+            return False
+
+        # A long buys the positive-weight legs and sells the negative ones; each leg gets order size * |weight|
+        direction_sign = 1 if direction == 'long' else -1
+        sides = {symbol: 'Buy' if weight * direction_sign > 0 else 'Sell' for symbol, weight in weights.items()}
+        notionals = {symbol: total_order_size * abs(weight) for symbol, weight in weights.items()}
+
+        if self.account_manager:
+            return self.place_account_basket_order(direction, weights, sides, notionals, prices, interactive)
 
         try:
-            response1 = self.bybit_client.place_order(
-                symbol=self.symbol1,
-                side="Sell" if direction == "long" else "Buy",
-                order_type="Market",
-                qty=qty1
-            )
-            
-            response2 = self.bybit_client.place_order(
-                symbol=self.symbol2,
-                side="Buy" if direction == "long" else "Sell",
-                order_type="Market",
-                qty=qty2
-            )
-            
-            if response1 and response1['retCode'] == 0 and response2 and response2['retCode'] == 0:
-                trade_id = self.generate_trade_id()
-                new_position = {
-                    'type': direction,
-                    'trade_id': trade_id,
-                    'timestamp': datetime.now().isoformat(),
-                    'timestamp_rounded': datetime.now().replace(second=0, microsecond=0).isoformat(),
-                    'combined_upnl': 0,
-                    self.symbol1: {'side': 'Sell' if direction == 'long' else 'Buy', 'qty': qty1, 'entry_price': price1},
-                    self.symbol2: {'side': 'Buy' if direction == 'long' else 'Sell', 'qty': qty2, 'entry_price': price2}
+            # Send every leg concurrently
+            trade_id = self.generate_trade_id()
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=len(symbols)) as executor:
+                futures = {
+                    symbol: executor.submit(self.execute_leg, trade_id, symbol, sides[symbol], notionals[symbol], prices[symbol])
+                    for symbol in symbols
                 }
-                
-                if self.current_position is None:
-                    self.current_position = [new_position]
-                else:
-                    self.current_position.append(new_position)
-                
+                results = {symbol: future.result() for symbol, future in futures.items()}
+            latency_ms = elapsed_ms(started)
+
+            failed = {symbol: response for symbol, (qty, response) in results.items() if not response or response['retCode'] != 0}
+            logger.info("%s pear %s %s: %s of %s legs filled, %.2f USD, in %.1f ms", direction.capitalize(), trade_id,
+                        basket_label([s for s, w in weights.items() if w > 0], [s for s, w in weights.items() if w < 0]),
+                        len(symbols) - len(failed), len(symbols),
+                        sum(self.calculate_dollar_value(qty, prices[symbol]) for symbol, (qty, response) in results.items() if symbol not in failed),
+                        latency_ms, extra={'trade_id': trade_id, 'latency_ms': latency_ms})
+            if not failed:
+                pear = self.current_position.add(Pear(trade_id, direction, [
+                    Leg(symbol, sides[symbol], results[symbol][0], prices[symbol]) for symbol in symbols
+                ]))
+
                 self.save_position()
-                self.log_trade(direction.upper(), self.symbol1, self.symbol2, qty1, qty2, price1, price2, trade_id)
+                self.arm_pear_triggers(pear, weights)
+                self.log_pear(direction.upper(), pear, prices)
                 self.parent().refresh_positions()  # Refresh the positions display
-                QMessageBox.information(self, "Success", f"{direction.capitalize()} pair order placed successfully.")
-            else:
-                error_msg = f"Failed to place {direction} pair order:\n{self.symbol1}: {response1['retMsg']}\n{self.symbol2}: {response2['retMsg']}"
-                QMessageBox.warning(self, "Error", error_msg)
+                self.report(interactive, "Success", f"{direction.capitalize()} pair order placed successfully.", error=False)
+                return True
+            error_msg = f"Failed to place {direction} pair order:" + "".join(
+                f"\n{symbol}: {response['retMsg'] if response else 'No response'}" for symbol, response in failed.items()
+            )
+            filled = {symbol: qty for symbol, (qty, response) in results.items() if symbol not in failed}
+            self.report(interactive, "Error", error_msg + self.unwind_legs(trade_id, direction, filled, sides, prices))
+            return False
         except Exception as e:
-            logger.error(f"Error placing {direction} pair order: {e}")
-            QMessageBox.warning(self, "Error", f"Failed to place {direction} pair order: {e}")
+            logger.error("Error placing %s pair order: %s", direction, e)
+            self.report(interactive, "Error", f"Failed to place {direction} pair order: {e}")
+            return False
+
+    def place_account_basket_order(self, direction, weights, sides, notionals, prices, interactive=True):
+        # Same basket on every account; each worker scales the notionals by its account's factor.
+        # True when at least one account opened the pear, so a retry would double it
+        trade_id = self.generate_trade_id()
+        started = time.perf_counter()
+        try:
+            replies = self.account_manager.open_basket(sides, notionals, prices)
+            allocations, failures = aggregate_fills(replies)
+        except Exception as e:
+            logger.error("Error placing %s pair order across accounts: %s", direction, e)
+            self.report(interactive, "Error", f"Failed to place {direction} pair order: {e}")
+            return False
+        latency_ms = elapsed_ms(started)
+
+        for name, legs in allocations.items():
+            logger.info("%s pear %s on %s: %s in %.1f ms", direction.capitalize(), trade_id, name, legs, latency_ms,
+                        extra={'trade_id': trade_id, 'account': name, 'latency_ms': latency_ms})
+        for name, message in failures.items():
+            logger.error("%s pear %s failed on %s: %s", direction.capitalize(), trade_id, name, message,
+                         extra={'trade_id': trade_id, 'account': name, 'latency_ms': latency_ms})
+
+        if allocations:
+            pear = self.current_position.add(Pear(trade_id, direction, [
+                Leg(symbol, sides[symbol], round(sum(legs[symbol] for legs in allocations.values()), 10), prices[symbol]) for symbol in sides
+            ], allocations=allocations))
+            self.save_position()
+            self.arm_pear_triggers(pear, weights)
+            self.log_pear(direction.upper(), pear, prices)
+            self.parent().refresh_positions()
+
+        if failures:
+            self.report(interactive, "Error", f"Failed to place {direction} pair order on:" + "".join(
+                f"\n{name}: {message}" for name, message in failures.items()
+            ) + self.unwind_account_legs(trade_id, direction, partial_fills(replies), sides, prices))
+        else:
+            self.report(interactive, "Success", f"{direction.capitalize()} pair order placed on {len(allocations)} accounts.", error=False)
+        return bool(allocations)
+
+    def unwind_legs(self, trade_id, direction, filled, sides, prices):
+        """Close the legs of a partly filled basket; a note for the error report, empty when none filled."""
+        if not filled:
+            return ""
+        leftover = {}
+        for symbol, qty in filled.items():
+            side = 'Sell' if sides[symbol] == 'Buy' else 'Buy'
+            started = time.perf_counter()
+            response = self.bybit_client.place_order(symbol=symbol, side=side, order_type="Market", qty=qty, reduce_only=True)
+            log_order("Unwind", trade_id, symbol, side, qty, response, started)
+            if not response or response['retCode'] != 0:
+                leftover[symbol] = qty
+        unwound = [symbol for symbol in filled if symbol not in leftover]
+        note = f"\nUnwound the filled legs: {', '.join(unwound)}" if unwound else ""
+        if leftover:
+            note += f"\nCould not unwind {', '.join(leftover)};" + self.keep_unhedged_legs(trade_id, direction, leftover, sides, prices)
+        return note
+
+    def keep_unhedged_legs(self, trade_id, direction, legs, sides, prices, allocations=None):
+        # Filled legs that could not be unwound become a pear of their own, so they are shown and can be closed
+        pear = self.current_position.add(Pear(self.generate_trade_id(), direction, [
+            Leg(symbol, sides[symbol], qty, prices[symbol]) for symbol, qty in legs.items()
+        ], allocations=allocations))
+        self.save_position()
+        self.log_pear(direction.upper(), pear, prices)
+        self.parent().refresh_positions()
+        logger.error("Pear %s: could not unwind %s, kept as pear %s", trade_id, allocations or legs, pear.trade_id,
+                     extra={'trade_id': pear.trade_id})
+        return f" the filled legs were kept as pear {pear.label()} to close."
+
+    def unwind_account_legs(self, trade_id, direction, partials, sides, prices):
+        """Close the legs of partly filled accounts; a note for the error report, empty when none filled."""
+        if not partials:
+            return ""
+        close_sides = {symbol: 'Sell' if side == 'Buy' else 'Buy' for symbol, side in sides.items()}
+        replies = self.account_manager.close_allocations(partials, close_sides)
+        logger.info("Unwind pear %s by account: %s", trade_id, replies, extra={'trade_id': trade_id})
+        leftover = {}
+        for name, legs in partials.items():
+            reply = replies.get(name, {'ok': False})
+            closed = {leg['symbol'] for leg in reply['result'] if leg['ok']} if reply['ok'] else set()
+            if legs.keys() - closed:
+                leftover[name] = {symbol: qty for symbol, qty in legs.items() if symbol not in closed}
+        unwound = [name for name in partials if name not in leftover]
+        note = f"\nUnwound the filled legs on: {', '.join(unwound)}" if unwound else ""
+        if leftover:
+            totals = {symbol: round(sum(legs.get(symbol, 0) for legs in leftover.values()), 10)
+                      for symbol in sides if any(symbol in legs for legs in leftover.values())}
+            note += f"\nCould not unwind {', '.join(leftover)};" + self.keep_unhedged_legs(trade_id, direction, totals, sides, prices, leftover)
+        return note
+
+    def send_close_orders(self, pear):
+        """Send the pear's reduce-only closes; a list of the legs that failed, empty when all went through.
+
+        After a failure the pear keeps only the quantities still open, and the
+        caller saves it so a retry closes just those.
+        """
+        if pear.allocations and self.account_manager:
+            started = time.perf_counter()
+            replies = self.account_manager.close_allocations(pear.allocations, {leg.symbol: leg.close_side for leg in pear.legs})
+            latency_ms = elapsed_ms(started)
+            logger.info("Close pear %s by account: %s in %.1f ms", pear.trade_id, replies, latency_ms,
+                        extra={'trade_id': pear.trade_id, 'latency_ms': latency_ms})
+            failed = []
+            for name, reply in replies.items():
+                if not reply['ok']:
+                    failed.append(f"{name}: {reply['result']}")
+                else:
+                    failed.extend(f"{name} {leg['symbol']}: {leg['message']}" for leg in reply['result'] if not leg['ok'])
+                    for leg in reply['result']:
+                        if leg['ok']:
+                            pear.allocations[name].pop(leg['symbol'], None)
+            if failed:
+                # Keep only what is still open, so a retry does not close the other accounts' legs again
+                pear.allocations = {name: legs for name, legs in pear.allocations.items() if legs}
+                for leg in pear.legs:
+                    leg.qty = round(sum(legs.get(leg.symbol, 0) for legs in pear.allocations.values()), 10)
+                pear.legs = [leg for leg in pear.legs if leg.qty > 0]
+            return failed
+        reconciler = self.parent().control_panel.reconciler
+        failed = []
+        remaining = {}  # symbol -> qty still open after a failed close
+        for leg in pear.legs:
+            # Never reduce more than the exchange still holds for the pears, e.g. after a liquidation or a manual close
+            qty, reducible = reconciler.close_split(leg.symbol, leg.sign, leg.qty) if reconciler is not None else (leg.qty, leg.qty)
+            if 0 < qty < leg.qty:
+                logger.warning("Closing %s of %s %s: the exchange holds less than the pears", qty, leg.qty, leg.symbol,
+                               extra={'trade_id': pear.trade_id, 'symbol': leg.symbol})
+            if qty <= 0:
+                logger.info("Close pear %s: no open position for %s, skipping", pear.trade_id, leg.symbol,
+                            extra={'trade_id': pear.trade_id, 'symbol': leg.symbol})
+                continue
+            # Past the net position the close reopens the opposite pears' side, so that part is not reduce-only
+            sent = 0.0
+            for part, reduce_only in ((reducible, True), (round(qty - reducible, 9), False)):
+                if part <= 0:
+                    continue
+                started = time.perf_counter()
+                response = self.bybit_client.place_order(
+                    symbol=leg.symbol,
+                    side=leg.close_side,
+                    order_type="Market",
+                    qty=part,
+                    reduce_only=reduce_only
+                )
+                log_order("Close", pear.trade_id, leg.symbol, leg.close_side, part, response, started)
+                if not response or response['retCode'] != 0:
+                    failed.append(f"{leg.symbol}: {response['retMsg'] if response else 'No response'}")
+                    remaining[leg.symbol] = round(qty - sent, 9)
+                    break
+                sent += part
+                if reconciler is not None:
+                    reconciler.record_close(pear.trade_id, leg.symbol, leg.sign, part)
+        if failed:
+            # Keep only what is still open, so a retry does not close the legs that went through again
+            for leg in pear.legs:
+                leg.qty = remaining.get(leg.symbol, 0.0)
+            pear.legs = [leg for leg in pear.legs if leg.qty > 0]
+            if reconciler is not None:
+                reconciler.add_pear(pear)
+        return failed
+
+    def arm_pear_triggers(self, pear, weights):
+        trigger_engine = self.parent().trigger_engine
+        if self.stop_loss_pct.value():
+            trigger_engine.add_upnl_pct(pear.trade_id, -self.stop_loss_pct.value(), BELOW)
+        if self.take_profit_pct.value():
+            trigger_engine.add_upnl_pct(pear.trade_id, self.take_profit_pct.value(), ABOVE)
+        if not is_unit_pair(weights):
+            # Pair-price triggers watch an unweighted two-leg ratio; other baskets only get UPnL % triggers
+            if self.trailing_pct.value() or self.z_exit.value() or self.price_stop_pct.value() or self.price_take_pct.value():
+                logger.warning("Pear %s: pair-price, trailing and z-score exits need a -1/+1 pair, only UPnL %% exits were armed",
+                               pear.trade_id, extra={'trade_id': pear.trade_id})
+            return
+        pair = weights_pair(weights)
+        if self.price_stop_pct.value() or self.price_take_pct.value():
+            # A long pear gains when the ratio rises, a short one when it falls
+            entry = pear.leg(pair[1]).entry_price / pear.leg(pair[0]).entry_price
+            sign = 1 if pear.type == 'long' else -1
+            if self.price_stop_pct.value():
+                trigger_engine.add_pair_price(pair, entry * (1 - sign * self.price_stop_pct.value() / 100),
+                                              BELOW if sign > 0 else ABOVE, CLOSE, pear.trade_id)
+            if self.price_take_pct.value():
+                trigger_engine.add_pair_price(pair, entry * (1 + sign * self.price_take_pct.value() / 100),
+                                              ABOVE if sign > 0 else BELOW, CLOSE, pear.trade_id)
+        if self.trailing_pct.value():
+            trigger_engine.add_trailing(pair, pear.trade_id, self.trailing_pct.value(), pear.type)
+        if self.z_exit.value():
+            # Close once the spread has reverted to within the exit band
+            if pear.type == 'long':
+                trigger_engine.add_zscore(pair, -self.z_exit.value(), ABOVE, CLOSE, pear.trade_id)
+            else:
+                trigger_engine.add_zscore(pair, self.z_exit.value(), BELOW, CLOSE, pear.trade_id)
+
+    def arm_z_entry(self):
+        if not self.z_entry.value():
+            QMessageBox.warning(self, "Error", "Set a Z entry level first.")
+            return
+        if not is_unit_pair(self.weights):
+            QMessageBox.warning(self, "Error", "Z-score entries are only available for -1/+1 pairs.")
+            return
+        trigger_engine = self.parent().trigger_engine
+        pair = (self.symbol1, self.symbol2)
+        order_size = self.order_size.value()
+        trigger_engine.add_zscore(pair, -self.z_entry.value(), BELOW, 'long', order_size=order_size)
+        trigger_engine.add_zscore(pair, self.z_entry.value(), ABOVE, 'short', order_size=order_size)
+        QMessageBox.information(self, "Success", f"Z-score entry armed at ±{self.z_entry.value():.2f}.")
 
     def long_pair(self):
         self.place_pair_order("long")
@@ -762,109 +1919,130 @@ class TradingDialog(QDialog):
             return False
 
         try:
-            for position in self.current_position:
-                for symbol, pos_data in position.items():
-                    if symbol not in ['type', 'timestamp', 'timestamp_rounded'] and isinstance(pos_data, dict):
-                        close_side = "Buy" if pos_data['side'] == "Sell" else "Sell"
-                        response = self.bybit_client.place_order(
-                            symbol=symbol,
-                            side=close_side,
-                            order_type="Market",
-                            qty=pos_data['qty'],
-                            reduce_only=True
-                        )
-                        print(f"Close position response for {symbol}: {response}")
-        
-            QMessageBox.information(self, "Success", "All positions closed successfully.")
-            self.current_position = None
-            self.save_position()  # Save the updated (empty) position
+            failures = {}
+            closed = []
+            for position in list(self.current_position):
+                failed = self.send_close_orders(position)
+                if failed:
+                    # Keep the pear so its remaining legs can still be closed or fixed
+                    failures[position.label()] = failed
+                    continue
+                closed.append(position)
+            if closed:
+                # One ticker call prices the exit of every closed pear
+                prices = self.bybit_client.get_last_prices(sorted({symbol for position in closed for symbol in position.symbols}))
+                for position in closed:
+                    self.log_pear('CLOSE', position, prices)
+                    self.parent().trigger_engine.remove_for_trade(position.trade_id)
+                    self.current_position.remove(position.trade_id)
+            self.save_position()
             self.parent().refresh_positions()
+            if failures:
+                QMessageBox.warning(self, "Error", "Some pears could not be closed and were kept:" + "".join(
+                    f"\n{label}: {'; '.join(failed)}" for label, failed in failures.items()
+                ))
+                return False
+            QMessageBox.information(self, "Success", "All positions closed successfully.")
             return True
         except Exception as e:
-            logger.error(f"Error closing all positions: {e}")
+            logger.error("Error closing all positions: %s", e)
             QMessageBox.warning(self, "Error", f"Failed to close all positions: {str(e)}")
             return False
 
-    def close_position(self, index):
-        if self.current_position and 0 <= index < len(self.current_position):
-            position = self.current_position[index]
+    def close_position(self, trade_id, interactive=True):
+        position = self.current_position.get(trade_id)
+        if position is not None:
             try:
-                for symbol, pos_data in position.items():
-                    if symbol not in ['type', 'timestamp', 'timestamp_rounded', 'combined_upnl', 'trade_id'] and isinstance(pos_data, dict):
-                        if float(pos_data['qty']) > 0:  # Only close if there's an open position
-                            close_side = "Buy" if pos_data['side'] == "Sell" else "Sell"
-                            response = self.bybit_client.place_order(
-                                symbol=symbol,
-                                side=close_side,
-                                order_type="Market",
-                                qty=pos_data['qty'],
-                                reduce_only=True
-                            )
-                            print(f"Close position response for {symbol}: {response}")
-                        else:
-                            print(f"No open position for {symbol}, skipping.")
-
-                self.log_trade('CLOSE', self.symbol1, self.symbol2, 
-                               position.get(self.symbol1, {}).get('qty', 0), 
-                               position.get(self.symbol2, {}).get('qty', 0), 
-                               self.get_current_prices()[0], self.get_current_prices()[1], 
-                               position.get('trade_id', ''))
-                del self.current_position[index]
+                failed = self.send_close_orders(position)
+                if failed:
+                    self.save_position()
+                    self.parent().refresh_positions()
+                    self.report(interactive, "Error", "Failed to close position, the pear was kept:\n" + "\n".join(failed))
+                    return False
+
+                # Log the pear's own legs, not whichever pair is loaded in the dialog
+                self.log_pear('CLOSE', position, self.bybit_client.get_last_prices(position.symbols))
+                self.current_position.remove(trade_id)
+                self.parent().trigger_engine.remove_for_trade(trade_id)
                 self.save_position()
                 self.parent().refresh_positions()
-                QMessageBox.information(self, "Success", "Position closed successfully.")
+                self.report(interactive, "Success", "Position closed successfully.", error=False)
+                return True
             except Exception as e:
-                logger.error(f"Error closing position: {e}")
-                QMessageBox.warning(self, "Error", f"Failed to close position: {str(e)}")
-        else:
-            QMessageBox.warning(self, "Error", "Invalid position index.")
+                logger.error("Error closing position: %s", e)
+                self.report(interactive, "Error", f"Failed to close position: {str(e)}")
+                return False
+        self.report(interactive, "Error", "Unknown pear.")
+        return False
 
     def update_upnl(self, upnl):
         self.upnl_label.setText(f"UPnL: ${upnl:.2f}")
 
     def save_position(self):
-        if self.current_position:
-            with open(CURRENT_POSITION_FILE, 'w') as f:
-                json.dump(self.current_position, f)
-        else:
-            if os.path.exists(CURRENT_POSITION_FILE):
-                os.remove(CURRENT_POSITION_FILE)
+        self.current_position.save(CURRENT_POSITION_FILE)
 
     def load_position(self):
-        if os.path.exists(CURRENT_POSITION_FILE) and os.path.getsize(CURRENT_POSITION_FILE) > 0:
-            with open(CURRENT_POSITION_FILE, 'r') as f:
-                try:
-                    self.current_position = json.load(f)
-                except json.JSONDecodeError:
-                    self.current_position = []
-        else:
-            self.current_position = []
-        return self.current_position  # Add this line to always return a list
+        self.current_position = PearRegistry.load(CURRENT_POSITION_FILE)
+        return self.current_position
 
     def update_symbols(self, symbol1, symbol2):
         self.symbol1 = symbol1
         self.symbol2 = symbol2
-        symbol1_truncated = symbol1[:-4] if symbol1.endswith(('USDT', 'USDC')) else symbol1
-        symbol2_truncated = symbol2[:-4] if symbol2.endswith(('USDT', 'USDC')) else symbol2
-
-        self.setWindowTitle(f"Pear Tradooor - {symbol2_truncated}/{symbol1_truncated}")
-        
-        symbol1_truncated = symbol1[:-4] if symbol1.endswith(('USDT', 'USDC')) else symbol1
-        symbol2_truncated = symbol2[:-4] if symbol2.endswith(('USDT', 'USDC')) else symbol2
-        self.pair_label.setText(f"Trading Pair: {symbol2_truncated}/{symbol1_truncated}")
+        self.setWindowTitle(f"Pear Tradooor - {self.weights_label()}")
+        self.pair_label.setText(f"Trading Pair: {self.weights_label()}")
+        self.update_carry()
+
+    def update_carry(self):
+        funding_book = getattr(self.parent(), 'funding_book', None)
+        if funding_book is None or not funding_book.tickers_at:
+            self.carry_label.setText("Funding: loading...")
+            return
+        next_carry, average = funding_book.basket_carry(self.weights, self.order_size.value())
+        self.carry_label.setText(f"Funding long: next ${next_carry:+.2f}, {FUNDING_AVERAGE_DAYS}d avg ${average:+.2f}/day "
+                                 f"(short: opposite)")
 
+    @traced('TradingDialog.update_chart')
     def update_chart(self):
         symbol1 = self.symbol1_input.text().upper() or self.symbol1
         symbol2 = self.symbol2_input.text().upper() or self.symbol2
-        if self.parent().validate_symbols(symbol1, symbol2):
-            self.symbol1 = symbol1
-            self.symbol2 = symbol2
-            self.parent().symbol1 = symbol1
-            self.parent().symbol2 = symbol2
-            self.parent().create_chart(symbol1, symbol2)
-            self.update_symbols(symbol1, symbol2)
-        else:
-            QMessageBox.warning(self, "Invalid Symbols", "Please enter valid symbols.")
+        weights = pair_weights(symbol1, symbol2)
+        if self.basket_input.text().strip():
+            try:
+                weights = parse_basket(self.basket_input.text())
+            except ValueError as e:
+                QMessageBox.warning(self, "Invalid Basket", str(e))
+                return
+        self.load_weights(weights, sync_inputs=False)
+
+    def load_weights(self, weights, cached=False, sync_inputs=True):
+        """Make weights the traded and charted pear.
+
+        symbol1/symbol2 always come from the weights (first negative and first
+        positive leg), so they name the loaded basket's own legs.
+        """
+        symbol1, symbol2 = weights_pair(weights)
+        if sync_inputs:
+            if is_unit_pair(weights):
+                self.basket_input.clear()
+                self.symbol1_input.setText(symbol1)
+                self.symbol2_input.setText(symbol2)
+            else:
+                self.basket_input.setText(",".join(f"{symbol}:{weight:g}" for symbol, weight in weights.items()))
+        errors = self.parent().symbol_errors(weights, self.order_size.value())
+        if errors:
+            QMessageBox.warning(self, "Invalid Symbols", "\n".join(errors))
+            return False
+        self.weights = weights
+        self.parent().weights = weights
+        self.symbol1 = symbol1
+        self.symbol2 = symbol2
+        self.parent().symbol1 = symbol1
+        self.parent().symbol2 = symbol2
+        self.parent().create_chart(symbol1, symbol2, cached=cached)
+        # Fetches history only for symbols the funding book does not track yet
+        self.parent().refresh_funding()
+        self.update_symbols(symbol1, symbol2)
+        return True
 
     def closeEvent(self, event):
         self.hide()
@@ -883,10 +2061,24 @@ class TradingDialog(QDialog):
                 f.write("timestamp,trade_id,trade_type,symbol1,qty1,price1,symbol2,qty2,price2\n")  # Write header
             f.write(log_entry)
 
+    def log_pear(self, trade_type, pear, prices):
+        # Negative-weight legs go in the symbol1 columns and positive-weight legs in symbol2,
+        # so a two-leg pear logs exactly one row and a basket logs one row per leg pairing
+        for base_leg, quote_leg in zip_longest(pear.base_legs(), pear.quote_legs()):
+            self.log_trade(
+                trade_type,
+                base_leg.symbol if base_leg else '', quote_leg.symbol if quote_leg else '',
+                base_leg.qty if base_leg else '', quote_leg.qty if quote_leg else '',
+                prices.get(base_leg.symbol) if base_leg else '', prices.get(quote_leg.symbol) if quote_leg else '',
+                pear.trade_id
+            )
+
     def generate_trade_id(self):
         return str(uuid.uuid4())
 
 def main():
+    # Set up logging; records are written on a background thread
+    setup_logging()
     app = QApplication([])
     app.setStyle("Fusion")
     palette = QPalette()
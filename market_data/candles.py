@@ -0,0 +1,224 @@
+import time
+import logging
+import threading
+import numpy as np
+from config.config import *
+
+logger = logging.getLogger(__name__)
+
+MINUTE_MS = 60_000
+
+# Chart intervals offered in the UI -> minutes per candle
+CHART_INTERVALS = {"1m": 1, "5m": 5, "15m": 15, "1h": 60, "4h": 240, "1D": 1440}
+
+# Columns of a cached candle matrix
+TS, OPEN, HIGH, LOW, CLOSE, VOLUME = range(6)
+
+def parse_klines(response):
+    # Chronological float matrix (ts, o, h, l, c, v) from a get_kline response
+    rows = response['result']['list'] if response and response.get('retCode') == 0 else []
+    if not rows:
+        return np.empty((0, 6))
+    return np.array([row[:6] for row in rows], dtype=float)[::-1]
+
+def merge_candles(existing, new, max_rows):
+    """Merge chronological candle matrices, newer rows replacing older ones with
+    the same timestamp, keeping only the last max_rows."""
+    if not len(existing):
+        merged = new
+    elif not len(new):
+        merged = existing
+    else:
+        merged = np.concatenate([existing[existing[:, TS] < new[0, TS]], new])
+        if len(existing) and existing[-1, TS] > new[-1, TS]:
+            merged = np.concatenate([merged, existing[existing[:, TS] > new[-1, TS]]])
+    return merged[-max_rows:]
+
+class CandleCache:
+    """Minute candles per symbol, fetched once and then topped up incrementally.
+
+    Every chart interval is aggregated locally from these rows, so switching
+    from 1m to 4h or zooming out never refetches history.
+    """
+
+    def __init__(self, client, history_minutes=CANDLE_HISTORY_MINUTES, max_minutes=CANDLE_CACHE_MAX_MINUTES):
+        self.client = client
+        self.history_minutes = history_minutes
+        self.max_minutes = max_minutes
+        self.candles = {}  # symbol -> chronological (n, 6) array
+        self.versions = {}  # symbol -> bumped whenever candles change
+        self.depths = {}  # symbol -> minutes of history backfilled so far
+        self.refreshed_at = {}  # symbol -> monotonic seconds of the last successful refresh
+        self.lock = threading.Lock()
+
+    def get(self, symbol):
+        with self.lock:
+            return self.candles.get(symbol)
+
+    def version(self, symbols):
+        with self.lock:
+            return tuple(self.versions.get(symbol, 0) for symbol in symbols)
+
+    def age(self, symbol):
+        # Milliseconds since any consumer last refreshed the symbol
+        refreshed_at = self.refreshed_at.get(symbol)
+        return float('inf') if refreshed_at is None else (time.monotonic() - refreshed_at) * 1000
+
+    def depth(self, symbol):
+        return self.depths.get(symbol, 0)
+
+    def fetch(self, symbol, limit, end=None):
+        response = self.client.get_kline_data(symbol, "1", limit, end=end)
+        if response is None or response.get('retCode') != 0:
+            logger.error("Error getting kline data for %s: %s", symbol, response.get('retMsg') if response else 'No response')
+            return None
+        return parse_klines(response)
+
+    def backfill(self, symbol, minutes=None, end=None):
+        # Page backwards from end (default now) in API-sized chunks until `minutes` are covered
+        pages = []
+        remaining = minutes or self.history_minutes
+        while remaining > 0:
+            page = self.fetch(symbol, min(KLINE_PAGE_LIMIT, remaining), end)
+            if page is None or not len(page):
+                break
+            pages.append(page)
+            remaining -= len(page)
+            end = page[0, TS] - 1
+            if len(page) < min(KLINE_PAGE_LIMIT, remaining + len(page)):
+                break  # Reached the start of the listing
+        return np.concatenate(pages[::-1]) if pages else None
+
+    def refresh(self, symbol, history_minutes=None):
+        """Fetch only the minutes since the last cached candle (plus the forming one).
+
+        A symbol first loaded with less history (e.g. by the watchlist) is
+        deepened to history_minutes, default the cache's own, by paging
+        back from its oldest candle.
+        """
+        history_minutes = history_minutes or self.history_minutes
+        cached = self.get(symbol)
+        depth = history_minutes
+        if cached is None or not len(cached):
+            new = self.backfill(symbol, history_minutes)
+        else:
+            # The wall clock only gives a first guess (the exchange clock may run ahead, e.g. paper
+            # trading), so widen the request until it overlaps the cache and leaves no gap
+            limit = min(max(int((time.time() * 1000 - cached[-1, TS]) // MINUTE_MS) + 2, 2), KLINE_PAGE_LIMIT)
+            while True:
+                new = self.fetch(symbol, limit)
+                if new is None or not len(new) or new[0, TS] <= cached[-1, TS] or limit >= KLINE_PAGE_LIMIT:
+                    break
+                limit = min(limit * 4, KLINE_PAGE_LIMIT)
+            if new is not None and len(new) and new[0, TS] > cached[-1, TS]:
+                new = self.backfill(symbol, history_minutes)
+            elif new is not None and self.depth(symbol) < history_minutes:
+                older = self.backfill(symbol, history_minutes - self.depth(symbol), cached[0, TS] - 1)
+                if older is not None:
+                    new = merge_candles(merge_candles(older, cached, self.max_minutes), new, self.max_minutes)
+                else:
+                    depth = 0
+            else:
+                depth = 0  # Only topped up; the recorded depth stands
+        if new is None:
+            return cached is not None
+        with self.lock:
+            self.candles[symbol] = merge_candles(self.candles.get(symbol, np.empty((0, 6))), new, self.max_minutes)
+            self.versions[symbol] = self.versions.get(symbol, 0) + 1
+            self.depths[symbol] = max(self.depths.get(symbol, 0), depth)
+            self.refreshed_at[symbol] = time.monotonic()
+        return True
+
+def aggregate(candles, minutes):
+    """OHLCV candles of `minutes` each from chronological minute candles."""
+    if minutes <= 1 or not len(candles):
+        return candles
+    buckets = (candles[:, TS] // (minutes * MINUTE_MS)).astype(np.int64)
+    starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+    ends = np.append(starts[1:], len(candles)) - 1
+    return np.column_stack([
+        buckets[starts] * minutes * MINUTE_MS,
+        candles[starts, OPEN],
+        np.maximum.reduceat(candles[:, HIGH], starts),
+        np.minimum.reduceat(candles[:, LOW], starts),
+        candles[ends, CLOSE],
+        np.add.reduceat(candles[:, VOLUME], starts),
+    ])
+
+def aggregate_last(timestamps, values, minutes):
+    # Last value per bucket, for a line series such as a basket price
+    if minutes <= 1 or not len(timestamps):
+        return timestamps, values
+    buckets = (timestamps // (minutes * MINUTE_MS)).astype(np.int64)
+    ends = np.append(np.flatnonzero(np.diff(buckets)), len(buckets) - 1)
+    return buckets[ends] * minutes * MINUTE_MS, values[ends]
+
+def minmax_downsample(x, y, points):
+    """Keep the first, min, max and last point of each of points/4 buckets.
+
+    Fully vectorised and preserves every spike, so the plotted line looks
+    identical to the full series at the given pixel width.
+    """
+    n = len(x)
+    buckets = max(1, points // 4)
+    if n <= points or buckets < 2:
+        return x, y
+    size = n // buckets
+    usable = size * buckets
+    block = y[:usable].reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    index = np.concatenate([
+        offsets,
+        offsets + block.argmin(axis=1),
+        offsets + block.argmax(axis=1),
+        offsets + size - 1,
+        np.arange(usable, n),  # Remainder that does not fill a bucket
+    ])
+    index = np.unique(index)
+    return x[index], y[index]
+
+def lttb(x, y, points):
+    """Largest-Triangle-Three-Buckets downsampling to `points` points."""
+    n = len(x)
+    if n <= points or points < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    keep = np.empty(points, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    previous = 0
+    for i in range(points - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean() if next_end > next_start else x[-1]
+        avg_y = y[next_start:next_end].mean() if next_end > next_start else y[-1]
+        # Twice the triangle area for every candidate in the bucket; pick the largest
+        areas = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(areas.argmax())
+        keep[i + 1] = previous
+    return x[keep], y[keep]
+
+def downsample(x, y, points, method=CHART_DOWNSAMPLE):
+    return lttb(x, y, points) if method == 'lttb' else minmax_downsample(x, y, points)
+
+def visible_slice(x, x_min, x_max):
+    # Indices covering [x_min, x_max] plus one point either side so the line reaches the edges
+    start = max(0, int(np.searchsorted(x, x_min, side='left')) - 1)
+    end = min(len(x), int(np.searchsorted(x, x_max, side='right')) + 1)
+    return slice(start, end)
+
+def benchmark(n=1_000_000, points=2000):
+    rng = np.random.default_rng(0)
+    x = np.arange(n, dtype=float)
+    y = np.cumsum(rng.normal(size=n))
+    for method in ('minmax', 'lttb'):
+        start = time.perf_counter()
+        xs, _ = downsample(x, y, points, method)
+        print(f"{method:>6}: {n:,} -> {len(xs):,} points in {(time.perf_counter() - start) * 1000:.1f} ms")
+    candles = np.column_stack([x * MINUTE_MS, y, y + 1, y - 1, y, np.ones(n)])
+    start = time.perf_counter()
+    aggregate(candles, 240)
+    print(f"aggregate 1m -> 4h: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,538 @@
+import os
+import json
+import time
+import socket
+import argparse
+import threading
+import socketserver
+import logging
+import numpy as np
+from multiprocessing import shared_memory
+from config.config import *
+
+logger = logging.getLogger(__name__)
+
+BUS_MAGIC = 0x50454152  # "PEAR"
+BUS_VERSION = 1
+HEADER_FIELDS = 8
+NAME_BYTES = 16
+
+# Ticker row columns
+TICKER_TS, TICKER_LAST, TICKER_BID, TICKER_ASK, TICKER_MARK, TICKER_FUNDING, TICKER_CHANGE_24H = range(7)
+TICKER_COLUMNS = 7
+# Candle row columns: timestamp, open, high, low, close, volume
+CANDLE_COLUMNS = 6
+
+SEQLOCK_RETRIES = 1000
+
+def bus_layout(max_symbols, candle_capacity):
+    # (name, dtype, shape) in segment order; every block is 8-byte aligned
+    return [
+        ('header', np.int64, (HEADER_FIELDS,)),
+        ('names', f'S{NAME_BYTES}', (max_symbols,)),
+        ('ticker_seq', np.int64, (max_symbols,)),
+        ('tickers', np.float64, (max_symbols, TICKER_COLUMNS)),
+        ('candle_seq', np.int64, (max_symbols,)),
+        ('candle_count', np.int64, (max_symbols,)),
+        ('candles', np.float64, (max_symbols, candle_capacity, CANDLE_COLUMNS)),
+    ]
+
+def attach_shared_memory(name):
+    # Readers must not unlink the feeder's segment when they exit
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the segment with the resource
+        # tracker, which would unlink it when this process exits
+        from multiprocessing import resource_tracker
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+class MarketDataBus:
+    """Shared-memory ticker slots and candle rings for one host.
+
+    One writer (the feeder) owns the segment; any number of processes map it
+    and read without copying the ring or taking locks. Each symbol slot is
+    guarded by a sequence counter (seqlock): the writer makes it odd while
+    writing and even when done, and a reader retries if it saw an odd value
+    or the counter changed during its read.
+    """
+
+    def __init__(self, shm, create=False, max_symbols=None, candle_capacity=None):
+        self.shm = shm
+        self.created = create
+        if create:
+            self._map(max_symbols, candle_capacity)
+            self.header[:] = [BUS_MAGIC, BUS_VERSION, max_symbols, candle_capacity, 0, 0, 0, 0]
+        else:
+            header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+            if header[0] != BUS_MAGIC or header[1] != BUS_VERSION:
+                raise ValueError(f"Shared memory segment {shm.name} is not a market data bus")
+            self._map(int(header[2]), int(header[3]))
+
+    def _map(self, max_symbols, candle_capacity):
+        self.max_symbols = max_symbols
+        self.candle_capacity = candle_capacity
+        offset = 0
+        for name, dtype, shape in bus_layout(max_symbols, candle_capacity):
+            array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+            setattr(self, name, array)
+            offset += (array.nbytes + 7) // 8 * 8
+
+    @staticmethod
+    def size(max_symbols, candle_capacity):
+        return sum((int(np.prod(shape)) * np.dtype(dtype).itemsize + 7) // 8 * 8
+                   for _, dtype, shape in bus_layout(max_symbols, candle_capacity))
+
+    @classmethod
+    def create(cls, name=DATA_BUS_NAME, max_symbols=DATA_BUS_MAX_SYMBOLS, candle_capacity=DATA_BUS_CANDLE_CAPACITY):
+        size = cls.size(max_symbols, candle_capacity)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a feeder that did not shut down cleanly
+            stale = attach_shared_memory(name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        return cls(shm, create=True, max_symbols=max_symbols, candle_capacity=candle_capacity)
+
+    @classmethod
+    def attach(cls, name=DATA_BUS_NAME):
+        return cls(attach_shared_memory(name))
+
+    def close(self):
+        # Drop numpy views before releasing the mapping
+        for name, _, _ in bus_layout(self.max_symbols, self.candle_capacity):
+            setattr(self, name, None)
+        self.shm.close()
+        if self.created:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    # Slot table
+
+    def slot_name(self, slot):
+        return self.names[slot].decode()
+
+    def find_slot(self, symbol):
+        matches = np.flatnonzero(self.names == symbol.encode())
+        return int(matches[0]) if len(matches) else None
+
+    def assign_slot(self, symbol):
+        slot = self.find_slot(symbol)
+        if slot is not None:
+            return slot
+        free = np.flatnonzero(self.names == b'')
+        if not len(free):
+            raise RuntimeError("Market data bus is full")
+        slot = int(free[0])
+        self.ticker_seq[slot] = 0
+        self.candle_seq[slot] = 0
+        self.candle_count[slot] = 0
+        self.names[slot] = symbol.encode()
+        return slot
+
+    def release_slot(self, symbol):
+        # Frees the slot for another symbol; readers mid-read see the counters move and retry
+        slot = self.find_slot(symbol)
+        if slot is None:
+            return
+        self.ticker_seq[slot] += 1
+        self.candle_seq[slot] += 1
+        self.names[slot] = b''
+        self.tickers[slot] = np.nan
+        self.candle_count[slot] = 0
+        self.ticker_seq[slot] += 1
+        self.candle_seq[slot] += 1
+
+    # Writer side
+
+    def write_ticker(self, slot, values):
+        self.ticker_seq[slot] += 1
+        self.tickers[slot] = values
+        self.ticker_seq[slot] += 1
+
+    def write_candles(self, slot, rows):
+        """Append chronological candle rows, replacing the forming candle
+        when a row repeats the last written timestamp."""
+        if not len(rows):
+            return
+        self.candle_seq[slot] += 1
+        count = int(self.candle_count[slot])
+        capacity = self.candle_capacity
+        last_ts = self.candles[slot, (count - 1) % capacity, 0] if count else -1
+        for row in rows:
+            if row[0] < last_ts:
+                continue
+            if row[0] == last_ts:
+                self.candles[slot, (count - 1) % capacity] = row
+            else:
+                self.candles[slot, count % capacity] = row
+                count += 1
+                last_ts = row[0]
+        self.candle_count[slot] = count
+        self.candle_seq[slot] += 1
+
+    # Reader side
+
+    def read_ticker(self, slot):
+        for _ in range(SEQLOCK_RETRIES):
+            seq = self.ticker_seq[slot]
+            if seq & 1:
+                continue
+            values = self.tickers[slot].copy()
+            if self.ticker_seq[slot] == seq:
+                return values if seq else None
+        return None
+
+    def read_candles(self, slot, limit):
+        for _ in range(SEQLOCK_RETRIES):
+            seq = self.candle_seq[slot]
+            if seq & 1:
+                continue
+            count = int(self.candle_count[slot])
+            n = min(int(limit), count, self.candle_capacity)
+            rows = self.candles[slot, (count - n + np.arange(n)) % self.candle_capacity]
+            if self.candle_seq[slot] == seq:
+                return rows
+        return None
+
+class ControlHandler(socketserver.StreamRequestHandler):
+    # One JSON request per line: {"op": "subscribe"|"unsubscribe"|"list", "symbols": [...]}
+    def handle(self):
+        feeder = self.server.feeder
+        owned = set()
+        try:
+            for line in self.rfile:
+                try:
+                    request = json.loads(line)
+                    op = request.get('op')
+                    symbols = [symbol.upper() for symbol in request.get('symbols', [])]
+                    if op == 'subscribe':
+                        feeder.subscribe([symbol for symbol in symbols if symbol not in owned])
+                        owned.update(symbols)
+                        reply = {'ok': True, 'slots': {symbol: feeder.bus.find_slot(symbol) for symbol in symbols}}
+                    elif op == 'unsubscribe':
+                        feeder.unsubscribe([symbol for symbol in symbols if symbol in owned])
+                        owned.difference_update(symbols)
+                        reply = {'ok': True}
+                    elif op == 'list':
+                        reply = {'ok': True, 'subscriptions': feeder.subscriptions()}
+                    else:
+                        reply = {'ok': False, 'error': f"unknown op {op}"}
+                except Exception as e:
+                    reply = {'ok': False, 'error': str(e)}
+                self.wfile.write((json.dumps(reply) + "\n").encode())
+        finally:
+            # A consumer that disconnects releases everything it subscribed to
+            feeder.unsubscribe(list(owned))
+
+class UnixControlServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class TCPControlServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def control_address():
+    if hasattr(socket, 'AF_UNIX'):
+        return DATA_BUS_CONTROL_PATH
+    return ('127.0.0.1', DATA_BUS_CONTROL_PORT)
+
+class DataBusFeeder:
+    """Owns the exchange connection for every local consumer: one bulk ticker
+    call per cycle and incremental klines for subscribed symbols, published
+    into the shared-memory bus."""
+
+    def __init__(self, client, bus=None):
+        self.client = client
+        self.bus = bus or MarketDataBus.create()
+        self.lock = threading.Lock()
+        self.refcounts = {}
+        self.server = None
+        self.running = False
+
+    def subscribe(self, symbols):
+        with self.lock:
+            for symbol in symbols:
+                self.bus.assign_slot(symbol)
+                self.refcounts[symbol] = self.refcounts.get(symbol, 0) + 1
+        return symbols
+
+    def unsubscribe(self, symbols):
+        with self.lock:
+            for symbol in symbols:
+                if symbol in self.refcounts:
+                    self.refcounts[symbol] -= 1
+                    if self.refcounts[symbol] <= 0:
+                        del self.refcounts[symbol]
+                        self.bus.release_slot(symbol)
+
+    def subscriptions(self):
+        with self.lock:
+            return dict(self.refcounts)
+
+    def start_control_server(self):
+        address = control_address()
+        if isinstance(address, str):
+            if os.path.exists(address):
+                os.remove(address)
+            self.server = UnixControlServer(address, ControlHandler)
+        else:
+            self.server = TCPControlServer(address, ControlHandler)
+        self.server.feeder = self
+        threading.Thread(target=self.server.serve_forever, name="data-bus-control", daemon=True).start()
+
+    def publish_tickers(self):
+        symbols = set(self.subscriptions())
+        if not symbols:
+            return
+        tickers = self.client.get_tickers(category=BYBIT_CATEGORY)
+        if not tickers or tickers['retCode'] != 0:
+            logger.error("Error getting tickers for data bus: %s", tickers['retMsg'] if tickers else 'No response')
+            return
+        now = time.time() * 1000
+        # Under the lock so no slot is released or reused between its lookup and the write
+        with self.lock:
+            for ticker in tickers['result']['list']:
+                if ticker['symbol'] not in symbols:
+                    continue
+                slot = self.bus.find_slot(ticker['symbol'])
+                if slot is None:
+                    continue
+                self.bus.write_ticker(slot, [
+                    now,
+                    float(ticker.get('lastPrice') or 'nan'),
+                    float(ticker.get('bid1Price') or 'nan'),
+                    float(ticker.get('ask1Price') or 'nan'),
+                    float(ticker.get('markPrice') or 'nan'),
+                    float(ticker.get('fundingRate') or 'nan'),
+                    float(ticker.get('price24hPcnt') or 'nan'),
+                ])
+
+    def publish_candles(self):
+        for symbol in self.subscriptions():
+            slot = self.bus.find_slot(symbol)
+            if slot is None:
+                continue
+            # Backfill once, then only the last few candles
+            limit = DATA_BUS_CANDLE_CAPACITY if self.bus.candle_count[slot] == 0 else DATA_BUS_KLINE_REFRESH_LIMIT
+            response = self.client.get_kline_data(symbol, "1", min(limit, 1000))
+            if not response or response['retCode'] != 0:
+                logger.error("Error getting klines for data bus %s: %s", symbol, response['retMsg'] if response else 'No response')
+                continue
+            rows = np.array(response['result']['list'], dtype=float)[::-1, :CANDLE_COLUMNS]
+            with self.lock:
+                # The symbol may have been released, or its slot reused, while the klines were fetched
+                if self.bus.find_slot(symbol) == slot:
+                    self.bus.write_candles(slot, rows)
+
+    def run(self):
+        self.start_control_server()
+        self.running = True
+        last_candles = 0.0
+        logger.info("Data bus feeder running on %s", DATA_BUS_NAME)
+        try:
+            while self.running:
+                started = time.monotonic()
+                self.publish_tickers()
+                if started - last_candles >= DATA_BUS_KLINE_INTERVAL / 1000:
+                    self.publish_candles()
+                    last_candles = started
+                time.sleep(max(0.0, DATA_BUS_TICKER_INTERVAL / 1000 - (time.monotonic() - started)))
+        finally:
+            self.stop()
+
+    def stop(self):
+        self.running = False
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            if isinstance(control_address(), str) and os.path.exists(DATA_BUS_CONTROL_PATH):
+                os.remove(DATA_BUS_CONTROL_PATH)
+            self.server = None
+
+class DataBusClient:
+    """Consumer side: maps the bus and manages subscriptions over the control socket."""
+
+    def __init__(self, name=DATA_BUS_NAME):
+        self.bus = MarketDataBus.attach(name)
+        address = control_address()
+        self.sock = socket.socket(socket.AF_UNIX if isinstance(address, str) else socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.connect(address)
+        self.reader = self.sock.makefile('rb')
+        self.lock = threading.Lock()
+        self.slots = {}
+
+    def request(self, payload):
+        with self.lock:
+            self.sock.sendall((json.dumps(payload) + "\n").encode())
+            return json.loads(self.reader.readline())
+
+    def subscribe(self, symbols):
+        missing = [symbol for symbol in symbols if symbol not in self.slots]
+        if missing:
+            reply = self.request({'op': 'subscribe', 'symbols': missing})
+            if reply.get('ok'):
+                self.slots.update(reply['slots'])
+            else:
+                logger.error("Data bus subscribe failed: %s", reply.get('error'))
+        return {symbol: self.slots.get(symbol) for symbol in symbols}
+
+    def unsubscribe(self, symbols):
+        self.request({'op': 'unsubscribe', 'symbols': list(symbols)})
+        for symbol in symbols:
+            self.slots.pop(symbol, None)
+
+    def ticker(self, symbol):
+        slot = self.slots.get(symbol)
+        return None if slot is None else self.bus.read_ticker(slot)
+
+    def candles(self, symbol, limit):
+        slot = self.slots.get(symbol)
+        return None if slot is None else self.bus.read_candles(slot, limit)
+
+    def close(self):
+        try:
+            self.reader.close()
+            self.sock.close()
+        finally:
+            self.bus.close()
+
+class BusBackedClient:
+    """Wraps a BybitAPIClient so market data reads come from the local bus and
+    everything else (orders, wallet, positions) goes to the wrapped client.
+    Symbols are subscribed on first use; until the feeder has published them
+    reads fall through to REST."""
+
+    def __init__(self, client, bus_client):
+        self.client = client
+        self.bus_client = bus_client
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def get_kline_data(self, symbol, interval, limit, end=None):
+        if str(interval) == "1" and end is None:
+            self.bus_client.subscribe([symbol])
+            rows = self.bus_client.candles(symbol, limit)
+            if rows is not None and len(rows) >= min(int(limit), DATA_BUS_CANDLE_CAPACITY):
+                return {'retCode': 0, 'retMsg': 'OK', 'result': {'symbol': symbol, 'category': BYBIT_CATEGORY, 'list': [
+                    [str(int(row[0]))] + [repr(float(value)) for value in row[1:]] + ['0'] for row in rows[::-1]
+                ]}}
+        return self.client.get_kline_data(symbol, interval, limit, end=end)
+
+    def get_last_prices(self, symbols):
+        symbols = list(symbols)
+        self.bus_client.subscribe(symbols)
+        prices = {}
+        for symbol in symbols:
+            values = self.bus_client.ticker(symbol)
+            if values is not None and not np.isnan(values[TICKER_LAST]):
+                prices[symbol] = float(values[TICKER_LAST])
+        missing = [symbol for symbol in symbols if symbol not in prices]
+        if missing:
+            prices.update(self.client.get_last_prices(missing))
+        return prices
+
+    def get_current_price(self, symbol):
+        return self.get_last_prices([symbol]).get(symbol)
+
+    def get_current_prices(self, symbol1, symbol2):
+        prices = self.get_last_prices([symbol1, symbol2])
+        return prices.get(symbol1), prices.get(symbol2)
+
+def connect_data_bus(client):
+    # Returns a bus-backed client when a feeder is running, otherwise the client itself
+    try:
+        return BusBackedClient(client, DataBusClient())
+    except (FileNotFoundError, ConnectionRefusedError, ValueError, OSError) as e:
+        logger.warning("Market data bus unavailable, using direct API calls: %s", e)
+        return client
+
+def _bench_writer(name, slots, stop):
+    bus = MarketDataBus.attach(name)
+    price = 100.0
+    while not stop.is_set():
+        for slot in range(slots):
+            price += 0.01
+            bus.write_ticker(slot, [time.time() * 1000, price, price, price, price, 0.0, 0.0])
+    bus.close()
+
+def _bench_reader(name, slots, reads, results):
+    bus = MarketDataBus.attach(name)
+    latencies = np.empty(reads)
+    for i in range(reads):
+        start = time.perf_counter_ns()
+        bus.read_ticker(i % slots)
+        latencies[i] = time.perf_counter_ns() - start
+    results.put((float(np.median(latencies)), float(np.percentile(latencies, 99))))
+    bus.close()
+
+def benchmark(consumers=10, slots=32, reads=200000):
+    import multiprocessing
+    name = f"{DATA_BUS_NAME}_bench"
+    bus = MarketDataBus.create(name, max_symbols=slots, candle_capacity=16)
+    for slot in range(slots):
+        bus.assign_slot(f"SYM{slot}USDT")
+    stop = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    writer = multiprocessing.Process(target=_bench_writer, args=(name, slots, stop))
+    writer.start()
+    readers = [multiprocessing.Process(target=_bench_reader, args=(name, slots, reads, results)) for _ in range(consumers)]
+    for reader in readers:
+        reader.start()
+    stats = [results.get() for _ in readers]
+    for reader in readers:
+        reader.join()
+    stop.set()
+    writer.join()
+    bus.close()
+    medians, p99s = zip(*stats)
+    print(f"{consumers} consumers x {reads:,} ticker reads against a live writer:")
+    print(f"  median read latency {np.median(medians) / 1000:.2f} us, worst p99 {max(p99s) / 1000:.2f} us")
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared-memory market data bus")
+    sub = parser.add_subparsers(dest='command', required=True)
+    feed = sub.add_parser('feed', help="Run the feeder that owns the exchange connection")
+    feed.add_argument('--symbols', default="", help="Comma-separated symbols to publish before any consumer subscribes")
+    bench = sub.add_parser('bench', help="Measure fan-out read latency")
+    bench.add_argument('--consumers', type=int, default=10)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.command == 'bench':
+        benchmark(args.consumers)
+        return
+
+    if PAPER_TRADING:
+        from trading_api.paper_exchange import PaperExchangeClient
+        client = PaperExchangeClient()
+        client.start()
+    else:
+        from dotenv import load_dotenv
+        from trading_api.bybit_api import BybitAPIClient
+        load_dotenv()
+        suffix = "_TESTNET" if TESTNET else ""
+        client = BybitAPIClient(os.getenv(API_KEY_ENV_VAR + suffix), os.getenv(API_SECRET_ENV_VAR + suffix))
+    feeder = DataBusFeeder(client)
+    symbols = [symbol.strip().upper() for symbol in args.symbols.split(',') if symbol.strip()]
+    if symbols:
+        feeder.subscribe(symbols)
+    try:
+        feeder.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        feeder.bus.close()
+
+if __name__ == "__main__":
+    main()
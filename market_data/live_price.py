@@ -0,0 +1,100 @@
+import time
+import logging
+import threading
+import numpy as np
+from config.config import *
+
+logger = logging.getLogger(__name__)
+
+class LivePrices:
+    """Latest streamed price per symbol.
+
+    Stream threads call update() for every tick. A tick only stores the
+    price, and listeners are told once per batch: they are called on the
+    first tick after the GUI took the dirty set, so a burst of ticks costs
+    one notification and the GUI flushes at its own pace.
+    """
+
+    def __init__(self, staleness_ms=LIVE_PRICE_STALENESS_MS):
+        self.staleness_ms = staleness_ms
+        self.lock = threading.Lock()
+        self.prices = {}  # symbol -> (price, exchange ms, receipt monotonic seconds)
+        self.dirty = set()
+        self.ticks = 0
+        self._listeners = []
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def update(self, symbol, price, ts_ms):
+        with self.lock:
+            self.prices[symbol] = (price, ts_ms, time.monotonic())
+            notify = not self.dirty
+            self.dirty.add(symbol)
+            self.ticks += 1
+        if notify:
+            for callback in self._listeners:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error("Error in live price listener: %s", e)
+
+    def touch(self, symbol, ts_ms):
+        # A push without a new trade price: the stream is alive and the last price still stands
+        with self.lock:
+            entry = self.prices.get(symbol)
+            if entry is not None:
+                self.prices[symbol] = (entry[0], max(entry[1], ts_ms), time.monotonic())
+
+    def take_dirty(self):
+        # Symbols that ticked since the last call
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+        return dirty
+
+    def fresh_prices(self, symbols):
+        """{symbol: price} for symbols whose last tick arrived within the staleness tolerance."""
+        cutoff = time.monotonic() - self.staleness_ms / 1000
+        with self.lock:
+            entries = [(symbol, self.prices.get(symbol)) for symbol in symbols]
+        return {symbol: entry[0] for symbol, entry in entries if entry is not None and entry[2] >= cutoff}
+
+    def basket_price(self, weights):
+        """(prod(price ** weight), exchange ms) from the legs' latest ticks, or None.
+
+        Legs are joined as of the newest tick. The result is None unless every
+        leg's stream was heard from within the staleness tolerance, so a leg
+        whose stream went quiet never pairs an old price with a new one.
+        """
+        cutoff = time.monotonic() - self.staleness_ms / 1000
+        with self.lock:
+            entries = [self.prices.get(symbol) for symbol in weights]
+        if any(entry is None or entry[2] < cutoff or entry[0] <= 0 for entry in entries):
+            return None
+        prices = np.array([entry[0] for entry in entries])
+        exponents = np.fromiter(weights.values(), dtype=float, count=len(weights))
+        return float(np.exp(np.log(prices) @ exponents)), max(entry[1] for entry in entries)
+
+def benchmark(ticks=200000, symbols=20):
+    prices = LivePrices()
+    notified = []
+    prices.add_listener(lambda: notified.append(1))
+    names = [f"SYM{i}USDT" for i in range(symbols)]
+    rng = np.random.default_rng(0)
+    values = 100 * np.exp(np.cumsum(rng.normal(0, 1e-4, ticks)))
+    now = int(time.time() * 1000)
+    start = time.perf_counter()
+    for i in range(ticks):
+        prices.update(names[i % symbols], values[i], now + i)
+        if i % 1000 == 999:
+            prices.take_dirty()  # A GUI flush every 1000 ticks
+    elapsed = time.perf_counter() - start
+    print(f"update: {elapsed / ticks * 1e6:.2f} us per tick, {len(notified)} notifications for {ticks} ticks")
+    weights = {names[0]: -1.0, names[1]: 1.0}
+    start = time.perf_counter()
+    for _ in range(10000):
+        prices.basket_price(weights)
+    print(f"basket_price: {(time.perf_counter() - start) / 10000 * 1e6:.2f} us")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,176 @@
+import time
+import logging
+import numpy as np
+from config.config import *
+
+logger = logging.getLogger(__name__)
+
+class Subscription:
+    """One polled feed and its cadence.
+
+    The interval in force is, in priority order: exponential backoff after
+    failures, the fast interval while boosted, the idle interval while
+    nothing depends on the feed, otherwise the normal interval.
+    """
+
+    __slots__ = ('name', 'callback', 'interval', 'fast_interval', 'idle_interval', 'max_interval',
+                 'next_due', 'paused', 'idle', 'errors', 'boost_until', 'last_run', 'runs', 'failures')
+
+    def __init__(self, name, callback, interval, fast_interval=None, idle_interval=None, max_interval=POLL_MAX_BACKOFF):
+        self.name = name
+        self.callback = callback
+        self.interval = interval
+        self.fast_interval = fast_interval or interval
+        self.idle_interval = idle_interval or interval
+        self.max_interval = max(max_interval, interval)
+        self.next_due = 0.0
+        self.paused = False
+        self.idle = False
+        self.errors = 0
+        self.boost_until = 0.0
+        self.last_run = None
+        self.runs = 0
+        self.failures = 0
+
+    def current_interval(self, now):
+        if self.errors:
+            return min(self.interval * 2 ** self.errors, self.max_interval)
+        if now < self.boost_until:
+            return self.fast_interval
+        if self.idle:
+            return self.idle_interval
+        return self.interval
+
+class PollScheduler:
+    """Runs every subscription on its own cadence from a single timer.
+
+    The owner calls run_due() whenever its timer fires and re-arms the timer
+    for the returned delay, so however many feeds there are, only the next
+    one due wakes the event loop. Times are in milliseconds.
+    """
+
+    def __init__(self, clock=None):
+        self.clock = clock or (lambda: time.monotonic() * 1000)
+        self.subscriptions = {}
+        self.running = True
+
+    def add(self, name, callback, interval, fast_interval=None, idle_interval=None, max_interval=POLL_MAX_BACKOFF):
+        subscription = Subscription(name, callback, interval, fast_interval, idle_interval, max_interval)
+        subscription.next_due = self.clock()
+        self.subscriptions[name] = subscription
+        return subscription
+
+    def stop(self):
+        self.running = False
+
+    def pause(self, name):
+        self.subscriptions[name].paused = True
+
+    def resume(self, name):
+        # A feed that missed its slot while paused runs on the next timer tick
+        subscription = self.subscriptions[name]
+        if subscription.paused:
+            subscription.paused = False
+            subscription.next_due = min(subscription.next_due, self.clock())
+
+    def set_idle(self, name, idle):
+        subscription = self.subscriptions[name]
+        if subscription.idle and not idle:
+            subscription.next_due = min(subscription.next_due, self._after_last_run(subscription, subscription.interval))
+        subscription.idle = idle
+
+    def set_max_interval(self, name, max_interval):
+        # Caps the failure backoff, e.g. while something time-critical depends on the feed
+        subscription = self.subscriptions[name]
+        subscription.max_interval = max(max_interval, subscription.interval)
+        if subscription.errors:
+            subscription.next_due = min(subscription.next_due,
+                                        self._after_last_run(subscription, subscription.current_interval(self.clock())))
+
+    def boost(self, name, duration=POLL_BOOST_DURATION):
+        subscription = self.subscriptions[name]
+        now = self.clock()
+        subscription.boost_until = max(subscription.boost_until, now + duration)
+        if not subscription.errors:
+            subscription.next_due = min(subscription.next_due, self._after_last_run(subscription, subscription.fast_interval))
+
+    def _after_last_run(self, subscription, interval):
+        return self.clock() if subscription.last_run is None else subscription.last_run + interval
+
+    def run_due(self):
+        """Run every subscription that is due; milliseconds until the next one, None if none are active."""
+        if not self.running:
+            return None
+        now = self.clock()
+        for subscription in list(self.subscriptions.values()):
+            if subscription.paused or subscription.next_due > now:
+                continue
+            try:
+                ok = subscription.callback() is not False
+            except Exception as e:
+                logger.exception("Polling %s failed: %s", subscription.name, e)
+                ok = False
+            now = self.clock()
+            subscription.runs += 1
+            subscription.last_run = now
+            if ok:
+                subscription.errors = 0
+            else:
+                subscription.errors += 1
+                subscription.failures += 1
+                logger.warning("Polling %s failed %s time(s) in a row, next attempt in %.0fs",
+                               subscription.name, subscription.errors, subscription.current_interval(now) / 1000)
+            subscription.next_due = now + subscription.current_interval(now)
+        return self.next_delay()
+
+    def next_delay(self):
+        due = [s.next_due for s in self.subscriptions.values() if not s.paused]
+        if not self.running or not due:
+            return None
+        return max(0, int(min(due) - self.clock()))
+
+    def stats(self):
+        now = self.clock()
+        return {name: {'runs': s.runs, 'failures': s.failures, 'interval_ms': s.current_interval(now), 'paused': s.paused}
+                for name, s in self.subscriptions.items()}
+
+def volatility_ratio(values, short=POLL_VOLATILITY_SHORT, long=POLL_VOLATILITY_LONG):
+    """Std of the last `short` log returns over the std of the last `long`; above 1 the market is speeding up."""
+    values = np.asarray(values, dtype=float)
+    if len(values) < short + 2 or np.any(values[-long - 1:] <= 0):
+        return 1.0
+    returns = np.diff(np.log(values[-long - 1:]))
+    baseline = returns.std()
+    return float(returns[-short:].std() / baseline) if baseline else 1.0
+
+def simulate(hours=8, tick_ms=1000):
+    """Requests per hour for a session where the chart is hidden half the time,
+    pears are open a third of the time and one burst of volatility happens."""
+    clock = [0.0]
+    calls = {}
+    scheduler = PollScheduler(clock=lambda: clock[0])
+    intervals = {'pears': (PEARS_POLL_INTERVAL, PEARS_POLL_FAST, PEARS_POLL_IDLE),
+                 'positions': (POSITIONS_POLL_INTERVAL, None, POSITIONS_POLL_IDLE),
+                 'account': (ACCOUNT_POLL_INTERVAL, None, ACCOUNT_POLL_IDLE),
+                 'chart': (CHART_POLL_INTERVAL, CHART_POLL_FAST, None)}
+    for name, (interval, fast, idle) in intervals.items():
+        scheduler.add(name, lambda name=name: calls.__setitem__(name, calls.get(name, 0) + 1), interval, fast, idle)
+    end = hours * 3600_000
+    burst = (end * 0.5, end * 0.5 + 600_000)
+    while clock[0] < end:
+        hour = clock[0] / 3600_000
+        (scheduler.pause if int(hour * 2) % 2 else scheduler.resume)('chart')
+        scheduler.set_idle('pears', int(hour * 3) % 3 != 0)
+        if burst[0] <= clock[0] < burst[1]:
+            scheduler.boost('pears')
+            scheduler.boost('chart')
+        scheduler.run_due()
+        clock[0] += tick_ms
+    fixed = hours * 3600_000 / 10000 * len(intervals)
+    adaptive = sum(calls.values())
+    print(f"Fixed 10s polling: {fixed / hours:.0f} refreshes/h; adaptive: {adaptive / hours:.0f} refreshes/h")
+    for name, count in calls.items():
+        print(f"  {name:>9}: {count / hours:.0f}/h")
+
+if __name__ == "__main__":
+    simulate()
@@ -0,0 +1,72 @@
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+KLINE_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume', 'turnover']
+
+def kline_closes(response):
+    # Close prices from a get_kline response as a chronological Series
+    if not response or 'result' not in response or 'list' not in response['result']:
+        return None
+    df = pd.DataFrame(response['result']['list'], columns=KLINE_COLUMNS)
+    closes = pd.Series(
+        df['close'].astype(float).values,
+        index=pd.to_datetime(df['timestamp'].astype('int64'), unit='ms'),
+        name='close'
+    )
+    return closes.sort_index()
+
+def align_closes(closes):
+    """Outer-join per-symbol close series into one matrix.
+
+    A missing candle on one leg is forward-filled from its previous close
+    instead of dropping the timestamp for every leg; only the leading rows
+    before all legs have traded are removed.
+    """
+    matrix = pd.concat(closes, axis=1, join='outer').sort_index()
+    return matrix.ffill().dropna()
+
+def basket_price(matrix, weights):
+    """Geometric basket price: prod(close_i ** weight_i) per row.
+
+    With weights {symbol1: -1, symbol2: 1} this is exactly the pair price
+    close2 / close1; more legs extend it without special cases.
+    """
+    symbols = list(weights)
+    w = np.array([weights[symbol] for symbol in symbols], dtype=float)
+    values = np.exp(np.log(matrix[symbols].to_numpy(dtype=float)) @ w)
+    return pd.Series(values, index=matrix.index, name='basket_price')
+
+def parse_basket(text):
+    """Parse "ETHUSDT:1, SOLUSDT:1, BTCUSDT:-2" into {symbol: weight}."""
+    weights = {}
+    for part in text.replace(';', ',').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        symbol, _, weight = part.partition(':')
+        symbol = symbol.strip().upper()
+        try:
+            weights[symbol] = weights.get(symbol, 0.0) + float(weight or 1)
+        except ValueError:
+            raise ValueError(f"Invalid weight for {symbol}: {weight}")
+    weights = {symbol: weight for symbol, weight in weights.items() if weight}
+    if len(weights) < 2:
+        raise ValueError("A basket needs at least two legs with non-zero weights")
+    if all(weight > 0 for weight in weights.values()) or all(weight < 0 for weight in weights.values()):
+        raise ValueError("A basket needs both long (+) and short (-) legs")
+    return weights
+
+def pair_weights(symbol1, symbol2):
+    return {symbol1: -1.0, symbol2: 1.0}
+
+def weights_pair(weights):
+    """(symbol1, symbol2) of a basket: its first negative and first positive leg."""
+    return (next(symbol for symbol, weight in weights.items() if weight < 0),
+            next(symbol for symbol, weight in weights.items() if weight > 0))
+
+def is_unit_pair(weights):
+    # Only a -1/+1 pair has the plain price2 / price1 ratio that pair-price, trailing and z-score triggers watch
+    return len(weights) == 2 and sorted(weights.values()) == [-1.0, 1.0]
@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import bisect
+import logging
+from config.config import *
+
+logger = logging.getLogger(__name__)
+
+def levenshtein(a, b):
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+def deletions(word, depth):
+    # Every string reachable from word by removing up to depth characters, word included
+    variants = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+        variants |= frontier
+    return variants
+
+class FuzzyIndex:
+    """Symmetric-delete index for typo lookups.
+
+    Two words within edit distance k share a string reachable from both by
+    at most k deletions, so a query only looks up its own deletions and
+    verifies the few candidates found, instead of comparing against every
+    symbol.
+    """
+
+    def __init__(self, words=(), max_distance=SYMBOL_FUZZY_DISTANCE):
+        self.max_distance = max_distance
+        self.variants = {}  # deletion -> [words]
+        for word in words:
+            for variant in deletions(word, max_distance):
+                self.variants.setdefault(variant, []).append(word)
+
+    def search(self, word, max_distance=None):
+        # [(distance, word)] within max_distance, closest first
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        candidates = set()
+        for variant in deletions(word, max_distance):
+            candidates.update(self.variants.get(variant, ()))
+        matches = []
+        for candidate in candidates:
+            if abs(len(candidate) - len(word)) <= max_distance:
+                distance = levenshtein(word, candidate)
+                if distance <= max_distance:
+                    matches.append((distance, candidate))
+        return sorted(matches)
+
+class SymbolInfo:
+    __slots__ = ('symbol', 'status', 'base_coin', 'qty_step', 'min_qty', 'min_notional')
+
+    def __init__(self, symbol, status, base_coin, qty_step, min_qty, min_notional):
+        self.symbol = symbol
+        self.status = status
+        self.base_coin = base_coin
+        self.qty_step = float(qty_step)
+        self.min_qty = float(min_qty)
+        self.min_notional = float(min_notional)
+
+    @classmethod
+    def from_instrument(cls, instrument):
+        lot = instrument.get('lotSizeFilter', {})
+        return cls(
+            instrument['symbol'],
+            instrument.get('status', ''),
+            instrument.get('baseCoin', ''),
+            lot.get('qtyStep') or 0,
+            lot.get('minOrderQty') or 0,
+            lot.get('minNotionalValue') or 0,
+        )
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+class SymbolIndex:
+    """Every tradable symbol of the category, from one paged bulk instruments call.
+
+    Persisted to SYMBOL_INDEX_FILE so startup needs no request while the
+    file is fresh; the file records which exchange it came from (paper,
+    testnet or mainnet) and is refetched when the app runs against another.
+    Lookups, prefix completion (bisect over the sorted names, and over
+    base coins) and typo suggestions (FuzzyIndex) are all in memory.
+    """
+
+    def __init__(self, infos=(), fetched_at=0.0, source=None):
+        self.infos = {info.symbol: info for info in infos}
+        self.fetched_at = fetched_at
+        self.source = source
+        self.sorted_symbols = sorted(self.infos)
+        # Base coins without multiplier prefixes, so "PEPE" finds 1000PEPEUSDT
+        self.sorted_bases = sorted((info.base_coin.lstrip('0123456789'), info.symbol) for info in self.infos.values())
+        self.fuzzy = FuzzyIndex(self.sorted_symbols)
+
+    def __len__(self):
+        return len(self.infos)
+
+    def __contains__(self, symbol):
+        return symbol in self.infos
+
+    def get(self, symbol):
+        return self.infos.get(symbol)
+
+    @classmethod
+    def fetch(cls, client, source=None):
+        instruments, cursor = [], None
+        while True:
+            response = client.get_instruments_info(category=BYBIT_CATEGORY, cursor=cursor)
+            if not response or response['retCode'] != 0:
+                logger.error("Error getting instruments: %s", response['retMsg'] if response else 'No response')
+                return None
+            instruments.extend(response['result']['list'])
+            cursor = response['result'].get('nextPageCursor')
+            if not cursor:
+                break
+        return cls((SymbolInfo.from_instrument(instrument) for instrument in instruments), time.time(), source)
+
+    def save(self, path=SYMBOL_INDEX_FILE):
+        with open(path, 'w') as f:
+            json.dump({'fetched_at': self.fetched_at, 'source': self.source, 'symbols': [info.to_dict() for info in self.infos.values()]}, f)
+
+    @classmethod
+    def load(cls, path=SYMBOL_INDEX_FILE, source=None):
+        # None when the file is missing, unreadable or was fetched from another exchange than source
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if source is not None and data.get('source') != source:
+                logger.info("Ignoring %s: fetched from %s, running against %s", path, data.get('source'), source)
+                return None
+            return cls((SymbolInfo(**item) for item in data['symbols']), data.get('fetched_at', 0.0), data.get('source'))
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            logger.error("Could not parse %s: %s", path, e)
+            return None
+
+    @classmethod
+    def load_or_fetch(cls, client, path=SYMBOL_INDEX_FILE, max_age=SYMBOL_INDEX_MAX_AGE, source=None):
+        cached = cls.load(path, source)
+        if cached is not None and time.time() - cached.fetched_at < max_age:
+            return cached
+        fetched = cls.fetch(client, source)
+        if fetched is not None and len(fetched):
+            fetched.save(path)
+            return fetched
+        # A stale index is still better than none when the exchange is unreachable
+        return cached or cls()
+
+    def complete(self, text, limit=SYMBOL_COMPLETIONS):
+        """Symbols starting with text, then symbols whose base coin starts with it
+        (so "PEPE" also offers 1000PEPEUSDT), then close typos."""
+        text = text.strip().upper()
+        if not text:
+            return []
+        results = []
+        for i in range(bisect.bisect_left(self.sorted_symbols, text), len(self.sorted_symbols)):
+            symbol = self.sorted_symbols[i]
+            if not symbol.startswith(text) or len(results) >= limit:
+                break
+            results.append(symbol)
+        for i in range(bisect.bisect_left(self.sorted_bases, (text,)), len(self.sorted_bases)):
+            base, symbol = self.sorted_bases[i]
+            if not base.startswith(text) or len(results) >= limit:
+                break
+            if symbol not in results:
+                results.append(symbol)
+        if len(results) < limit and len(text) > SYMBOL_FUZZY_DISTANCE:
+            results.extend(word for _, word in self.suggest(text) if word not in results)
+        return results[:limit]
+
+    def suggest(self, text, max_distance=SYMBOL_FUZZY_DISTANCE):
+        return self.fuzzy.search(text.strip().upper(), max_distance)
+
+    def validate(self, symbol, notional=None):
+        """None if the symbol can be traded at this notional, otherwise the reason it cannot."""
+        info = self.infos.get(symbol)
+        if info is None:
+            suggestions = [word for _, word in self.suggest(symbol)[:3]]
+            hint = f" Did you mean {', '.join(suggestions)}?" if suggestions else ""
+            return f"{symbol} is not a {BYBIT_CATEGORY} symbol.{hint}"
+        if info.status != 'Trading':
+            return f"{symbol} is not trading (status {info.status})."
+        if notional is not None and info.min_notional and notional < info.min_notional:
+            return f"{symbol} needs at least ${info.min_notional:g} per order, leg size is ${notional:.2f}."
+        return None
+
+def benchmark(symbols=3000, lookups=10000):
+    import random
+    rng = random.Random(0)
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    names = {''.join(rng.choice(letters) for _ in range(rng.randint(2, 6))) + "USDT" for _ in range(symbols)}
+    start = time.perf_counter()
+    index = SymbolIndex(SymbolInfo(name, 'Trading', name[:-4], 0.01, 0.01, 5) for name in names)
+    print(f"build: {(time.perf_counter() - start) * 1000:.0f} ms for {len(index)} symbols")
+    queries = [rng.choice(index.sorted_symbols) for _ in range(lookups)]
+    for label, func in (("validate", index.validate), ("complete", lambda q: index.complete(q[:2]))):
+        start = time.perf_counter()
+        for query in queries:
+            func(query)
+        print(f"{label}: {(time.perf_counter() - start) / lookups * 1e6:.1f} us per call over {len(index)} symbols")
+    start = time.perf_counter()
+    for query in queries[:500]:
+        index.suggest(query[:-5] + "X" + query[-4:])
+    print(f"suggest (typo): {(time.perf_counter() - start) / 500 * 1e6:.1f} us per call")
+
+if __name__ == "__main__":
+    benchmark()
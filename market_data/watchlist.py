@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from config.config import *
+from market_data.candles import TS, CLOSE, MINUTE_MS
+from market_data.pricing import parse_basket, pair_weights
+from orders.pear import basket_label
+
+logger = logging.getLogger(__name__)
+
+def parse_entry(text):
+    """{symbol: weight} from "ETH/BTC", "ETHUSDT/BTCUSDT" (quote/base, as pears are labelled) or a basket."""
+    if '/' not in text:
+        return parse_basket(text)
+    quote, _, base = (part.strip().upper() for part in text.partition('/'))
+    if not quote or not base or quote == base:
+        raise ValueError(f"Invalid pair: {text}")
+    quote, base = (symbol if symbol.endswith(('USDT', 'USDC')) else symbol + BYBIT_SETTLE_COIN for symbol in (quote, base))
+    return pair_weights(base, quote)
+
+def entry_label(weights):
+    return basket_label([s for s, w in weights.items() if w > 0], [s for s, w in weights.items() if w < 0])
+
+class Watchlist:
+    """Live ratio, z-score and 24h change for many pears from shared market data.
+
+    Legs are deduplicated across entries, so twenty pairs against BTCUSDT
+    cost one BTCUSDT kline refresh. A refresh is one bulk tickers call for
+    the live and 24h-ago price of every leg, plus an incremental kline
+    top-up of legs whose minute candles in the shared CandleCache are older
+    than WATCHLIST_KLINE_INTERVAL, whichever consumer refreshed them.
+
+    compute() lays every leg's log closes on one minute grid and gets all
+    basket series with a single matrix product, then reports only the
+    entries whose inputs changed so the view repaints just those tiles.
+    """
+
+    def __init__(self, entries=(), path=WATCHLIST_FILE):
+        self.path = path
+        self.entries = [dict(weights) for weights in entries]
+        self.last = {}  # symbol -> live price from the last tickers call
+        self.prev_24h = {}  # symbol -> price 24 hours earlier
+        self._index()
+
+    def _index(self):
+        self.symbols = sorted({symbol for weights in self.entries for symbol in weights})
+        self.symbol_ids = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.weights = np.zeros((len(self.symbols), len(self.entries)))
+        for j, weights in enumerate(self.entries):
+            for symbol, weight in weights.items():
+                self.weights[self.symbol_ids[symbol], j] = weight
+        self.labels = [entry_label(weights) for weights in self.entries]
+        self.keys = [None] * len(self.entries)  # Inputs each entry was last computed from
+        self.values = [np.zeros(0)] * len(self.entries)
+        self.ratio = np.full(len(self.entries), np.nan)
+        self.zscore = np.full(len(self.entries), np.nan)
+        self.change = np.full(len(self.entries), np.nan)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, weights):
+        if dict(weights) in self.entries:
+            return False
+        self.entries.append(dict(weights))
+        self._index()
+        return True
+
+    def remove(self, index):
+        del self.entries[index]
+        self._index()
+
+    def save(self):
+        with open(self.path, 'w') as f:
+            json.dump(self.entries, f)
+
+    @classmethod
+    def load(cls, path=WATCHLIST_FILE):
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    return cls(json.load(f), path)
+            except (json.JSONDecodeError, TypeError, AttributeError) as e:
+                logger.error("Could not parse %s: %s", path, e)
+        entries = []
+        for text in DEFAULT_WATCHLIST:
+            try:
+                entries.append(parse_entry(text))
+            except ValueError as e:
+                logger.error("Invalid DEFAULT_WATCHLIST entry %r: %s", text, e)
+        return cls(entries, path)
+
+    def refresh(self, client, candle_cache):
+        tickers = client.get_tickers(category=BYBIT_CATEGORY)
+        ok = bool(tickers) and tickers['retCode'] == 0
+        if ok:
+            for ticker in tickers['result']['list']:
+                if ticker['symbol'] in self.symbol_ids:
+                    last = float(ticker['lastPrice'])
+                    self.last[ticker['symbol']] = last
+                    self.prev_24h[ticker['symbol']] = last / (1 + float(ticker.get('price24hPcnt') or 0))
+        else:
+            logger.error("Error getting watchlist tickers: %s", tickers['retMsg'] if tickers else 'No response')
+
+        due = [symbol for symbol in self.symbols
+               if candle_cache.age(symbol) >= WATCHLIST_KLINE_INTERVAL or candle_cache.depth(symbol) < WATCHLIST_HISTORY_MINUTES]
+        if due:
+            with ThreadPoolExecutor(max_workers=min(len(due), WATCHLIST_FETCH_WORKERS)) as executor:
+                refreshed = list(executor.map(lambda symbol: candle_cache.refresh(symbol, WATCHLIST_HISTORY_MINUTES), due))
+            ok = ok and all(refreshed)
+        return ok
+
+    def compute(self, candle_cache):
+        """Recompute every entry; indices of the entries whose inputs changed."""
+        versions = dict(zip(self.symbols, candle_cache.version(self.symbols)))
+        keys = [tuple((versions[symbol], self.last.get(symbol)) for symbol in weights) for weights in self.entries]
+        changed = [j for j, key in enumerate(keys) if key != self.keys[j]]
+        if not changed:
+            return []
+
+        # Forward-filled minute closes of every leg on one shared grid, live price as the last row
+        length = max(WATCHLIST_MINUTES, ZSCORE_WINDOW)
+        candles = [candle_cache.get(symbol) for symbol in self.symbols]
+        ends = [c[-1, TS] for c in candles if c is not None and len(c)]
+        closes = np.full((length, len(self.symbols)), np.nan)
+        if ends:
+            grid = max(ends) - np.arange(length - 1, -1, -1) * MINUTE_MS
+            for i, c in enumerate(candles):
+                if c is None or not len(c):
+                    continue
+                rows = np.searchsorted(c[:, TS], grid, side='right') - 1
+                closes[:, i] = np.where(rows >= 0, c[np.maximum(rows, 0), CLOSE], np.nan)
+        live = np.array([self.last.get(symbol, np.nan) for symbol in self.symbols])
+        closes[-1] = np.where(np.isnan(live), closes[-1], live)
+        prev = np.array([self.prev_24h.get(symbol, np.nan) for symbol in self.symbols])
+
+        series = self._baskets(closes)
+        ratio = series[-1]
+        prev_ratio = self._baskets(prev[None, :])[0]
+        window = series[-ZSCORE_WINDOW:]
+        counts = np.sum(~np.isnan(window), axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.nanmean(np.where(counts > 0, window, 0), axis=0)
+            std = np.nanstd(np.where(counts > 0, window, 0), axis=0)
+            zscore = np.where((counts >= ZSCORE_MIN_OBSERVATIONS) & (std > 0), (ratio - mean) / std, np.nan)
+            change = ratio / prev_ratio - 1
+
+        for j in changed:
+            self.values[j] = series[-WATCHLIST_MINUTES:, j]
+            self.ratio[j], self.zscore[j], self.change[j] = ratio[j], zscore[j], change[j]
+            self.keys[j] = keys[j]
+        return changed
+
+    def _baskets(self, prices):
+        # prod(price ** weight) for every entry at once; NaN where any of the entry's legs is missing
+        logs = np.log(prices)
+        missing = np.isnan(logs)
+        values = np.exp(np.where(missing, 0.0, logs) @ self.weights)
+        values[(missing.astype(float) @ (self.weights != 0)) > 0] = np.nan
+        return values
+
+class _BenchClient:
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.kline_calls = 0
+        self.ticker_calls = 0
+
+    def get_tickers(self, category, symbol=None):
+        self.ticker_calls += 1
+        return {'retCode': 0, 'result': {'list': [
+            {'symbol': symbol, 'lastPrice': str(100.0 + i), 'price24hPcnt': '0.01'} for i, symbol in enumerate(self.symbols)
+        ]}}
+
+    def get_kline_data(self, symbol, interval, limit, end=None):
+        self.kline_calls += 1
+        end = int(end or time.time() * 1000) // MINUTE_MS * MINUTE_MS
+        rng = np.random.default_rng(abs(hash(symbol)) % 2 ** 32)
+        closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, limit)))
+        return {'retCode': 0, 'result': {'list': [
+            [str(end - i * MINUTE_MS), c, c, c, c, '1', '1'] for i, c in enumerate(closes)
+        ]}}
+
+def benchmark(pairs=30):
+    from market_data.candles import CandleCache
+    alts = [f"ALT{i}USDT" for i in range(pairs - 5)]
+    entries = [pair_weights("BTCUSDT", alt) for alt in alts] + [pair_weights("ETHUSDT", alt) for alt in alts[:5]]
+    watchlist = Watchlist(entries, path=os.devnull)
+    client = _BenchClient(watchlist.symbols)
+    cache = CandleCache(client)
+    start = time.perf_counter()
+    watchlist.refresh(client, cache)
+    print(f"{len(watchlist)} pairs over {len(watchlist.symbols)} unique legs: first refresh "
+          f"{client.ticker_calls} ticker + {client.kline_calls} kline calls "
+          f"(vs {sum(len(e) for e in entries)} per-pair kline fetches), {(time.perf_counter() - start) * 1000:.0f} ms")
+    start = time.perf_counter()
+    changed = watchlist.compute(cache)
+    print(f"compute all: {(time.perf_counter() - start) * 1000:.2f} ms, {len(changed)} tiles changed")
+    client.kline_calls = 0
+    watchlist.refresh(client, cache)
+    print(f"refresh within WATCHLIST_KLINE_INTERVAL: {client.kline_calls} kline calls")
+    watchlist.last["ALT0USDT"] *= 1.01
+    start = time.perf_counter()
+    changed = watchlist.compute(cache)
+    print(f"one leg moved: {len(changed)} tile(s) changed, compute {(time.perf_counter() - start) * 1000:.2f} ms")
+    print(f"no change: {len(watchlist.compute(cache))} tiles changed")
+
+if __name__ == "__main__":
+    benchmark()
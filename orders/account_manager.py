@@ -0,0 +1,329 @@
+import os
+import json
+import time
+import queue
+import logging
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from config.config import *
+
+logger = logging.getLogger(__name__)
+
+class Account:
+    """One trading account: where its credentials live and how its size scales."""
+
+    __slots__ = ('name', 'api_key_env', 'api_secret_env', 'scale', 'testnet', 'paper')
+
+    def __init__(self, name, api_key_env=API_KEY_ENV_VAR, api_secret_env=API_SECRET_ENV_VAR, scale=1.0, testnet=TESTNET, paper=False):
+        self.name = name
+        self.api_key_env = api_key_env
+        self.api_secret_env = api_secret_env
+        self.scale = float(scale)
+        self.testnet = testnet
+        self.paper = paper
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{key: value for key, value in data.items() if key in cls.__slots__})
+
+def load_accounts(path=ACCOUNTS_FILE):
+    # accounts.json: [{"name": "sub1", "api_key_env": "SUB1_KEY", "api_secret_env": "SUB1_SECRET", "scale": 0.5}, ...]
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        try:
+            return [Account.from_dict(item) for item in json.load(f)]
+        except (json.JSONDecodeError, TypeError) as e:
+            logger.error("Could not parse %s: %s", path, e)
+            return []
+
+def create_account_client(account):
+    if account.paper:
+        from trading_api.paper_exchange import PaperExchangeClient
+        return PaperExchangeClient(seed=PAPER_ACCOUNT_SEED)
+    from dotenv import load_dotenv
+    load_dotenv()
+    if ASYNC_HTTP_ENABLED:
+        # The async transport pools its own connections for every concurrent leg
+        from trading_api.async_bybit_api import SyncBybitAPIClient
+        return SyncBybitAPIClient(os.getenv(account.api_key_env), os.getenv(account.api_secret_env), testnet=account.testnet)
+    from requests.adapters import HTTPAdapter
+    from trading_api.bybit_api import BybitAPIClient
+    client = BybitAPIClient(os.getenv(account.api_key_env), os.getenv(account.api_secret_env), testnet=account.testnet)
+    # One keep-alive connection per concurrent leg for the lifetime of the worker
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=ACCOUNT_WORKER_THREADS)
+    client.session.client.mount("https://", adapter)
+    return client
+
+def response_status(response):
+    if not response:
+        return False, 'No response'
+    return response['retCode'] == 0, response['retMsg']
+
+class AccountWorker:
+    """Runs inside the account's process and owns its client."""
+
+    def __init__(self, account):
+        self.account = account
+        self.client = create_account_client(account)
+        self.executor = ThreadPoolExecutor(max_workers=ACCOUNT_WORKER_THREADS)
+        self.precision = {}
+
+    def quantity(self, symbol, notional, price):
+        if symbol not in self.precision:
+            self.precision[symbol] = self.client.get_quantity_precision(symbol)
+        return round(notional / price, self.precision[symbol])
+
+    def send_leg(self, symbol, side, qty, reduce_only=False):
+        if qty <= 0:
+            return {'symbol': symbol, 'side': side, 'qty': 0.0, 'ok': False, 'message': 'Quantity rounds to zero'}
+        ok, message = response_status(self.client.place_order(
+            symbol=symbol,
+            side=side,
+            order_type="Market",
+            qty=qty,
+            reduce_only=reduce_only
+        ))
+        return {'symbol': symbol, 'side': side, 'qty': qty if ok else 0.0, 'ok': ok, 'message': message}
+
+    def open_basket(self, sides, notionals, prices):
+        futures = [
+            self.executor.submit(self.send_leg, symbol, side, self.quantity(symbol, notionals[symbol] * self.account.scale, prices[symbol]))
+            for symbol, side in sides.items()
+        ]
+        return [future.result() for future in futures]
+
+    def close_legs(self, legs):
+        futures = [self.executor.submit(self.send_leg, symbol, side, qty, True) for symbol, side, qty in legs]
+        return [future.result() for future in futures]
+
+    def summary(self):
+        wallet = self.client.get_wallet_balance(accountType=BYBIT_ACCOUNT_TYPE)
+        positions = self.client.get_positions(category=BYBIT_CATEGORY, settleCoin=BYBIT_SETTLE_COIN)
+        wallet_ok, wallet_message = response_status(wallet)
+        positions_ok, positions_message = response_status(positions)
+        return {
+            'equity': float(wallet['result']['list'][0]['totalEquity']) if wallet_ok else None,
+            'positions': [
+                {'symbol': p['symbol'], 'side': p['side'], 'size': float(p['size']), 'unrealisedPnl': float(p.get('unrealisedPnl') or 0)}
+                for p in positions['result']['list'] if float(p['size']) > 0
+            ] if positions_ok else None,
+            'ok': wallet_ok and positions_ok,
+            'message': wallet_message if not wallet_ok else positions_message,
+        }
+
+    def handle(self, op, payload):
+        if op == 'open':
+            return self.open_basket(payload['sides'], payload['notionals'], payload['prices'])
+        if op == 'close':
+            return self.close_legs(payload['legs'])
+        if op == 'summary':
+            return self.summary()
+        raise ValueError(f"Unknown account operation {op}")
+
+def account_worker(account_data, requests, results):
+    account = Account.from_dict(account_data)
+    try:
+        worker = AccountWorker(account)
+    except Exception as e:
+        results.put((None, account.name, False, f"Failed to start: {e}"))
+        return
+    while True:
+        message = requests.get()
+        if message is None:
+            break
+        request_id, op, payload = message
+        try:
+            results.put((request_id, account.name, True, worker.handle(op, payload)))
+        except Exception as e:
+            results.put((request_id, account.name, False, str(e)))
+    worker.executor.shutdown(wait=True)
+
+class AccountManager:
+    """Fans pear orders out to one execution process per account.
+
+    Each worker keeps its own client and connection pool, so accounts
+    execute in parallel and a slow or failing account does not hold up
+    the others beyond the call timeout. Results come back keyed by
+    account name.
+    """
+
+    def __init__(self, accounts, timeout=ACCOUNT_CALL_TIMEOUT):
+        self.accounts = {account.name: account for account in accounts}
+        self.timeout = timeout
+        # Spawned workers never inherit Qt or websocket threads from the GUI process
+        self.context = multiprocessing.get_context('spawn')
+        self.results = self.context.Queue()
+        self.requests = {}
+        self.processes = {}
+        self.dead = set()  # Workers that failed to start or exited; calls skip them instead of waiting
+        self.request_ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self.accounts)
+
+    def start(self):
+        for name, account in self.accounts.items():
+            self.requests[name] = self.context.Queue()
+            process = self.context.Process(
+                target=account_worker,
+                args=(account.to_dict(), self.requests[name], self.results),
+                name=f"account-{name}",
+                daemon=True
+            )
+            process.start()
+            self.processes[name] = process
+        logger.info("Started %s account workers", len(self.processes))
+
+    def stop(self):
+        for requests in self.requests.values():
+            requests.put(None)
+        for process in self.processes.values():
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.processes.clear()
+        self.requests.clear()
+        self.dead.clear()
+
+    def is_alive(self, name):
+        process = self.processes.get(name)
+        if name in self.dead or process is None:
+            return False
+        if not process.is_alive():
+            logger.error("Account %s: worker exited with code %s", name, process.exitcode)
+            self.dead.add(name)
+            return False
+        return True
+
+    def call(self, payloads, op):
+        """Send op to each account in payloads and wait for every reply or the timeout.
+
+        Accounts whose worker is not running are answered at once, so a
+        dead worker never holds a call up for the full timeout.
+        """
+        with self.lock:
+            request_id = next(self.request_ids)
+            replies = {name: {'ok': False, 'result': 'Worker not running'} for name in payloads if not self.is_alive(name)}
+            for name, payload in payloads.items():
+                if name not in replies:
+                    self.requests[name].put((request_id, op, payload))
+            deadline = time.monotonic() + self.timeout
+            while len(replies) < len(payloads):
+                try:
+                    reply_id, name, ok, result = self.results.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if reply_id is None:
+                    logger.error("Account %s: %s", name, result)
+                    self.dead.add(name)
+                    if name in payloads and name not in replies:
+                        replies[name] = {'ok': False, 'result': result}
+                elif reply_id == request_id:
+                    replies[name] = {'ok': ok, 'result': result}
+            for name in payloads:
+                if name not in replies:
+                    replies[name] = {'ok': False, 'result': 'Timed out'}
+            return replies
+
+    def open_basket(self, sides, notionals, prices):
+        """Open the same basket on every account, scaled per account.
+
+        Prices are fetched once by the caller so every account sizes its
+        legs from the same quote.
+        """
+        payload = {'sides': sides, 'notionals': notionals, 'prices': prices}
+        return self.call({name: payload for name in self.accounts}, 'open')
+
+    def close_allocations(self, allocations, close_sides):
+        # allocations: {account: {symbol: qty}}, close_sides: {symbol: side}
+        payloads = {
+            name: {'legs': [(symbol, close_sides[symbol], qty) for symbol, qty in legs.items() if qty > 0]}
+            for name, legs in allocations.items() if name in self.accounts
+        }
+        return self.call(payloads, 'close') if payloads else {}
+
+    def summary(self):
+        return self.call({name: {} for name in self.accounts}, 'summary')
+
+def aggregate_fills(replies):
+    """Split open_basket replies into per-account filled quantities and failures.
+
+    An account counts as filled only when every leg went through; accounts
+    with partial fills are reported with the legs that did fill. Those legs
+    are unhedged and belong to no pear, so the caller unwinds them with the
+    quantities from partial_fills.
+    """
+    allocations, failures = {}, {}
+    for name, reply in replies.items():
+        if not reply['ok']:
+            failures[name] = reply['result']
+            continue
+        legs = reply['result']
+        filled = {leg['symbol']: leg['qty'] for leg in legs if leg['ok']}
+        if len(filled) == len(legs):
+            allocations[name] = filled
+        else:
+            failures[name] = "; ".join(f"{leg['symbol']}: {leg['message']}" for leg in legs if not leg['ok'])
+            if filled:
+                failures[name] += f" (filled {', '.join(f'{symbol} {qty}' for symbol, qty in filled.items())})"
+    return allocations, failures
+
+def partial_fills(replies):
+    # {account: {symbol: qty}} of the legs that filled on accounts where another leg failed
+    partials = {}
+    for name, reply in replies.items():
+        if not reply['ok']:
+            continue
+        filled = {leg['symbol']: leg['qty'] for leg in reply['result'] if leg['ok']}
+        if filled and len(filled) < len(reply['result']):
+            partials[name] = filled
+    return partials
+
+def aggregate_summary(replies):
+    # One view across accounts: total equity and net size per symbol
+    total_equity = 0.0
+    net_sizes = {}
+    lines = []
+    for name, reply in replies.items():
+        summary = reply['result'] if reply['ok'] else None
+        if not summary or summary['equity'] is None:
+            lines.append(f"{name}: N/A")
+            continue
+        total_equity += summary['equity']
+        lines.append(f"{name}: ${summary['equity']:.2f}")
+        for position in summary['positions'] or []:
+            sign = 1 if position['side'] == 'Buy' else -1
+            net_sizes[position['symbol']] = net_sizes.get(position['symbol'], 0.0) + sign * position['size']
+    return {'total_equity': total_equity, 'net_sizes': net_sizes, 'lines': lines}
+
+def main():
+    # Fan-out against local paper exchanges standing in for real sub-accounts
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    accounts = [Account(f"paper{i}", scale=scale, paper=True) for i, scale in enumerate((1.0, 0.5, 0.25, 2.0))]
+    manager = AccountManager(accounts)
+    manager.start()
+    try:
+        from trading_api.paper_exchange import PaperExchangeClient
+        prices = PaperExchangeClient(seed=PAPER_ACCOUNT_SEED).get_last_prices(['BTCUSDT', 'ETHUSDT'])
+        sides = {'BTCUSDT': 'Sell', 'ETHUSDT': 'Buy'}
+        start = time.perf_counter()
+        allocations, failures = aggregate_fills(manager.open_basket(sides, {'BTCUSDT': 1000, 'ETHUSDT': 1000}, prices))
+        print(f"Opened on {len(allocations)} accounts in {(time.perf_counter() - start) * 1000:.1f} ms: {allocations}")
+        if failures:
+            print(f"Failures: {failures}")
+        view = aggregate_summary(manager.summary())
+        print(f"Total equity ${view['total_equity']:.2f}, net sizes {view['net_sizes']}")
+        manager.close_allocations(allocations, {'BTCUSDT': 'Buy', 'ETHUSDT': 'Sell'})
+        print(f"After close: {aggregate_summary(manager.summary())['net_sizes']}")
+    finally:
+        manager.stop()
+
+if __name__ == "__main__":
+    main()
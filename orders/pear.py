@@ -0,0 +1,195 @@
+import os
+import json
+import uuid
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Keys of the persisted pear dict that are not symbol-named legs
+PEAR_METADATA_KEYS = frozenset(('type', 'timestamp', 'timestamp_rounded', 'combined_upnl', 'trade_id', 'allocations'))
+
+def truncate_symbol(symbol):
+    return symbol[:-4] if symbol.endswith(('USDT', 'USDC')) else symbol
+
+def basket_label(quote_symbols, base_symbols):
+    # "ETH+SOL/BTC": the legs bought by a long over the legs sold by a long
+    quote = '+'.join(truncate_symbol(symbol) for symbol in quote_symbols)
+    base = '+'.join(truncate_symbol(symbol) for symbol in base_symbols)
+    return f"{quote}/{base}"
+
+class Leg:
+    __slots__ = ('symbol', 'side', 'qty', 'entry_price')
+
+    def __init__(self, symbol, side, qty, entry_price):
+        self.symbol = symbol
+        self.side = side
+        self.qty = float(qty)
+        self.entry_price = float(entry_price)
+
+    @property
+    def sign(self):
+        return -1.0 if self.side == 'Sell' else 1.0
+
+    @property
+    def close_side(self):
+        return "Buy" if self.side == "Sell" else "Sell"
+
+    def to_dict(self):
+        return {'side': self.side, 'qty': self.qty, 'entry_price': self.entry_price}
+
+    def __repr__(self):
+        return f"Leg({self.symbol!r}, {self.side!r}, {self.qty}, {self.entry_price})"
+
+class Pear:
+    __slots__ = ('trade_id', 'type', 'timestamp', 'timestamp_rounded', 'legs', 'combined_upnl', 'allocations')
+
+    def __init__(self, trade_id, type, legs, timestamp=None, timestamp_rounded=None, combined_upnl=0.0, allocations=None):
+        now = datetime.now()
+        self.trade_id = trade_id
+        self.type = type
+        self.legs = list(legs)
+        self.timestamp = timestamp or now.isoformat()
+        self.timestamp_rounded = timestamp_rounded or now.replace(second=0, microsecond=0).isoformat()
+        self.combined_upnl = combined_upnl
+        # Multi-account pears: {account: {symbol: qty}}; leg qty is the total across accounts
+        self.allocations = allocations or {}
+
+    @property
+    def symbols(self):
+        return [leg.symbol for leg in self.legs]
+
+    def base_legs(self):
+        # Legs with a negative basket weight: sold by a long pear, bought by a short one
+        base_side = 'Sell' if self.type == 'long' else 'Buy'
+        return [leg for leg in self.legs if leg.side == base_side]
+
+    def quote_legs(self):
+        base_side = 'Sell' if self.type == 'long' else 'Buy'
+        return [leg for leg in self.legs if leg.side != base_side]
+
+    def label(self):
+        return basket_label([leg.symbol for leg in self.quote_legs()], [leg.symbol for leg in self.base_legs()])
+
+    def leg(self, symbol):
+        for leg in self.legs:
+            if leg.symbol == symbol:
+                return leg
+        return None
+
+    def to_dict(self):
+        # Same symbol-keyed layout as current_position.json has always used
+        data = {
+            'type': self.type,
+            'trade_id': self.trade_id,
+            'timestamp': self.timestamp,
+            'timestamp_rounded': self.timestamp_rounded,
+            'combined_upnl': self.combined_upnl,
+        }
+        for leg in self.legs:
+            data[leg.symbol] = leg.to_dict()
+        if self.allocations:
+            data['allocations'] = self.allocations
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        legs = [
+            Leg(key, value.get('side'), value.get('qty', 0), value.get('entry_price', 0))
+            for key, value in data.items()
+            if key not in PEAR_METADATA_KEYS and isinstance(value, dict)
+        ]
+        return cls(
+            trade_id=data.get('trade_id') or str(uuid.uuid4()),
+            type=data.get('type', ''),
+            legs=legs,
+            timestamp=data.get('timestamp'),
+            timestamp_rounded=data.get('timestamp_rounded'),
+            combined_upnl=data.get('combined_upnl', 0.0),
+            allocations=data.get('allocations'),
+        )
+
+    def __repr__(self):
+        return f"Pear({self.trade_id!r}, {self.type!r}, {self.legs!r})"
+
+class PearRegistry:
+    """Open pears in insertion order, indexed by trade_id and by symbol."""
+
+    def __init__(self, pears=None):
+        self._pears = {}  # trade_id -> Pear, insertion ordered
+        self._by_symbol = {}  # symbol -> {trade_id: Pear}
+        for pear in pears or []:
+            self.add(pear)
+
+    def __iter__(self):
+        return iter(self._pears.values())
+
+    def __len__(self):
+        return len(self._pears)
+
+    def __bool__(self):
+        return bool(self._pears)
+
+    def __contains__(self, trade_id):
+        return trade_id in self._pears
+
+    def add(self, pear):
+        if pear.trade_id in self._pears:
+            self.remove(pear.trade_id)
+        self._pears[pear.trade_id] = pear
+        for leg in pear.legs:
+            self._by_symbol.setdefault(leg.symbol, {})[pear.trade_id] = pear
+        return pear
+
+    def remove(self, trade_id):
+        pear = self._pears.pop(trade_id, None)
+        if pear is not None:
+            for leg in pear.legs:
+                by_trade_id = self._by_symbol.get(leg.symbol)
+                if by_trade_id is not None:
+                    by_trade_id.pop(trade_id, None)
+                    if not by_trade_id:
+                        del self._by_symbol[leg.symbol]
+        return pear
+
+    def clear(self):
+        self._pears.clear()
+        self._by_symbol.clear()
+
+    def get(self, trade_id):
+        return self._pears.get(trade_id)
+
+    def by_symbol(self, symbol):
+        return list(self._by_symbol.get(symbol, {}).values())
+
+    def symbols(self):
+        return list(self._by_symbol)
+
+    def to_list(self):
+        return [pear.to_dict() for pear in self._pears.values()]
+
+    def save(self, path):
+        if self._pears:
+            with open(path, 'w') as f:
+                json.dump(self.to_list(), f)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return cls()
+        with open(path, 'r') as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError:
+                logger.error("Could not parse %s, starting with no pears", path)
+                return cls()
+        items = [item for item in data or [] if isinstance(item, dict)]
+        registry = cls(Pear.from_dict(item) for item in items)
+        legacy = sum(1 for item in items if not item.get('trade_id'))
+        if legacy:
+            # Pears saved before trade ids existed get one now; persist it so triggers and logs keep matching them
+            logger.info("Assigned trade ids to %s legacy pears in %s", legacy, path)
+            registry.save(path)
+        return registry
@@ -0,0 +1,189 @@
+import logging
+from config.config import *
+
+logger = logging.getLogger(__name__)
+
+ORPHANED = 'orphaned'  # The exchange holds nothing in the direction the pears expect
+PARTIAL = 'partial'  # The exchange holds less than the pears expect
+
+class Mismatch:
+    __slots__ = ('symbol', 'expected', 'actual', 'kind')
+
+    def __init__(self, symbol, expected, actual, kind):
+        self.symbol = symbol
+        self.expected = expected
+        self.actual = actual
+        self.kind = kind
+
+    @property
+    def shortfall(self):
+        # Signed quantity that would restore the pears' exposure, also when the exchange holds the opposite side
+        return self.expected - self.actual
+
+    def corrective_order(self):
+        qty = abs(self.shortfall)
+        return self.symbol, 'Buy' if self.shortfall > 0 else 'Sell', qty
+
+    def __repr__(self):
+        return f"Mismatch({self.symbol!r}, expected={self.expected}, actual={self.actual}, {self.kind})"
+
+class PositionReconciler:
+    """Compares the net quantity implied by local pears with exchange positions.
+
+    Both sides are kept as per-symbol signed totals. Adding or removing a
+    pear adjusts only its own symbols, and a new position snapshot only
+    marks the symbols whose size changed, so each cycle costs the number
+    of changes rather than the number of pears.
+
+    Positions held beyond what the pears need are manual Apples and are
+    not flagged; only shortfalls are, since those are the legs a close
+    would try to reduce but no longer exist.
+    """
+
+    def __init__(self, tolerance=RECONCILE_QTY_TOLERANCE):
+        self.tolerance = tolerance
+        self.expected = {}  # symbol -> signed qty implied by pears
+        self.actual = {}  # symbol -> signed qty held on the exchange
+        self.pear_legs = {}  # trade_id -> [(symbol, signed qty)]
+        self.mismatches = {}  # symbol -> Mismatch
+        self.dirty = set()
+        self.positions_synced = False
+
+    # Local pears
+
+    def add_pear(self, pear):
+        if pear.trade_id in self.pear_legs:
+            self.remove_pear(pear.trade_id)
+        legs = [(leg.symbol, leg.sign * leg.qty) for leg in pear.legs]
+        self.pear_legs[pear.trade_id] = legs
+        for symbol, qty in legs:
+            self._adjust(self.expected, symbol, qty)
+
+    def remove_pear(self, trade_id):
+        for symbol, qty in self.pear_legs.pop(trade_id, ()):
+            self._adjust(self.expected, symbol, -qty)
+
+    def _adjust(self, totals, symbol, qty):
+        remaining = totals.get(symbol, 0.0) + qty
+        if abs(remaining) <= self.tolerance:
+            totals.pop(symbol, None)
+        else:
+            totals[symbol] = remaining
+        self.dirty.add(symbol)
+
+    def sync_pears(self, pears):
+        """Bring the expected side in line with the current pears, touching only added or removed ones."""
+        pears = {pear.trade_id: pear for pear in pears}
+        for trade_id in self.pear_legs.keys() - pears.keys():
+            self.remove_pear(trade_id)
+        for trade_id in pears.keys() - self.pear_legs.keys():
+            self.add_pear(pears[trade_id])
+
+    # Exchange positions
+
+    def apply_positions(self, positions):
+        """Take a full snapshot of open positions (REST or streamed); symbols missing from it are flat."""
+        actual = {}
+        for position in positions:
+            size = float(position.get('size') or 0)
+            if size:
+                sign = -1.0 if position.get('side') == 'Sell' else 1.0
+                actual[position['symbol']] = actual.get(position['symbol'], 0.0) + sign * size
+        for symbol in actual.keys() | self.actual.keys():
+            if actual.get(symbol) != self.actual.get(symbol):
+                self.dirty.add(symbol)
+        self.actual = actual
+        self.positions_synced = True
+
+    # Results
+
+    def refresh(self):
+        """Re-check the symbols that changed since the last call and return all current mismatches."""
+        if not self.positions_synced:
+            return []
+        for symbol in self.dirty:
+            mismatch = self.check(symbol)
+            if mismatch is None:
+                self.mismatches.pop(symbol, None)
+            else:
+                self.mismatches[symbol] = mismatch
+        self.dirty.clear()
+        return list(self.mismatches.values())
+
+    def check(self, symbol):
+        expected = self.expected.get(symbol, 0.0)
+        actual = self.actual.get(symbol, 0.0)
+        if abs(expected) <= self.tolerance:
+            return None
+        held = actual if expected > 0 else -actual  # Exposure in the pears' direction
+        if held <= self.tolerance:
+            return Mismatch(symbol, expected, actual, ORPHANED)
+        if held < abs(expected) - self.tolerance:
+            return Mismatch(symbol, expected, actual, PARTIAL)
+        return None
+
+    def corrective_orders(self):
+        return [mismatch.corrective_order() for mismatch in self.refresh()]
+
+    def close_split(self, symbol, sign, qty):
+        """(qty to close, part of it that reduces the exchange position) for one leg.
+
+        In one-way mode opposite pears on a symbol net out, so the leg is only
+        clamped by the gap the exchange does not cover (expected - actual in
+        the leg's direction), not by the net position. What goes past zero
+        reopens the other pears' side and cannot be sent reduce-only.
+        """
+        if not self.positions_synced:
+            return qty, qty
+        missing = sign * (self.expected.get(symbol, 0.0) - self.actual.get(symbol, 0.0))
+        close = qty - min(max(missing, 0.0), qty)
+        if close <= self.tolerance:
+            return 0.0, 0.0
+        reducible = min(max(sign * self.actual.get(symbol, 0.0), 0.0), close)
+        return round(close, 9), round(reducible, 9)
+
+    def record_close(self, trade_id, symbol, sign, qty):
+        # Take a sent close off the pear's expected leg and off the held quantity until the next
+        # snapshot, so other pears sharing the symbol are checked against what is left
+        legs = self.pear_legs.get(trade_id, [])
+        for i, (leg_symbol, leg_qty) in enumerate(legs):
+            if leg_symbol == symbol:
+                legs[i] = (symbol, leg_qty - sign * qty)
+                self._adjust(self.expected, symbol, -sign * qty)
+                break
+        if self.positions_synced:
+            self._adjust(self.actual, symbol, -sign * qty)
+
+def benchmark(pears=500, symbols=60, cycles=1000):
+    import time
+    import random
+    from orders.pear import Pear, Leg
+
+    rng = random.Random(1)
+    universe = [f"SYM{i}USDT" for i in range(symbols)]
+    registry = {}
+    for i in range(pears):
+        s1, s2 = rng.sample(universe, 2)
+        registry[str(i)] = Pear(str(i), 'long', [Leg(s1, 'Sell', 1.0, 1.0), Leg(s2, 'Buy', 1.0, 1.0)])
+    reconciler = PositionReconciler()
+    reconciler.sync_pears(registry.values())
+    positions = [{'symbol': s, 'side': 'Buy' if q > 0 else 'Sell', 'size': abs(q)} for s, q in reconciler.expected.items()]
+    reconciler.apply_positions(positions)
+    reconciler.refresh()
+
+    start = time.perf_counter()
+    for cycle in range(cycles):
+        # One pear replaced and one position nudged per cycle
+        del registry[next(iter(registry))]
+        s1, s2 = rng.sample(universe, 2)
+        registry[f"n{cycle}"] = Pear(f"n{cycle}", 'short', [Leg(s1, 'Buy', 1.0, 1.0), Leg(s2, 'Sell', 1.0, 1.0)])
+        positions[cycle % len(positions)]['size'] *= 0.999
+        reconciler.sync_pears(registry.values())
+        reconciler.apply_positions(positions)
+        reconciler.refresh()
+    elapsed = (time.perf_counter() - start) / cycles
+    print(f"{pears} pears, {symbols} symbols: {elapsed * 1e6:.1f} us per reconciliation cycle, "
+          f"{len(reconciler.mismatches)} mismatches")
+
+if __name__ == "__main__":
+    benchmark()
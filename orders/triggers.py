@@ -0,0 +1,420 @@
+import os
+import json
+import time
+import uuid
+import logging
+from bisect import bisect_left, bisect_right
+from collections import deque
+import numpy as np
+from config.config import *
+from market_data.candles import TS, CLOSE as CANDLE_CLOSE
+
+logger = logging.getLogger(__name__)
+
+PAIR_PRICE = 'pair_price'
+UPNL_PCT = 'upnl_pct'
+ZSCORE = 'zscore'
+TRAILING = 'trailing'
+
+BELOW = 'below'
+ABOVE = 'above'
+
+CLOSE = 'close'
+
+class Trigger:
+    """One local condition. `action` is CLOSE (close `trade_id`) or a pair
+    direction ('long'/'short') to open `pair` for `order_size`."""
+
+    __slots__ = ('trigger_id', 'kind', 'pair', 'threshold', 'direction', 'action', 'trade_id', 'order_size', 'extreme')
+
+    def __init__(self, kind, pair=None, threshold=0.0, direction=BELOW, action=CLOSE, trade_id=None,
+                 order_size=None, extreme=None, trigger_id=None):
+        self.trigger_id = trigger_id or str(uuid.uuid4())
+        self.kind = kind
+        self.pair = tuple(pair) if pair else None
+        self.threshold = float(threshold)
+        self.direction = direction
+        self.action = action
+        self.trade_id = trade_id
+        self.order_size = order_size
+        self.extreme = extreme
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{key: value for key, value in data.items() if key in cls.__slots__})
+
+    def __repr__(self):
+        return f"Trigger({self.kind!r}, {self.pair}, {self.direction} {self.threshold}, {self.action!r}, {self.trade_id!r})"
+
+class ThresholdIndex:
+    """Per-pair sorted thresholds. A tick fires every trigger it crossed with
+    one bisect and a slice, regardless of how many triggers are armed."""
+
+    def __init__(self):
+        self.below = ([], [])  # fires when value <= threshold; (thresholds, trigger_ids) ascending
+        self.above = ([], [])  # fires when value >= threshold
+
+    def __bool__(self):
+        return bool(self.below[0] or self.above[0])
+
+    def add(self, threshold, direction, trigger_id):
+        thresholds, ids = self.below if direction == BELOW else self.above
+        i = bisect_right(thresholds, threshold)
+        thresholds.insert(i, threshold)
+        ids.insert(i, trigger_id)
+
+    def remove(self, threshold, direction, trigger_id):
+        thresholds, ids = self.below if direction == BELOW else self.above
+        i = bisect_left(thresholds, threshold)
+        while i < len(thresholds) and thresholds[i] == threshold:
+            if ids[i] == trigger_id:
+                del thresholds[i]
+                del ids[i]
+                return
+            i += 1
+
+    def crossed(self, value):
+        fired = []
+        thresholds, ids = self.below
+        i = bisect_left(thresholds, value)
+        if i < len(thresholds):
+            fired.extend(ids[i:])
+            del thresholds[i:], ids[i:]
+        thresholds, ids = self.above
+        j = bisect_right(thresholds, value)
+        if j:
+            fired.extend(ids[:j])
+            del thresholds[:j], ids[:j]
+        return fired
+
+    def distance(self, value):
+        # How far value is from the nearest armed threshold (everything still armed is on the far side)
+        distances = []
+        if self.below[0]:
+            distances.append(value - self.below[0][-1])
+        if self.above[0]:
+            distances.append(self.above[0][0] - value)
+        return min(distances) if distances else np.inf
+
+class TrailingBook:
+    """Trailing stops on one pair, evaluated as arrays: every stop's running
+    extreme moves with the price and fires once price retraces by its trail."""
+
+    def __init__(self):
+        self.triggers = []
+        self.trail = np.zeros(0)
+        self.sign = np.zeros(0)
+        self.extreme = np.zeros(0)
+
+    def __bool__(self):
+        return bool(self.triggers)
+
+    def _rebuild(self):
+        self.trail = np.array([t.threshold / 100 for t in self.triggers])
+        # Long pears track the peak, short pears track the trough
+        self.sign = np.array([1.0 if t.direction == 'long' else -1.0 for t in self.triggers])
+        self.extreme = np.array([t.extreme if t.extreme is not None else np.nan for t in self.triggers], dtype=float)
+
+    def add(self, trigger):
+        self.sync()
+        self.triggers.append(trigger)
+        self._rebuild()
+
+    def remove(self, trigger_id):
+        self.sync()
+        self.triggers = [t for t in self.triggers if t.trigger_id != trigger_id]
+        self._rebuild()
+
+    def sync(self):
+        for trigger, extreme in zip(self.triggers, self.extreme):
+            trigger.extreme = None if np.isnan(extreme) else float(extreme)
+
+    def crossed(self, price):
+        if not self.triggers:
+            return []
+        signed_price = self.sign * price
+        self.extreme = np.fmax(np.where(np.isnan(self.extreme), price, self.extreme) * self.sign, signed_price) * self.sign
+        retrace = np.where(self.sign > 0, 1 - price / self.extreme, price / self.extreme - 1)
+        hit = np.flatnonzero(retrace >= self.trail)
+        if not len(hit):
+            return []
+        fired = [self.triggers[i].trigger_id for i in hit]
+        for trigger_id in fired:
+            self.remove(trigger_id)
+        return fired
+
+    def distance(self, price):
+        # Smallest remaining retrace (as a fraction) before a stop fires
+        if not self.triggers:
+            return np.inf
+        extreme = np.where(np.isnan(self.extreme), price, self.extreme)
+        retrace = np.where(self.sign > 0, 1 - price / extreme, price / extreme - 1)
+        return float((self.trail - retrace).min())
+
+def pair_closes(candles1, candles2):
+    """Minute pair prices close2 / close1 on the minutes both legs have a candle; None if either is missing."""
+    if candles1 is None or candles2 is None or not len(candles1) or not len(candles2):
+        return None
+    _, rows1, rows2 = np.intersect1d(candles1[:, TS], candles2[:, TS], assume_unique=True, return_indices=True)
+    return candles2[rows2, CANDLE_CLOSE] / candles1[rows1, CANDLE_CLOSE]
+
+class TriggerEngine:
+    """Local conditional orders for pears: pair-price stop/take-profit, UPnL %
+    thresholds, z-score entry/exit and trailing stops. Exchanges cannot stop
+    on a ratio of two instruments, so conditions are evaluated here on every
+    price tick and fired triggers are handed back to the caller to run the
+    normal open or close path. Triggers persist to TRIGGERS_FILE."""
+
+    def __init__(self, path=TRIGGERS_FILE):
+        self.path = path
+        self.triggers = {}
+        self.price_index = {}  # pair -> ThresholdIndex
+        self.zscore_index = {}  # pair -> ThresholdIndex
+        self.trailing = {}  # pair -> TrailingBook
+        self.history = {}  # pair -> deque of minute-close pair prices, the z-score window
+        self.history_versions = {}  # pair -> candle versions its history was built from
+        self.upnl_ids = []
+        self.upnl_trade_ids = []
+        self.upnl_threshold = np.zeros(0)
+        self.upnl_below = np.zeros(0, dtype=bool)
+        self._upnl_rows_key = None
+        self._upnl_rows = np.zeros(0, dtype=np.int64)
+        self.held = {}  # trigger_id -> monotonic seconds until a re-armed trigger may fire again
+        self.load()
+
+    # Registration
+
+    def add(self, trigger, save=True):
+        self.triggers[trigger.trigger_id] = trigger
+        if trigger.kind == PAIR_PRICE:
+            self.price_index.setdefault(trigger.pair, ThresholdIndex()).add(trigger.threshold, trigger.direction, trigger.trigger_id)
+        elif trigger.kind == ZSCORE:
+            self.zscore_index.setdefault(trigger.pair, ThresholdIndex()).add(trigger.threshold, trigger.direction, trigger.trigger_id)
+        elif trigger.kind == TRAILING:
+            self.trailing.setdefault(trigger.pair, TrailingBook()).add(trigger)
+        elif trigger.kind == UPNL_PCT:
+            self._rebuild_upnl()
+        else:
+            logger.error("Unknown trigger kind: %s", trigger.kind)
+            del self.triggers[trigger.trigger_id]
+            return None
+        if save:
+            self.save()
+        return trigger
+
+    def remove(self, trigger_id, save=True):
+        trigger = self.triggers.pop(trigger_id, None)
+        self.held.pop(trigger_id, None)
+        if trigger is None:
+            return None
+        if trigger.kind == PAIR_PRICE and trigger.pair in self.price_index:
+            self.price_index[trigger.pair].remove(trigger.threshold, trigger.direction, trigger_id)
+        elif trigger.kind == ZSCORE and trigger.pair in self.zscore_index:
+            self.zscore_index[trigger.pair].remove(trigger.threshold, trigger.direction, trigger_id)
+        elif trigger.kind == TRAILING and trigger.pair in self.trailing:
+            self.trailing[trigger.pair].remove(trigger_id)
+        elif trigger.kind == UPNL_PCT:
+            self._rebuild_upnl()
+        if save:
+            self.save()
+        return trigger
+
+    def remove_for_trade(self, trade_id):
+        removed = [self.remove(t.trigger_id, save=False) for t in self.for_trade(trade_id)]
+        if removed:
+            self.save()
+        return removed
+
+    def rearm(self, trigger, hold_ms=TRIGGER_RETRY_INTERVAL):
+        # Put back a fired trigger whose order failed; it stays armed but waits hold_ms before firing again
+        self.held[trigger.trigger_id] = time.monotonic() + hold_ms / 1000
+        return self.add(trigger)
+
+    def for_trade(self, trade_id):
+        return [t for t in self.triggers.values() if t.trade_id == trade_id]
+
+    def add_pair_price(self, pair, threshold, direction, action=CLOSE, trade_id=None, order_size=None):
+        return self.add(Trigger(PAIR_PRICE, pair, threshold, direction, action, trade_id, order_size))
+
+    def add_upnl_pct(self, trade_id, threshold, direction):
+        return self.add(Trigger(UPNL_PCT, None, threshold, direction, CLOSE, trade_id))
+
+    def add_zscore(self, pair, threshold, direction, action=CLOSE, trade_id=None, order_size=None):
+        return self.add(Trigger(ZSCORE, pair, threshold, direction, action, trade_id, order_size))
+
+    def add_trailing(self, pair, trade_id, trail_pct, pear_type):
+        # `direction` holds the pear type: long pears trail the peak, short pears the trough
+        return self.add(Trigger(TRAILING, pair, trail_pct, pear_type, CLOSE, trade_id))
+
+    def _rebuild_upnl(self):
+        upnl = [t for t in self.triggers.values() if t.kind == UPNL_PCT]
+        self.upnl_ids = [t.trigger_id for t in upnl]
+        self.upnl_trade_ids = [t.trade_id for t in upnl]
+        self.upnl_threshold = np.array([t.threshold for t in upnl], dtype=float)
+        self.upnl_below = np.array([t.direction == BELOW for t in upnl], dtype=bool)
+        self._upnl_rows_key = None
+
+    # Market data
+
+    def seed_history(self, pair, prices):
+        history = self.history.setdefault(tuple(pair), deque(maxlen=ZSCORE_WINDOW))
+        history.clear()
+        history.extend(float(p) for p in prices)
+
+    def update_history(self, candle_cache):
+        """Rebuild the z-score window of every pair with a z-score trigger from cached minute closes.
+
+        The window is always the last ZSCORE_WINDOW minutes, however often
+        prices are polled; ticks are only scored against it. Pairs are only
+        rebuilt when one of their legs' candles changed.
+        """
+        for pair in self.zscore_index:
+            version = candle_cache.version(pair)
+            if self.history_versions.get(pair) == version:
+                continue
+            closes = pair_closes(candle_cache.get(pair[0]), candle_cache.get(pair[1]))
+            if closes is not None:
+                self.seed_history(pair, closes[-ZSCORE_WINDOW:])
+                self.history_versions[pair] = version
+        for pair in list(self.history):
+            if pair not in self.zscore_index:
+                del self.history[pair]
+                self.history_versions.pop(pair, None)
+
+    def zscore(self, pair, price=None):
+        history = self.history.get(tuple(pair))
+        if not history or len(history) < ZSCORE_MIN_OBSERVATIONS:
+            return None
+        values = np.fromiter(history, dtype=float)
+        std = values.std()
+        if not std:
+            return None
+        return ((history[-1] if price is None else price) - values.mean()) / std
+
+    def symbols(self):
+        return {symbol for pair in self.pairs() for symbol in pair}
+
+    def pairs(self):
+        return set(self.price_index) | set(self.zscore_index) | set(self.trailing)
+
+    # Evaluation
+
+    def evaluate(self, prices, trade_ids=None, upnl_pct=None, priced=None):
+        """Evaluate every armed trigger against one tick.
+
+        `prices` maps symbol -> last price. `trade_ids`, `upnl_pct` and
+        `priced` are the risk engine's pear order, per-pear UPnL % and whether
+        every leg of the pear has a price, for the same tick. Fired triggers
+        are removed and returned for the caller to act on; triggers re-armed
+        after a failed order stay armed without firing until their hold ends.
+        """
+        fired_ids = []
+        for pair in self.pairs():
+            price1, price2 = prices.get(pair[0]), prices.get(pair[1])
+            if not price1 or not price2:
+                continue
+            pair_price = price2 / price1
+
+            index = self.price_index.get(pair)
+            if index:
+                fired_ids.extend(index.crossed(pair_price))
+
+            index = self.zscore_index.get(pair)
+            if index:
+                z = self.zscore(pair, pair_price)
+                if z is not None:
+                    fired_ids.extend(index.crossed(z))
+
+            book = self.trailing.get(pair)
+            if book:
+                fired_ids.extend(book.crossed(pair_price))
+
+        if self.upnl_ids and trade_ids is not None and upnl_pct is not None:
+            fired_ids.extend(self._evaluate_upnl(trade_ids, np.asarray(upnl_pct, dtype=float), priced))
+
+        fired = []
+        now = time.monotonic()
+        for trigger_id in fired_ids:
+            if self.held.get(trigger_id, 0.0) > now:
+                # Re-armed after a failed order and still holding: back into its index, unfired
+                trigger = self.triggers.get(trigger_id)
+                if trigger is not None and trigger.kind != UPNL_PCT:
+                    self.add(trigger, save=False)
+                continue
+            self.held.pop(trigger_id, None)
+            trigger = self.triggers.pop(trigger_id, None)
+            if trigger is not None:
+                fired.append(trigger)
+        if fired:
+            if any(t.kind == UPNL_PCT for t in fired):
+                self._rebuild_upnl()
+            self.save()
+        return fired
+
+    def _upnl_values(self, trade_ids, upnl_pct, priced=None):
+        # Map triggers to risk engine rows once per pear set, then compare as arrays
+        if self._upnl_rows_key is not trade_ids:
+            rows = {trade_id: row for row, trade_id in enumerate(trade_ids)}
+            self._upnl_rows = np.array([rows.get(trade_id, -1) for trade_id in self.upnl_trade_ids], dtype=np.int64)
+            self._upnl_rows_key = trade_ids
+        valid = self._upnl_rows >= 0
+        if priced is not None and len(priced):
+            # A pear with an unpriced leg has a one-sided UPnL that must not fire a stop
+            valid &= np.asarray(priced, dtype=bool)[np.where(valid, self._upnl_rows, 0)]
+        return np.where(valid, upnl_pct[np.where(valid, self._upnl_rows, 0)] if len(upnl_pct) else 0.0, np.nan)
+
+    def _evaluate_upnl(self, trade_ids, upnl_pct, priced=None):
+        values = self._upnl_values(trade_ids, upnl_pct, priced)
+        hit = np.where(self.upnl_below, values <= self.upnl_threshold, values >= self.upnl_threshold)
+        return [self.upnl_ids[i] for i in np.flatnonzero(hit)]
+
+    def is_near(self, prices, trade_ids=None, upnl_pct=None, priced=None, pct=POLL_BOOST_TRIGGER_PCT, z_margin=POLL_BOOST_TRIGGER_Z):
+        """Whether any armed trigger is within pct % (price, trailing), pct points
+        (UPnL) or z_margin (z-score) of firing, so prices are worth polling faster."""
+        for pair in self.pairs():
+            price1, price2 = prices.get(pair[0]), prices.get(pair[1])
+            if not price1 or not price2:
+                continue
+            pair_price = price2 / price1
+            index = self.price_index.get(pair)
+            if index and index.distance(pair_price) <= pair_price * pct / 100:
+                return True
+            index = self.zscore_index.get(pair)
+            if index:
+                z = self.zscore(pair, pair_price)
+                if z is not None and index.distance(z) <= z_margin:
+                    return True
+            book = self.trailing.get(pair)
+            if book and book.distance(pair_price) * 100 <= pct:
+                return True
+        if self.upnl_ids and trade_ids is not None and upnl_pct is not None:
+            values = self._upnl_values(trade_ids, np.asarray(upnl_pct, dtype=float), priced)
+            if np.any(np.abs(values - self.upnl_threshold) <= pct):
+                return True
+        return False
+
+    # Persistence
+
+    def save(self):
+        for book in self.trailing.values():
+            book.sync()
+        try:
+            with open(self.path, 'w') as f:
+                json.dump([t.to_dict() for t in self.triggers.values()], f)
+        except OSError as e:
+            logger.error("Error saving triggers: %s", e)
+
+    def load(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error("Error loading triggers: %s", e)
+            return
+        for item in data:
+            self.add(Trigger.from_dict(item), save=False)
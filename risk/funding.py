@@ -0,0 +1,283 @@
+import os
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from config.config import *
+
+logger = logging.getLogger(__name__)
+
+DAY_MS = 86400000
+KEY_STRIDE = 1 << 42  # Above any millisecond timestamp until 2109, so (symbol, time) packs into one int64
+
+def fetch_history(client, symbol, start_ms, end_ms):
+    """Settled (times, rates) of symbol in [start_ms, end_ms], paging back from the end; None on failure."""
+    times, rates = [], []
+    end = int(end_ms)
+    while end >= start_ms:
+        response = client.get_funding_rate_history(category=BYBIT_CATEGORY, symbol=symbol, startTime=int(start_ms),
+                                                   endTime=end, limit=FUNDING_HISTORY_PAGE)
+        if not response or response['retCode'] != 0:
+            logger.error("Error getting funding history for %s: %s", symbol, response['retMsg'] if response else 'No response')
+            return None
+        rows = response['result']['list']
+        for row in rows:
+            times.append(int(row['fundingRateTimestamp']))
+            rates.append(float(row['fundingRate']))
+        if len(rows) < FUNDING_HISTORY_PAGE:
+            break
+        end = min(int(row['fundingRateTimestamp']) for row in rows) - 1
+    return np.asarray(times, dtype=np.int64), np.asarray(rates, dtype=float)
+
+class FundingBook:
+    """Funding rates for the symbols of the pear book.
+
+    Settled rates of every tracked symbol live in one flat array sorted by
+    (symbol, time) with a running sum, so the rates each leg has paid since
+    it opened are one searchsorted and two gathers over all legs at once.
+    The exchange is asked once per funding epoch: one bulk tickers call for
+    the predicted rate of every symbol in the category, plus an incremental
+    history fetch for tracked symbols only. History is cached on disk, so a
+    restart only fetches the settlements it missed.
+
+    Carry is positive when received. Longs pay positive rates, and accrued
+    carry is valued at entry notional rather than at each settlement's mark
+    price, which keeps it independent of price history.
+    """
+
+    def __init__(self, path=FUNDING_CACHE_FILE, clock_rate=1.0):
+        self.path = path
+        # Exchange ms per local ms; the paper exchange runs a simulated clock of its own
+        self.clock_rate = clock_rate
+        self.clock = None  # (exchange ms, local monotonic seconds) from the last tickers response
+        self.symbols = []
+        self.symbol_ids = {}
+        self.history = {}  # symbol -> (times, rates), sorted by time
+        self.covered = {}  # symbol -> [from_ms, to_ms] already fetched, settlements or not
+        self.predicted = np.full(0, np.nan)
+        self.next_funding = np.zeros(0, dtype=np.int64)
+        self.tickers_at = 0
+        self.version = 0
+        self.requests = 0
+        self._pack()
+
+    def _id(self, symbol):
+        index = self.symbol_ids.get(symbol)
+        if index is None:
+            index = len(self.symbols)
+            self.symbols.append(symbol)
+            self.symbol_ids[symbol] = index
+            self.predicted = np.append(self.predicted, np.nan)
+            self.next_funding = np.append(self.next_funding, 0)
+        return index
+
+    def ids(self, symbols):
+        return np.fromiter((self.symbol_ids.get(symbol, -1) for symbol in symbols), dtype=np.int64, count=len(symbols))
+
+    def _pack(self):
+        keys, rates = [np.zeros(0, dtype=np.int64)], [np.zeros(0)]
+        self.segment_end = np.zeros(len(self.symbols), dtype=np.int64)
+        end = 0
+        for index, symbol in enumerate(self.symbols):
+            times, symbol_rates = self.history.get(symbol, (np.zeros(0, dtype=np.int64), np.zeros(0)))
+            keys.append(index * KEY_STRIDE + times)
+            rates.append(symbol_rates)
+            end += len(times)
+            self.segment_end[index] = end
+        self.keys = np.concatenate(keys)
+        self.cumulative = np.concatenate(([0.0], np.cumsum(np.concatenate(rates))))
+        self.version += 1
+
+    def add_history(self, symbol, times, rates):
+        self._id(symbol)
+        old_times, old_rates = self.history.get(symbol, (np.zeros(0, dtype=np.int64), np.zeros(0)))
+        times, first = np.unique(np.concatenate((times, old_times)), return_index=True)
+        self.history[symbol] = (times, np.concatenate((rates, old_rates))[first])
+
+    def rate_sums(self, symbol_ids, since_ms):
+        """Sum of the rates settled after since_ms, per element; 0 where the symbol is unknown."""
+        symbol_ids = np.asarray(symbol_ids, dtype=np.int64)
+        # Symbols first seen in a tickers call after the last pack have no history yet
+        known = (symbol_ids >= 0) & (symbol_ids < len(self.segment_end))
+        safe_ids = np.where(known, symbol_ids, 0)
+        if not known.any():
+            return np.zeros(len(symbol_ids))
+        start = np.searchsorted(self.keys, safe_ids * KEY_STRIDE + np.asarray(since_ms, dtype=np.int64), side='right')
+        end = self.segment_end[safe_ids]
+        return np.where(known & (end > start), self.cumulative[end] - self.cumulative[np.minimum(start, end)], 0.0)
+
+    def predicted_rates(self, symbol_ids):
+        symbol_ids = np.asarray(symbol_ids, dtype=np.int64)
+        if not len(self.predicted):
+            return np.zeros(len(symbol_ids))
+        rates = self.predicted[np.where(symbol_ids >= 0, symbol_ids, 0)]
+        return np.where((symbol_ids >= 0) & ~np.isnan(rates), rates, 0.0)
+
+    def accrued(self, symbol_ids, signed_notional, since_ms):
+        # Carry received per leg since it opened: shorts (negative notional) receive positive rates
+        return -np.asarray(signed_notional) * self.rate_sums(symbol_ids, since_ms)
+
+    def projected(self, symbol_ids, signed_value):
+        # Carry per leg at the next settlement, at the predicted rate
+        return -np.asarray(signed_value) * self.predicted_rates(symbol_ids)
+
+    def now_ms(self):
+        """The exchange's time, run on from the last tickers response; the wall clock until there is one.
+
+        Settlements are announced on the exchange clock, which in paper mode is
+        simulated and far ahead of the wall clock.
+        """
+        if self.clock is None:
+            return time.time() * 1000
+        exchange_ms, received_at = self.clock
+        return exchange_ms + (time.monotonic() - received_at) * 1000 * self.clock_rate
+
+    def basket_carry(self, weights, notional, now_ms=None, days=FUNDING_AVERAGE_DAYS):
+        """(next settlement, trailing daily average) carry of a long basket of this size; a short gets the negatives."""
+        now_ms = now_ms or self.now_ms()
+        symbol_ids = self.ids(list(weights))
+        signed = notional * np.fromiter(weights.values(), dtype=float, count=len(weights))
+        next_carry = float(self.projected(symbol_ids, signed).sum())
+        average = float(self.accrued(symbol_ids, signed, int(now_ms - days * DAY_MS)).sum()) / days
+        return next_carry, average
+
+    def has_history(self, symbols):
+        return all(symbol in self.covered for symbol in symbols)
+
+    def _settled(self, symbol, now_ms):
+        # A settlement announced by the last tickers call has passed and is not fetched yet
+        index = self.symbol_ids.get(symbol)
+        next_funding = int(self.next_funding[index]) if index is not None else 0
+        return 0 < next_funding <= now_ms - FUNDING_SETTLE_DELAY and self.covered[symbol][1] < next_funding
+
+    def refresh_due(self, since, now_ms=None):
+        """since: {symbol: earliest ms whose settlements are needed}."""
+        now_ms = now_ms or self.now_ms()
+        if not self.tickers_at:
+            return True
+        for symbol, start in since.items():
+            covered = self.covered.get(symbol)
+            if covered is None or start < covered[0] or self._settled(symbol, now_ms):
+                return True
+        return False
+
+    def refresh(self, client, since, now_ms=None):
+        """One batched refresh: predicted rates for the whole category if an epoch
+        has passed, then only the history each tracked symbol is missing."""
+        now_ms = int(now_ms or self.now_ms())
+        jobs = []
+        settled = False
+        for symbol, start in since.items():
+            start = int(start)
+            covered = self.covered.get(symbol)
+            if covered is None:
+                jobs.append((symbol, start, now_ms))
+                continue
+            if start < covered[0]:
+                jobs.append((symbol, start, covered[0] - 1))
+            if self._settled(symbol, now_ms):
+                settled = True
+                # From the last settlement held, so one published late is still picked up
+                times = self.history.get(symbol, (np.zeros(0, dtype=np.int64),))[0]
+                jobs.append((symbol, int(times[-1]) + 1 if len(times) else covered[0], now_ms))
+
+        ok = True
+        if settled or not self.tickers_at:
+            ok = self.update_predicted(client, now_ms)
+        if jobs:
+            with ThreadPoolExecutor(max_workers=min(FUNDING_FETCH_WORKERS, len(jobs))) as executor:
+                results = list(executor.map(lambda job: fetch_history(client, *job), jobs))
+            self.requests += len(jobs)
+            for (symbol, start, end), result in zip(jobs, results):
+                if result is None:
+                    ok = False
+                    continue
+                self.add_history(symbol, *result)
+                covered = self.covered.setdefault(symbol, [start, end])
+                covered[0], covered[1] = min(covered[0], start), max(covered[1], end)
+            self._pack()
+            self.save()
+        return ok
+
+    def update_predicted(self, client, now_ms):
+        tickers = client.get_tickers(category=BYBIT_CATEGORY)
+        self.requests += 1
+        if not tickers or tickers['retCode'] != 0:
+            logger.error("Error getting funding rates: %s", tickers['retMsg'] if tickers else 'No response')
+            return False
+        if tickers.get('time'):
+            self.clock = (int(tickers['time']), time.monotonic())
+        for ticker in tickers['result']['list']:
+            if not ticker.get('fundingRate'):
+                continue
+            index = self._id(ticker['symbol'])
+            self.predicted[index] = float(ticker['fundingRate'])
+            self.next_funding[index] = int(ticker.get('nextFundingTime') or 0)
+        self.tickers_at = now_ms
+        self.version += 1
+        return True
+
+    def save(self):
+        symbols = [symbol for symbol in self.symbols if symbol in self.history]
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0))
+        meta = {'symbols': symbols, 'covered': {symbol: self.covered[symbol] for symbol in symbols},
+                'counts': [len(self.history[symbol][0]) for symbol in symbols]}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(meta)),
+                     times=np.concatenate([self.history[symbol][0] for symbol in symbols] or [empty[0]]),
+                     rates=np.concatenate([self.history[symbol][1] for symbol in symbols] or [empty[1]]))
+        os.replace(tmp_path, self.path)
+
+    @classmethod
+    def load(cls, path=FUNDING_CACHE_FILE, clock_rate=1.0):
+        book = cls(path, clock_rate)
+        if not os.path.exists(path):
+            return book
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data['meta']))
+                times, rates = data['times'], data['rates']
+        except (OSError, ValueError, KeyError) as e:
+            logger.error("Could not read %s: %s", path, e)
+            return book
+        offset = 0
+        for symbol, count in zip(meta['symbols'], meta['counts']):
+            book.add_history(symbol, times[offset:offset + count], rates[offset:offset + count])
+            book.covered[symbol] = list(meta['covered'][symbol])
+            offset += count
+        book._pack()
+        return book
+
+def benchmark(symbols=300, legs=10000, days=365, runs=200):
+    rng = np.random.default_rng(0)
+    book = FundingBook(path=os.devnull)
+    now_ms = int(time.time() * 1000) // (8 * 3600000) * (8 * 3600000)
+    times = now_ms - np.arange(days * 3, 0, -1, dtype=np.int64) * 8 * 3600000
+    for i in range(symbols):
+        book.add_history(f"SYM{i}USDT", times, rng.normal(0.0001, 0.0002, len(times)))
+        book.covered[f"SYM{i}USDT"] = [int(times[0]), now_ms]
+    start = time.perf_counter()
+    book._pack()
+    print(f"pack: {(time.perf_counter() - start) * 1000:.1f} ms for {symbols} symbols x {len(times)} settlements")
+
+    leg_ids = rng.integers(0, symbols, legs)
+    notional = rng.uniform(-1000, 1000, legs)
+    opened = now_ms - rng.integers(0, days * DAY_MS, legs)
+    start = time.perf_counter()
+    for _ in range(runs):
+        carry = book.accrued(leg_ids, notional, opened)
+    vectorized = (time.perf_counter() - start) / runs
+    start = time.perf_counter()
+    loop_legs = 500
+    for i in range(loop_legs):
+        symbol_times, symbol_rates = book.history[book.symbols[leg_ids[i]]]
+        expected = -notional[i] * symbol_rates[symbol_times > opened[i]].sum()
+        assert abs(expected - carry[i]) < 1e-6
+    per_leg = (time.perf_counter() - start) / loop_legs
+    print(f"accrued carry for {legs} legs: {vectorized * 1000:.2f} ms vectorized, "
+          f"{per_leg * legs * 1000:.0f} ms with a per-leg loop")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,205 @@
+import time
+import logging
+from datetime import datetime
+import numpy as np
+from config.config import *
+from orders.pear import Pear, Leg
+from market_data.candles import TS, CLOSE as CANDLE_CLOSE
+
+logger = logging.getLogger(__name__)
+
+def opened_at(pear):
+    # Pear timestamps are local ISO times; funding settlements are epoch ms
+    try:
+        return int(datetime.fromisoformat(pear.timestamp).timestamp() * 1000)
+    except (TypeError, ValueError):
+        logger.warning("Pear %s has no valid timestamp; funding accrues from now", pear.trade_id)
+        return int(time.time() * 1000)
+
+def estimate_betas(candles, benchmark, window=BETA_WINDOW, min_observations=BETA_MIN_OBSERVATIONS):
+    """{symbol: beta} of minute log returns against the benchmark's, over the last window minutes.
+
+    candles maps symbols to cached minute candle matrices. Returns are taken
+    only over minutes both the symbol and the benchmark have a candle for;
+    symbols with fewer than min_observations of them are left out.
+    """
+    reference = candles.get(benchmark)
+    if reference is None or len(reference) < 2:
+        return {}
+    reference = reference[-(window + 1):]
+    betas = {}
+    for symbol, rows in candles.items():
+        if rows is None or not len(rows):
+            continue
+        _, own, ref = np.intersect1d(rows[:, TS], reference[:, TS], assume_unique=True, return_indices=True)
+        if len(own) <= min_observations:
+            continue
+        returns = np.diff(np.log(rows[own, CANDLE_CLOSE]))
+        reference_returns = np.diff(np.log(reference[ref, CANDLE_CLOSE]))
+        variance = reference_returns.var()
+        if variance > 0:
+            betas[symbol] = float(((returns - returns.mean()) * (reference_returns - reference_returns.mean())).mean() / variance)
+    return betas
+
+class RiskEngine:
+    """Columnar risk and PnL engine for the pear book.
+
+    Every pear leg is one row in a set of NumPy columns (pear index, symbol
+    index, side sign, qty, entry price). A price update is a single gather
+    over the price vector followed by bincount reductions, so per-pear and
+    aggregate UPnL and per-symbol exposures cost the same handful of array
+    ops whether there are 2 pears or 2,000. The UI only reads the result
+    arrays.
+
+    With a FundingBook attached, each leg also carries the funding it has
+    accrued since the pear opened and its projected carry at the next
+    settlement, reduced per pear the same way.
+    """
+
+    def __init__(self, funding=None):
+        self.funding = funding
+        self.symbols = []
+        self.symbol_index = {}
+        self.prices = np.full(0, np.nan)
+        self.betas = np.ones(0)
+
+        self.pear_count = 0
+        self.trade_ids = []
+        self.leg_pear = np.zeros(0, dtype=np.int64)
+        self.leg_symbol = np.zeros(0, dtype=np.int64)
+        self.leg_sign = np.zeros(0)
+        self.leg_qty = np.zeros(0)
+        self.leg_entry = np.zeros(0)
+        self.leg_opened = np.zeros(0, dtype=np.int64)  # Epoch ms the leg's pear was opened
+
+        self.leg_upnl = np.zeros(0)
+        self.pear_upnl = np.zeros(0)
+        self.pear_entry_value = np.zeros(0)
+        self.pear_upnl_pct = np.zeros(0)
+        self.pear_priced = np.zeros(0, dtype=bool)
+        self.pear_funding = np.zeros(0)
+        self.pear_projected_funding = np.zeros(0)
+        self.pear_pnl = np.zeros(0)  # Price UPnL plus accrued funding
+        self.net_exposure = np.zeros(0)
+        self.gross_exposure = np.zeros(0)
+        self.beta_exposure = np.zeros(0)
+        self.total_upnl = 0.0
+        self.total_beta_exposure = 0.0
+        self.total_funding = 0.0
+        self.total_projected_funding = 0.0
+        self.last_compute_seconds = 0.0
+
+    def _get_symbol_index(self, symbol):
+        index = self.symbol_index.get(symbol)
+        if index is None:
+            index = len(self.symbols)
+            self.symbols.append(symbol)
+            self.symbol_index[symbol] = index
+            self.prices = np.append(self.prices, np.nan)
+            self.betas = np.append(self.betas, 1.0)
+        return index
+
+    def set_pears(self, pears):
+        pears = list(pears or [])
+        pear_idx, symbol_idx, sign, qty, entry, opened = [], [], [], [], [], []
+        for index, pear in enumerate(pears):
+            opened_ms = opened_at(pear)
+            for leg in pear.legs:
+                pear_idx.append(index)
+                symbol_idx.append(self._get_symbol_index(leg.symbol))
+                sign.append(leg.sign)
+                qty.append(leg.qty)
+                entry.append(leg.entry_price)
+                opened.append(opened_ms)
+
+        self.pear_count = len(pears)
+        self.trade_ids = [pear.trade_id for pear in pears]
+        self.leg_pear = np.asarray(pear_idx, dtype=np.int64)
+        self.leg_symbol = np.asarray(symbol_idx, dtype=np.int64)
+        self.leg_sign = np.asarray(sign, dtype=float)
+        self.leg_qty = np.asarray(qty, dtype=float)
+        self.leg_entry = np.asarray(entry, dtype=float)
+        self.leg_opened = np.asarray(opened, dtype=np.int64)
+
+    def active_symbols(self):
+        return [self.symbols[i] for i in np.unique(self.leg_symbol)]
+
+    def update_prices(self, prices):
+        for symbol, price in prices.items():
+            if price is not None:
+                index = self._get_symbol_index(symbol)  # May grow self.prices, so look it up first
+                self.prices[index] = float(price)
+
+    def set_betas(self, betas):
+        for symbol, beta in betas.items():
+            index = self._get_symbol_index(symbol)
+            self.betas[index] = float(beta)
+
+    def compute(self):
+        start = time.perf_counter()
+        n_pears = self.pear_count
+        n_symbols = len(self.symbols)
+
+        leg_price = self.prices[self.leg_symbol]
+        priced = ~np.isnan(leg_price)
+        signed_qty = self.leg_sign * self.leg_qty
+        self.leg_upnl = np.where(priced, (leg_price - self.leg_entry) * signed_qty, 0.0)
+
+        self.pear_upnl = np.bincount(self.leg_pear, weights=self.leg_upnl, minlength=n_pears)
+        leg_counts = np.bincount(self.leg_pear, minlength=n_pears)
+        entry_value = np.bincount(self.leg_pear, weights=self.leg_qty * self.leg_entry, minlength=n_pears)
+        self.pear_entry_value = np.divide(entry_value, leg_counts, out=np.zeros(n_pears), where=leg_counts > 0)
+        self.pear_upnl_pct = np.divide(self.pear_upnl * 100, self.pear_entry_value, out=np.zeros(n_pears), where=self.pear_entry_value > 0)
+        self.pear_priced = np.bincount(self.leg_pear, weights=~priced, minlength=n_pears) == 0
+
+        leg_value = np.where(priced, signed_qty * leg_price, 0.0)
+        self.net_exposure = np.bincount(self.leg_symbol, weights=leg_value, minlength=n_symbols)
+        self.gross_exposure = np.bincount(self.leg_symbol, weights=np.abs(leg_value), minlength=n_symbols)
+        self.beta_exposure = self.net_exposure * self.betas
+
+        if self.funding is not None:
+            leg_ids = self.funding.ids(self.symbols)[self.leg_symbol]
+            leg_funding = self.funding.accrued(leg_ids, signed_qty * self.leg_entry, self.leg_opened)
+            leg_projected = self.funding.projected(leg_ids, leg_value)
+            self.pear_funding = np.bincount(self.leg_pear, weights=leg_funding, minlength=n_pears)
+            self.pear_projected_funding = np.bincount(self.leg_pear, weights=leg_projected, minlength=n_pears)
+        else:
+            self.pear_funding = np.zeros(n_pears)
+            self.pear_projected_funding = np.zeros(n_pears)
+        self.pear_pnl = self.pear_upnl + self.pear_funding
+
+        self.total_upnl = float(self.pear_upnl.sum())
+        self.total_beta_exposure = float(self.beta_exposure.sum())
+        self.total_funding = float(self.pear_funding.sum())
+        self.total_projected_funding = float(self.pear_projected_funding.sum())
+        self.last_compute_seconds = time.perf_counter() - start
+
+    def exposures(self):
+        return {
+            symbol: (self.net_exposure[i], self.gross_exposure[i], self.beta_exposure[i])
+            for i, symbol in enumerate(self.symbols)
+            if self.gross_exposure[i]
+        }
+
+# Benchmark
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    universe = [f"SYM{i}USDT" for i in range(200)]
+    pears = []
+    for i in range(1000):
+        symbol1, symbol2 = rng.choice(universe, 2, replace=False)
+        pears.append(Pear(str(i), 'long', [
+            Leg(symbol1, 'Sell', rng.uniform(1, 10), rng.uniform(1, 100)),
+            Leg(symbol2, 'Buy', rng.uniform(1, 10), rng.uniform(1, 100)),
+        ]))
+
+    engine = RiskEngine()
+    engine.set_pears(pears)
+    runs = 1000
+    start = time.perf_counter()
+    for _ in range(runs):
+        engine.update_prices({symbol: float(rng.uniform(1, 100)) for symbol in universe[:20]})
+        engine.compute()
+    elapsed = (time.perf_counter() - start) / runs
+    print(f"1,000 pears: {elapsed * 1e6:.1f} us per price update + compute")
+    print(f"Total UPnL: {engine.total_upnl:.2f}, beta-weighted exposure: {engine.total_beta_exposure:.2f}")
@@ -0,0 +1,107 @@
+import time
+import pytest
+from orders.account_manager import Account, AccountManager, aggregate_fills, aggregate_summary, partial_fills
+from trading_api.paper_exchange import PaperExchangeClient
+from config.config import PAPER_ACCOUNT_SEED
+
+SIDES = {'BTCUSDT': 'Sell', 'ETHUSDT': 'Buy'}
+CLOSE_SIDES = {'BTCUSDT': 'Buy', 'ETHUSDT': 'Sell'}
+NOTIONALS = {'BTCUSDT': 1000, 'ETHUSDT': 1000}
+
+@pytest.fixture
+def manager():
+    manager = AccountManager([Account("full", scale=1.0, paper=True), Account("half", scale=0.5, paper=True)], timeout=30)
+    manager.start()
+    yield manager
+    manager.stop()
+
+@pytest.fixture(scope='module')
+def prices():
+    return PaperExchangeClient(seed=PAPER_ACCOUNT_SEED).get_last_prices(list(SIDES))
+
+def test_open_basket_fans_out_scaled_per_account(manager, prices):
+    allocations, failures = aggregate_fills(manager.open_basket(SIDES, NOTIONALS, prices))
+    assert failures == {}
+    assert set(allocations) == {'full', 'half'}
+    client = PaperExchangeClient(seed=PAPER_ACCOUNT_SEED)
+    for symbol in SIDES:
+        step = 10 ** -client.get_quantity_precision(symbol)
+        assert allocations['full'][symbol] == pytest.approx(NOTIONALS[symbol] / prices[symbol], abs=step)
+        assert allocations['half'][symbol] == pytest.approx(NOTIONALS[symbol] * 0.5 / prices[symbol], abs=step)
+
+    view = aggregate_summary(manager.summary())
+    assert len(view['lines']) == 2
+    assert view['net_sizes']['BTCUSDT'] == pytest.approx(-(allocations['full']['BTCUSDT'] + allocations['half']['BTCUSDT']))
+    assert view['net_sizes']['ETHUSDT'] == pytest.approx(allocations['full']['ETHUSDT'] + allocations['half']['ETHUSDT'])
+
+def test_partial_fill_is_reported_with_the_legs_that_filled(manager, prices):
+    sides = dict(SIDES, NOPEUSDT='Buy')
+    replies = manager.open_basket(sides, dict(NOTIONALS, NOPEUSDT=1000), dict(prices, NOPEUSDT=1.0))
+    allocations, failures = aggregate_fills(replies)
+    assert allocations == {}
+    assert set(failures) == {'full', 'half'}
+    for name, reply in replies.items():
+        assert reply['ok']
+        assert 'NOPEUSDT' in failures[name]
+        assert 'filled' in failures[name] and 'BTCUSDT' in failures[name] and 'ETHUSDT' in failures[name]
+
+def test_partial_fills_can_be_unwound(manager, prices):
+    sides = dict(SIDES, NOPEUSDT='Buy')
+    partials = partial_fills(manager.open_basket(sides, dict(NOTIONALS, NOPEUSDT=1000), dict(prices, NOPEUSDT=1.0)))
+    assert set(partials) == {'full', 'half'}
+    assert all(set(legs) == set(SIDES) for legs in partials.values())
+    replies = manager.close_allocations(partials, CLOSE_SIDES)
+    assert all(reply['ok'] and all(leg['ok'] for leg in reply['result']) for reply in replies.values())
+    view = aggregate_summary(manager.summary())
+    assert all(size == pytest.approx(0) for size in view['net_sizes'].values())
+
+def test_aggregate_fills_separates_failed_accounts():
+    replies = {
+        'a': {'ok': True, 'result': [{'symbol': 'BTCUSDT', 'side': 'Sell', 'qty': 0.02, 'ok': True, 'message': 'OK'},
+                                     {'symbol': 'ETHUSDT', 'side': 'Buy', 'qty': 0.3, 'ok': True, 'message': 'OK'}]},
+        'b': {'ok': True, 'result': [{'symbol': 'BTCUSDT', 'side': 'Sell', 'qty': 0.01, 'ok': True, 'message': 'OK'},
+                                     {'symbol': 'ETHUSDT', 'side': 'Buy', 'qty': 0.0, 'ok': False, 'message': 'Insufficient balance'}]},
+        'c': {'ok': False, 'result': 'Timed out'},
+    }
+    allocations, failures = aggregate_fills(replies)
+    assert allocations == {'a': {'BTCUSDT': 0.02, 'ETHUSDT': 0.3}}
+    assert failures['b'] == "ETHUSDT: Insufficient balance (filled BTCUSDT 0.01)"
+    assert failures['c'] == 'Timed out'
+    assert partial_fills(replies) == {'b': {'BTCUSDT': 0.01}}
+
+def test_close_allocations_flattens_each_account(manager, prices):
+    allocations, _ = aggregate_fills(manager.open_basket(SIDES, NOTIONALS, prices))
+    replies = manager.close_allocations(allocations, CLOSE_SIDES)
+    assert set(replies) == {'full', 'half'}
+    for name, reply in replies.items():
+        assert reply['ok']
+        assert {leg['symbol']: leg['qty'] for leg in reply['result'] if leg['ok']} == allocations[name]
+
+    view = aggregate_summary(manager.summary())
+    assert all(size == pytest.approx(0) for size in view['net_sizes'].values())
+
+def test_close_allocations_skips_unknown_accounts(manager):
+    assert manager.close_allocations({'gone': {'BTCUSDT': 0.01}}, CLOSE_SIDES) == {}
+
+def test_dead_worker_is_skipped_without_waiting(manager):
+    manager.timeout = 10
+    manager.processes['half'].terminate()
+    manager.processes['half'].join()
+    start = time.monotonic()
+    replies = manager.summary()
+    assert time.monotonic() - start < manager.timeout / 2
+    assert replies['half'] == {'ok': False, 'result': 'Worker not running'}
+    assert replies['full']['ok']
+    assert 'half' in manager.dead
+
+def test_worker_that_fails_to_start_is_marked_dead():
+    manager = AccountManager([Account("broken", api_key_env="MISSING_KEY", scale=1.0)], timeout=30)
+    manager.results.put((None, "broken", False, "Failed to start: no credentials"))
+    manager.processes['broken'] = type('Alive', (), {'is_alive': lambda self: True})()
+    manager.requests['broken'] = manager.context.Queue()
+    start = time.monotonic()
+    replies = manager.summary()
+    assert time.monotonic() - start < manager.timeout / 2
+    assert replies == {'broken': {'ok': False, 'result': "Failed to start: no credentials"}}
+    assert 'broken' in manager.dead
+    assert manager.summary() == {'broken': {'ok': False, 'result': 'Worker not running'}}
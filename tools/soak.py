@@ -0,0 +1,153 @@
+"""Soak test: run the full GUI against the paper exchange for hours of simulated time.
+
+    python3 -m tools.soak --hours 24
+
+Qt runs offscreen and the simulated clock is advanced by hand, so a day of
+trading finishes in minutes. Each cycle opens and closes pears, switches the
+charted pair and runs the same refresh paths as the timers. Pears are opened
+every cycle until --max-pears are open; from then on RSS, Python object
+counts, live widgets and chart artists are sampled, and the run fails (exit
+code 1) if any of them keeps growing.
+"""
+import os
+import gc
+import sys
+import time
+import argparse
+import tempfile
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import config.config as config
+
+# Everything the app would otherwise reach out to is replaced before main is imported
+config.PAPER_TRADING = True
+config.PRIVATE_STREAM_ENABLED = False
+config.DATA_BUS_ENABLED = False
+config.MULTI_ACCOUNT_ENABLED = False
+
+SOAK_PAIRS = [("BTCUSDT", "ETHUSDT"), ("ETHUSDT", "SOLUSDT"), ("BTCUSDT", "SOLUSDT"), ("SOLUSDT", "DOGEUSDT")]
+
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        import resource
+        # Peak rather than current RSS where /proc is unavailable
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+def sample(app, window):
+    gc.collect()
+    return {
+        'rss_mb': rss_mb(),
+        'objects': len(gc.get_objects()),
+        'widgets': len(app.allWidgets()),
+        # Entry markers follow the open pears, so only the fixed artists are counted
+        'artists': len(window.ax.get_children()) - len(window.position_markers) if window.ax is not None else 0,
+    }
+
+def growth(samples, key):
+    # Least-squares slope over the run, scaled to the whole run, so a single spike does not fail it
+    n = len(samples)
+    xs = range(n)
+    mean_x = (n - 1) / 2
+    mean_y = sum(s[key] for s in samples) / n
+    slope = sum((x - mean_x) * (s[key] - mean_y) for x, s in zip(xs, samples)) / max(sum((x - mean_x) ** 2 for x in xs), 1)
+    return slope * (n - 1)
+
+def run(args):
+    import main
+    from PyQt5.QtCore import QCoreApplication, QEvent
+
+    # Dialogs would block the loop; log them instead
+    main.QMessageBox.information = staticmethod(lambda *a, **k: None)
+    main.QMessageBox.warning = staticmethod(lambda parent, title, text, *a, **k: print(f"warning: {title}: {text}"))
+    main.QMessageBox.question = staticmethod(lambda *a, **k: main.QMessageBox.Yes)
+
+    main.setup_logging()
+    app = main.QApplication.instance() or main.QApplication(sys.argv)
+    window = main.MainWindow()
+    paper = window.bybit_client
+    paper.stop()  # The soak advances simulated time itself
+    window.scheduler.stop()  # The loop below runs the same refresh paths itself
+    window.poll_timer.stop()
+    dialog = window.trading_dialog
+    window.create_chart(*SOAK_PAIRS[0])
+
+    cycles = int(args.hours * 60 / args.minutes_per_cycle)
+    samples = []
+    warmed_up_at = None  # First cycle with max_pears open; row pools are at their peak from then on
+    started = time.monotonic()
+    for cycle in range(cycles):
+        paper.advance(args.minutes_per_cycle)
+
+        # Warm-up fills up to max_pears across every soak pair, so the pear and position row pools
+        # reach their peak before sampling starts
+        if (warmed_up_at is None or cycle % 7 == 0) and len(dialog.current_position) < args.max_pears:
+            weights = main.pair_weights(*SOAK_PAIRS[cycle % len(SOAK_PAIRS)]) if warmed_up_at is None else dict(window.weights)
+            dialog.place_basket_order('long' if cycle % 2 else 'short', weights, args.order_size)
+        if cycle % 11 == 0 and dialog.current_position:
+            dialog.close_position(next(iter(dialog.current_position)).trade_id)
+        if cycle % 13 == 0:
+            symbol1, symbol2 = SOAK_PAIRS[(cycle // 13) % len(SOAK_PAIRS)]
+            dialog.symbol1_input.setText(symbol1)
+            dialog.symbol2_input.setText(symbol2)
+            dialog.update_chart()
+
+        window.update_chart(cycle)
+        window.refresh_positions()
+        app.processEvents()
+        QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+
+        if warmed_up_at is None and len(dialog.current_position) >= args.max_pears:
+            warmed_up_at = cycle
+        if warmed_up_at is not None and (cycle - warmed_up_at) % args.sample_every == 0:
+            samples.append(sample(app, window))
+            latest = samples[-1]
+            print(f"cycle {cycle}/{cycles} ({cycle * args.minutes_per_cycle / 60:.1f}h simulated): "
+                  f"rss {latest['rss_mb']:.1f} MB, objects {latest['objects']}, "
+                  f"widgets {latest['widgets']}, artists {latest['artists']}, pears {len(dialog.current_position)}")
+
+    dialog.close_all_positions()
+    window.close()
+    elapsed = time.monotonic() - started
+    print(f"Simulated {args.hours:.1f}h in {elapsed:.0f}s")
+
+    if len(samples) < 3:
+        print("Not enough samples after warm-up; run longer or lower --sample-every")
+        return 1
+    limits = {
+        'rss_mb': args.max_rss_growth_mb,
+        'objects': samples[0]['objects'] * args.max_object_growth_pct / 100,
+        'widgets': 0.5,
+        'artists': 0.5,
+    }
+    failed = False
+    for key, limit in limits.items():
+        trend = growth(samples, key)
+        status = "FAIL" if trend > limit else "ok"
+        failed |= trend > limit
+        print(f"{key:>8}: start {samples[0][key]:.1f}, end {samples[-1][key]:.1f}, trend {trend:+.1f} (limit {limit:.1f}) {status}")
+    return 1 if failed else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Bounded-memory soak test against the paper exchange")
+    parser.add_argument('--hours', type=float, default=24, help="Simulated hours to run")
+    parser.add_argument('--minutes-per-cycle', type=float, default=5, help="Simulated minutes per refresh cycle")
+    parser.add_argument('--sample-every', type=int, default=20)
+    parser.add_argument('--max-pears', type=int, default=8)
+    parser.add_argument('--order-size', type=float, default=200)
+    parser.add_argument('--max-rss-growth-mb', type=float, default=25)
+    parser.add_argument('--max-object-growth-pct', type=float, default=2)
+    args = parser.parse_args()
+
+    # Position, trigger and trade-log files go to a scratch directory
+    workdir = tempfile.mkdtemp(prefix='pear_soak_')
+    os.chdir(workdir)
+    print(f"Soak working directory: {workdir}")
+    sys.exit(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import threading
+import time
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+class AccountState:
+    """Local copy of positions, orders, fills and wallet equity.
+
+    Updated by private stream pushes (which may arrive on a websocket thread)
+    and periodically reconciled against REST snapshots. Readers get copies, so
+    they never see a half-applied update.
+    """
+
+    def __init__(self, max_executions=500):
+        self._lock = threading.Lock()
+        self._positions = {}  # (symbol, positionIdx) -> position dict
+        self._orders = {}  # orderId -> open order dict
+        self._executions = deque(maxlen=max_executions)
+        self._total_equity = None
+        self._listeners = []
+        self.positions_synced = False
+        self.wallet_synced = False
+        self.version = 0
+        self.last_update = 0.0
+
+    def add_listener(self, callback):
+        # Listeners are called with the topic name after every applied update
+        self._listeners.append(callback)
+
+    def _notify(self, topic):
+        self.version += 1
+        self.last_update = time.time()
+        for callback in self._listeners:
+            try:
+                callback(topic)
+            except Exception as e:
+                logger.error("Error in account state listener: %s", e)
+
+    @staticmethod
+    def _position_key(position):
+        return position.get('symbol'), int(position.get('positionIdx', 0) or 0)
+
+    def apply_positions(self, positions):
+        with self._lock:
+            for position in positions:
+                key = self._position_key(position)
+                if float(position.get('size', 0) or 0) > 0:
+                    self._positions[key] = dict(position)
+                else:
+                    self._positions.pop(key, None)
+        self._notify('position')
+
+    def apply_orders(self, orders):
+        with self._lock:
+            for order in orders:
+                order_id = order.get('orderId')
+                if order.get('orderStatus') in ('New', 'PartiallyFilled', 'Untriggered'):
+                    self._orders[order_id] = dict(order)
+                else:
+                    self._orders.pop(order_id, None)
+        self._notify('order')
+
+    def apply_executions(self, executions):
+        with self._lock:
+            self._executions.extend(dict(execution) for execution in executions)
+        self._notify('execution')
+
+    def apply_wallet(self, accounts, account_type="UNIFIED"):
+        updated = False
+        with self._lock:
+            for account in accounts:
+                if account.get('accountType', account_type) == account_type and account.get('totalEquity') not in (None, ''):
+                    self._total_equity = float(account['totalEquity'])
+                    self.wallet_synced = True
+                    updated = True
+        if updated:
+            self._notify('wallet')
+
+    def reconcile_positions(self, positions):
+        # A REST snapshot is authoritative: replace everything we hold
+        with self._lock:
+            was_synced = self.positions_synced
+            previous = self._positions
+            self._positions = {
+                self._position_key(position): dict(position)
+                for position in positions
+                if float(position.get('size', 0) or 0) > 0
+            }
+            changed = set(previous) != set(self._positions) or any(
+                previous[key].get('size') != self._positions[key].get('size') for key in self._positions
+            )
+            self.positions_synced = True
+        if changed and was_synced:
+            logger.info("Position state corrected by REST reconciliation")
+        self._notify('position')
+
+    def get_open_positions(self):
+        with self._lock:
+            return [dict(position) for position in self._positions.values()]
+
+    def get_open_orders(self):
+        with self._lock:
+            return [dict(order) for order in self._orders.values()]
+
+    def get_recent_executions(self):
+        with self._lock:
+            return list(self._executions)
+
+    def get_total_equity(self):
+        with self._lock:
+            return self._total_equity
@@ -0,0 +1,294 @@
+import hmac
+import json
+import time
+import asyncio
+import hashlib
+import inspect
+import logging
+import threading
+import functools
+from urllib.parse import urlencode
+import aiohttp
+from yarl import URL
+from config.config import *
+
+logger = logging.getLogger(__name__)
+
+MAINNET_URL = "https://api.bybit.com"
+TESTNET_URL = "https://api-testnet.bybit.com"
+
+# retCodes worth one more attempt: request expired (clock skew) and rate limited
+RETRY_CODES = {10002, 10006}
+# Order fields Bybit expects as strings
+STRING_FIELDS = ('qty', 'price', 'triggerPrice', 'takeProfit', 'stopLoss')
+
+def sign(api_secret, timestamp, api_key, recv_window, payload):
+    # Bybit v5 HMAC: timestamp + api key + recv window + (query string | JSON body)
+    message = f"{timestamp}{api_key}{recv_window}{payload}"
+    return hmac.new(api_secret.encode(), message.encode(), hashlib.sha256).hexdigest()
+
+class AsyncBybitAPIClient:
+    """asyncio twin of BybitAPIClient with the same method names.
+
+    Requests share one keep-alive connection pool and are signed locally,
+    so many reads can be in flight at once (e.g. klines for 50 symbols in
+    one gather). Each endpoint has its own semaphore so a burst of reads
+    never starves order placement or trips that endpoint's rate limit.
+    Like the sync client, failures are logged and return None.
+    """
+
+    def __init__(self, api_key, api_secret, testnet=TESTNET, base_url=None,
+                 pool_size=ASYNC_HTTP_POOL_SIZE, endpoint_limits=ASYNC_ENDPOINT_LIMITS):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.base_url = base_url or (TESTNET_URL if testnet else MAINNET_URL)
+        self.pool_size = pool_size
+        self.endpoint_limits = endpoint_limits
+        self.semaphores = {}
+        self.session = None
+
+    async def _session(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=ASYNC_HTTP_TIMEOUT),
+                headers={'Content-Type': 'application/json', 'Accept': 'application/json'},
+            )
+        return self.session
+
+    def _semaphore(self, path):
+        semaphore = self.semaphores.get(path)
+        if semaphore is None:
+            semaphore = self.semaphores[path] = asyncio.Semaphore(self.endpoint_limits.get(path, ASYNC_ENDPOINT_DEFAULT_LIMIT))
+        return semaphore
+
+    def _auth_headers(self, payload):
+        timestamp = str(int(time.time() * 1000))
+        return {
+            'X-BAPI-API-KEY': self.api_key,
+            'X-BAPI-TIMESTAMP': timestamp,
+            'X-BAPI-RECV-WINDOW': str(BYBIT_RECV_WINDOW),
+            'X-BAPI-SIGN': sign(self.api_secret, timestamp, self.api_key, BYBIT_RECV_WINDOW, payload),
+            'X-BAPI-SIGN-TYPE': '2',
+        }
+
+    async def _request(self, method, path, params=None, signed=False):
+        params = {key: value for key, value in (params or {}).items() if value is not None}
+        session = await self._session()
+        for attempt in range(2):
+            if method == 'GET':
+                payload = urlencode(params)
+                # Sent exactly as signed; yarl would otherwise be free to re-quote it
+                url = URL(f"{self.base_url}{path}?{payload}" if payload else f"{self.base_url}{path}", encoded=True)
+                body = None
+            else:
+                for field in STRING_FIELDS:
+                    if field in params:
+                        params[field] = str(params[field])
+                payload = body = json.dumps(params)
+                url = f"{self.base_url}{path}"
+            headers = self._auth_headers(payload) if signed else None
+            async with self._semaphore(path):
+                async with session.request(method, url, data=body, headers=headers) as response:
+                    result = await response.json(content_type=None)
+                    reset = response.headers.get('X-Bapi-Limit-Reset-Timestamp')
+            if result.get('retCode') not in RETRY_CODES or attempt:
+                return result
+            delay = max(0.0, int(reset) / 1000 - time.time()) if reset else 0.5
+            logger.warning("%s: %s, retrying in %.2fs", path, result.get('retMsg'), delay)
+            await asyncio.sleep(min(delay, 2.0))
+
+    async def _call(self, name, method, path, params=None, signed=False):
+        try:
+            return await self._request(method, path, params, signed)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.error("Error %s: %r", name, e)
+            return None
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    # Market data
+
+    async def get_kline_data(self, symbol, interval, limit, end=None):
+        params = dict(category=BYBIT_CATEGORY, symbol=symbol, interval=interval, limit=limit)
+        if end is not None:
+            params['end'] = int(end)
+        return await self._call("getting kline data", 'GET', '/v5/market/kline', params)
+
+    async def get_kline_data_many(self, symbols, interval, limit, end=None):
+        # Every symbol in flight at once; the kline semaphore caps how many actually hit the exchange
+        responses = await asyncio.gather(*(self.get_kline_data(symbol, interval, limit, end) for symbol in symbols))
+        return dict(zip(symbols, responses))
+
+    async def get_tickers(self, category, symbol=None):
+        return await self._call("getting tickers", 'GET', '/v5/market/tickers', dict(category=category, symbol=symbol))
+
+    async def get_last_prices(self, symbols):
+        symbols = set(symbols)
+        if not symbols:
+            return {}
+        tickers = await self.get_tickers(category=BYBIT_CATEGORY)
+        if not tickers or tickers['retCode'] != 0:
+            logger.error("Error getting last prices: %s", tickers['retMsg'] if tickers else 'No response')
+            return {}
+        return {
+            ticker['symbol']: float(ticker['lastPrice'])
+            for ticker in tickers['result']['list']
+            if ticker['symbol'] in symbols
+        }
+
+    async def get_current_price(self, symbol):
+        ticker = await self.get_tickers(category=BYBIT_CATEGORY, symbol=symbol)
+        if ticker and ticker['retCode'] == 0 and ticker['result']['list']:
+            return float(ticker['result']['list'][0]['lastPrice'])
+        logger.error("Error getting current price for %s: %s", symbol, ticker['retMsg'] if ticker else 'No response')
+        return None
+
+    async def get_current_prices(self, symbol1, symbol2):
+        return tuple(await asyncio.gather(self.get_current_price(symbol1), self.get_current_price(symbol2)))
+
+    async def get_instruments_info(self, category, symbol=None, cursor=None):
+        params = dict(category=category, symbol=symbol, cursor=cursor or None, limit=None if symbol else 1000)
+        return await self._call("getting instruments info", 'GET', '/v5/market/instruments-info', params)
+
+    async def get_funding_rate_history(self, category, symbol, startTime=None, endTime=None, limit=200):
+        params = dict(category=category, symbol=symbol, startTime=startTime, endTime=endTime, limit=limit)
+        return await self._call("getting funding rate history", 'GET', '/v5/market/funding/history', params)
+
+    async def get_quantity_precision(self, symbol):
+        info = await self.get_instruments_info(category=BYBIT_CATEGORY, symbol=symbol)
+        if info and info['retCode'] == 0:
+            for instrument in info['result']['list']:
+                if instrument['symbol'] == symbol:
+                    return instrument['lotSizeFilter']['qtyStep'].index('1') - 1
+        return 8  # Default to 8 decimal places if not found
+
+    async def get_orderbook(self, category, symbol, limit=50):
+        return await self._call("getting orderbook", 'GET', '/v5/market/orderbook', dict(category=category, symbol=symbol, limit=limit))
+
+    # Account and orders
+
+    async def get_wallet_balance(self, accountType):
+        return await self._call("getting wallet balance", 'GET', '/v5/account/wallet-balance', dict(accountType=accountType), signed=True)
+
+    async def get_positions(self, category, settleCoin):
+        return await self._call("getting positions", 'GET', '/v5/position/list', dict(category=category, settleCoin=settleCoin), signed=True)
+
+    async def place_order(self, symbol, side, order_type, qty, reduce_only=False):
+        params = dict(category=BYBIT_CATEGORY, symbol=symbol, side=side, orderType=order_type, qty=qty, reduceOnly=reduce_only)
+        return await self._call("placing order", 'POST', '/v5/order/create', params, signed=True)
+
+    async def cancel_order(self, category, symbol, order_id):
+        return await self._call("cancelling order", 'POST', '/v5/order/cancel', dict(category=category, symbol=symbol, orderId=order_id), signed=True)
+
+    async def cancel_all_orders(self, category, symbol):
+        return await self._call("cancelling orders", 'POST', '/v5/order/cancel-all', dict(category=category, symbol=symbol), signed=True)
+
+class SyncBybitAPIClient:
+    """Blocking facade over AsyncBybitAPIClient for the existing callers.
+
+    The async client lives on an event loop in a daemon thread; every method
+    call is submitted to that loop and waited on. Calls from several threads
+    (the order and candle thread pools) share the loop's connection pool.
+    """
+
+    def __init__(self, api_key, api_secret, testnet=TESTNET, **kwargs):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="bybit-async", daemon=True)
+        self.thread.start()
+        self.client = AsyncBybitAPIClient(api_key, api_secret, testnet=testnet, **kwargs)
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(ASYNC_HTTP_TIMEOUT * 3)
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def call(*args, **kwargs):
+            return self.run(attr(*args, **kwargs))
+        return call
+
+    def close(self):
+        self.run(self.client.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+# Benchmark against a local stand-in for the Bybit REST API
+
+def kline_rows(limit, end_ms=None):
+    end_ms = end_ms or int(time.time() // 60 * 60000)
+    return [[str(end_ms - i * 60000), "100", "101", "99", "100.5", "10", "1000"] for i in range(int(limit))]
+
+def create_stand_in_app(latency, api_secret=None):
+    from aiohttp import web
+
+    async def kline(request):
+        await asyncio.sleep(latency)
+        query = request.query
+        rows = kline_rows(query.get('limit', 200), int(query['end']) if 'end' in query else None)
+        return web.json_response({'retCode': 0, 'retMsg': 'OK', 'result': {'symbol': query.get('symbol'), 'list': rows}})
+
+    async def positions(request):
+        # Checks the signature the same way the exchange does
+        await asyncio.sleep(latency)
+        headers = request.headers
+        expected = sign(api_secret, headers.get('X-BAPI-TIMESTAMP'), headers.get('X-BAPI-API-KEY'),
+                        headers.get('X-BAPI-RECV-WINDOW'), request.query_string)
+        if headers.get('X-BAPI-SIGN') != expected:
+            return web.json_response({'retCode': 10004, 'retMsg': 'error sign!', 'result': {}})
+        return web.json_response({'retCode': 0, 'retMsg': 'OK', 'result': {'list': []}})
+
+    app = web.Application()
+    app.router.add_get('/v5/market/kline', kline)
+    app.router.add_get('/v5/position/list', positions)
+    return app
+
+def start_stand_in(latency, api_secret):
+    from aiohttp import web
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(create_stand_in_app(latency, api_secret))
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    loop.run_until_complete(site.start())
+    port = site._server.sockets[0].getsockname()[1]
+    threading.Thread(target=loop.run_forever, name="stand-in", daemon=True).start()
+    return f"http://127.0.0.1:{port}"
+
+def benchmark(requests=100, latency_ms=50):
+    from trading_api.bybit_api import BybitAPIClient
+    api_key, api_secret = "bench-key", "bench-secret"
+    base_url = start_stand_in(latency_ms / 1000, api_secret)
+    symbols = [f"SYM{i}USDT" for i in range(requests)]
+    print(f"{requests} kline fetches, {latency_ms} ms simulated exchange latency ({base_url})")
+
+    sync = BybitAPIClient(api_key, api_secret)
+    sync.session.endpoint = base_url
+    start = time.perf_counter()
+    for symbol in symbols:
+        assert sync.get_kline_data(symbol, "1", 200)['retCode'] == 0
+    sequential = time.perf_counter() - start
+    print(f"  sequential pybit: {sequential:.2f} s")
+
+    adapter = SyncBybitAPIClient(api_key, api_secret, base_url=base_url)
+    assert adapter.get_positions(category=BYBIT_CATEGORY, settleCoin=BYBIT_SETTLE_COIN)['retCode'] == 0, "signature rejected"
+    adapter.get_kline_data(symbols[0], "1", 200)  # Open the pool
+    start = time.perf_counter()
+    responses = adapter.get_kline_data_many(symbols, "1", 200)
+    pipelined = time.perf_counter() - start
+    assert all(response['retCode'] == 0 for response in responses.values())
+    limit = ASYNC_ENDPOINT_LIMITS.get('/v5/market/kline', ASYNC_ENDPOINT_DEFAULT_LIMIT)
+    print(f"  async gather (kline cap {limit}): {pipelined:.2f} s ({sequential / pipelined:.1f}x faster)")
+    adapter.close()
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Pipelined async client vs sequential pybit against a local stand-in server")
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    args = parser.parse_args()
+    benchmark(args.requests, args.latency_ms)
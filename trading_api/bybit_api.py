@@ -13,38 +13,52 @@ class BybitAPIClient:
             api_secret=api_secret
         )
 
-    def get_kline_data(self, symbol, interval, limit):
+    def get_kline_data(self, symbol, interval, limit, end=None):
+        # end (ms, inclusive) pages back through history; None means up to now
         try:
-            response = self.session.get_kline(
-                category=BYBIT_CATEGORY,
-                symbol=symbol,
-                interval=interval,
-                limit=limit
-            )
+            params = dict(category=BYBIT_CATEGORY, symbol=symbol, interval=interval, limit=limit)
+            if end is not None:
+                params['end'] = int(end)
+            response = self.session.get_kline(**params)
             return response
         except Exception as e:
-            logger.error(f"Error getting kline data: {e}")
+            logger.error("Error getting kline data: %s", e)
             return None
 
-    def get_tickers(self, category, symbol):
+    def get_tickers(self, category, symbol=None):
         try:
             return self.session.get_tickers(category=category, symbol=symbol)
         except Exception as e:
-            logger.error(f"Error getting tickers: {e}")
+            logger.error("Error getting tickers: %s", e)
             return None
 
+    def get_last_prices(self, symbols):
+        # One bulk ticker call for the whole category instead of one call per symbol
+        symbols = set(symbols)
+        if not symbols:
+            return {}
+        tickers = self.get_tickers(category=BYBIT_CATEGORY)
+        if not tickers or tickers['retCode'] != 0:
+            logger.error("Error getting last prices: %s", tickers['retMsg'] if tickers else 'No response')
+            return {}
+        return {
+            ticker['symbol']: float(ticker['lastPrice'])
+            for ticker in tickers['result']['list']
+            if ticker['symbol'] in symbols
+        }
+
     def get_wallet_balance(self, accountType):
         try:
             return self.session.get_wallet_balance(accountType=accountType)
         except Exception as e:
-            logger.error(f"Error getting wallet balance: {e}")
+            logger.error("Error getting wallet balance: %s", e)
             return None
 
     def get_positions(self, category, settleCoin):
         try:
             return self.session.get_positions(category=category, settleCoin=settleCoin)
         except Exception as e:
-            logger.error(f"Error getting positions: {e}")
+            logger.error("Error getting positions: %s", e)
             return None
 
     def place_order(self, symbol, side, order_type, qty, reduce_only=False):
@@ -58,14 +72,35 @@ class BybitAPIClient:
                 reduceOnly=reduce_only
             )
         except Exception as e:
-            logger.error(f"Error placing order: {e}")
+            logger.error("Error placing order: %s", e)
+            return None
+
+    def get_instruments_info(self, category, symbol=None, cursor=None):
+        # Without a symbol Bybit returns the whole category, paged by nextPageCursor
+        params = {'category': category}
+        if symbol is not None:
+            params['symbol'] = symbol
+        else:
+            params['limit'] = 1000
+        if cursor:
+            params['cursor'] = cursor
+        try:
+            return self.session.get_instruments_info(**params)
+        except Exception as e:
+            logger.error("Error getting instruments info: %s", e)
             return None
 
-    def get_instruments_info(self, category, symbol):
+    def get_funding_rate_history(self, category, symbol, startTime=None, endTime=None, limit=200):
+        # Newest first; Bybit wants endTime whenever startTime is given
+        params = {'category': category, 'symbol': symbol, 'limit': limit}
+        if startTime is not None:
+            params['startTime'] = int(startTime)
+        if endTime is not None:
+            params['endTime'] = int(endTime)
         try:
-            return self.session.get_instruments_info(category=category, symbol=symbol)
+            return self.session.get_funding_rate_history(**params)
         except Exception as e:
-            logger.error(f"Error getting instruments info: {e}")
+            logger.error("Error getting funding rate history: %s", e)
             return None
 
     def get_current_prices(self, symbol1, symbol2):
@@ -79,10 +114,10 @@ class BybitAPIClient:
             if ticker['retCode'] == 0:
                 return float(ticker['result']['list'][0]['lastPrice'])
             else:
-                logger.error(f"Error getting current price for {symbol}: {ticker['retMsg']}")
+                logger.error("Error getting current price for %s: %s", symbol, ticker['retMsg'])
                 return None
         except Exception as e:
-            logger.error(f"Error getting current price for {symbol}: {e}")
+            logger.error("Error getting current price for %s: %s", symbol, e)
             return None
         
     def get_quantity_precision(self, symbol):
@@ -97,5 +132,5 @@ class BybitAPIClient:
                         return instrument['lotSizeFilter']['qtyStep'].index('1') - 1
             return 8  # Default to 8 decimal places if not found
         except Exception as e:
-            logger.error(f"Error getting quantity precision for {symbol}: {e}")
+            logger.error("Error getting quantity precision for %s: %s", symbol, e)
             return 8  # Default to 8 decimal places on error
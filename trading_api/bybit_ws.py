@@ -0,0 +1,131 @@
+from pybit.unified_trading import WebSocket
+import logging
+from config.config import *
+
+logger = logging.getLogger(__name__)
+
+class BybitPrivateStream:
+    """Authenticated private stream feeding position, execution, order and
+    wallet pushes into an AccountState."""
+
+    def __init__(self, api_key, api_secret, account_state, testnet=TESTNET):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.account_state = account_state
+        self.testnet = testnet
+        self.ws = None
+
+    def start(self):
+        try:
+            self.ws = WebSocket(
+                testnet=self.testnet,
+                channel_type="private",
+                api_key=self.api_key,
+                api_secret=self.api_secret
+            )
+            self.ws.position_stream(callback=self.handle_position)
+            self.ws.execution_stream(callback=self.handle_execution)
+            self.ws.order_stream(callback=self.handle_order)
+            self.ws.wallet_stream(callback=self.handle_wallet)
+            return True
+        except Exception as e:
+            logger.error("Error starting private stream: %s", e)
+            self.ws = None
+            return False
+
+    def stop(self):
+        if self.ws is not None:
+            try:
+                self.ws.exit()
+            except Exception as e:
+                logger.error("Error stopping private stream: %s", e)
+            self.ws = None
+
+    def is_connected(self):
+        try:
+            return self.ws is not None and self.ws.is_connected()
+        except Exception:
+            return False
+
+    def handle_position(self, message):
+        try:
+            positions = [p for p in message.get('data', []) if p.get('category', BYBIT_CATEGORY) == BYBIT_CATEGORY]
+            self.account_state.apply_positions(positions)
+        except Exception as e:
+            logger.error("Error handling position push: %s", e)
+
+    def handle_execution(self, message):
+        try:
+            self.account_state.apply_executions(message.get('data', []))
+        except Exception as e:
+            logger.error("Error handling execution push: %s", e)
+
+    def handle_order(self, message):
+        try:
+            self.account_state.apply_orders(message.get('data', []))
+        except Exception as e:
+            logger.error("Error handling order push: %s", e)
+
+    def handle_wallet(self, message):
+        try:
+            self.account_state.apply_wallet(message.get('data', []))
+        except Exception as e:
+            logger.error("Error handling wallet push: %s", e)
+
+class BybitPublicStream:
+    """Public ticker stream for BYBIT_CATEGORY feeding a LivePrices book.
+
+    Symbols are subscribed as they are first needed and stay subscribed;
+    the set is bounded by the symbols charted or held in one session.
+    """
+
+    def __init__(self, live_prices, testnet=TESTNET):
+        self.live_prices = live_prices
+        self.testnet = testnet
+        self.subscribed = set()
+        self.ws = None
+
+    def start(self):
+        try:
+            self.ws = WebSocket(testnet=self.testnet, channel_type=BYBIT_CATEGORY)
+            return True
+        except Exception as e:
+            logger.error("Error starting public stream: %s", e)
+            self.ws = None
+            return False
+
+    def subscribe(self, symbols):
+        new = sorted(set(symbols) - self.subscribed)
+        if self.ws is None or not new:
+            return
+        try:
+            self.ws.ticker_stream(symbol=new, callback=self.handle_ticker)
+            self.subscribed.update(new)
+        except Exception as e:
+            logger.error("Error subscribing to tickers %s: %s", new, e)
+
+    def stop(self):
+        if self.ws is not None:
+            try:
+                self.ws.exit()
+            except Exception as e:
+                logger.error("Error stopping public stream: %s", e)
+            self.ws = None
+
+    def is_connected(self):
+        try:
+            return self.ws is not None and self.ws.is_connected()
+        except Exception:
+            return False
+
+    def handle_ticker(self, message):
+        # Snapshots and deltas alike; a delta without lastPrice only shows the stream is alive
+        try:
+            data = message.get('data', {})
+            price = data.get('lastPrice')
+            if price:
+                self.live_prices.update(data['symbol'], float(price), int(message.get('ts') or 0))
+            elif 'symbol' in data:
+                self.live_prices.touch(data['symbol'], int(message.get('ts') or 0))
+        except Exception as e:
+            logger.error("Error handling ticker push: %s", e)
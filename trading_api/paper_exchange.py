@@ -0,0 +1,516 @@
+import csv
+import math
+import time
+import uuid
+import threading
+import logging
+from collections import deque
+import numpy as np
+from config.config import *
+
+logger = logging.getLogger(__name__)
+
+MINUTE_MS = 60000
+FUNDING_EPOCH_MINUTES = 480
+
+KLINE_INTERVAL_MINUTES = {
+    "1": 1, "3": 3, "5": 5, "15": 15, "30": 30, "60": 60, "120": 120,
+    "240": 240, "360": 360, "720": 720, "D": 1440, "W": 10080,
+}
+
+DEFAULT_PAPER_SYMBOLS = {
+    "BTCUSDT": 60000.0, "ETHUSDT": 3000.0, "SOLUSDT": 150.0, "BNBUSDT": 550.0,
+    "XRPUSDT": 0.5, "DOGEUSDT": 0.12, "AVAXUSDT": 30.0, "LINKUSDT": 14.0,
+    "POPCATUSDT": 1.2, "WIFUSDT": 2.0,
+}
+
+def ok(result, now_ms=None):
+    return {'retCode': 0, 'retMsg': 'OK', 'result': result, 'time': int(now_ms or time.time() * 1000)}
+
+def error(code, message):
+    return {'retCode': code, 'retMsg': message, 'result': {}, 'time': int(time.time() * 1000)}
+
+class SyntheticPriceFeed:
+    """Correlated geometric Brownian motion over a symbol set, one row of
+    closes per simulated minute, generated in vectorized batches."""
+
+    def __init__(self, prices, annual_volatility=0.8, correlation=0.6, seed=None):
+        self.symbols = list(prices)
+        self.last = np.array([prices[symbol] for symbol in self.symbols], dtype=float)
+        self.rng = np.random.default_rng(seed)
+        n = len(self.symbols)
+        cov = np.full((n, n), correlation) + np.eye(n) * (1 - correlation)
+        self.cholesky = np.linalg.cholesky(cov)
+        self.minute_sigma = annual_volatility / math.sqrt(365 * 24 * 60)
+
+    def next_closes(self, minutes):
+        shocks = self.rng.standard_normal((minutes, len(self.symbols))) @ self.cholesky.T
+        log_returns = shocks * self.minute_sigma - 0.5 * self.minute_sigma ** 2
+        closes = self.last * np.exp(np.cumsum(log_returns, axis=0))
+        self.last = closes[-1]
+        return closes
+
+class RecordedPriceFeed:
+    """Replays minute closes from a CSV with timestamp,symbol,price rows,
+    forward-filling gaps and looping when the recording runs out."""
+
+    def __init__(self, path):
+        rows = {}
+        symbols = []
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                minute = int(float(row['timestamp'])) // MINUTE_MS
+                if row['symbol'] not in symbols:
+                    symbols.append(row['symbol'])
+                rows.setdefault(minute, {})[row['symbol']] = float(row['price'])
+        self.symbols = symbols
+        minutes = sorted(rows)
+        closes = np.full((minutes[-1] - minutes[0] + 1, len(symbols)), np.nan)
+        for minute in minutes:
+            for symbol, price in rows[minute].items():
+                closes[minute - minutes[0], symbols.index(symbol)] = price
+        # Forward-fill each column, then back-fill any leading gap
+        for column in range(len(symbols)):
+            values = closes[:, column]
+            valid = ~np.isnan(values)
+            index = np.where(valid, np.arange(len(values)), 0)
+            np.maximum.accumulate(index, out=index)
+            values[:] = values[index]
+            values[np.isnan(values)] = values[valid][0]
+        self.closes = closes
+        self.position = 0
+        self.last = closes[0]
+
+    def next_closes(self, minutes):
+        index = (self.position + np.arange(minutes)) % len(self.closes)
+        self.position = (self.position + minutes) % len(self.closes)
+        closes = self.closes[index]
+        self.last = closes[-1]
+        return closes
+
+class PaperExchangeClient:
+    """In-process simulated exchange with the BybitAPIClient method surface.
+
+    Prices come from a synthetic or recorded minute feed kept in a bounded
+    ring buffer. Market orders fill against a simulated book (spread plus
+    depth levels, so size moves the fill price), pay taker fees, and
+    positions pay or receive funding every 8 simulated hours. The clock is
+    advanced explicitly with `advance()` or by `start()` at any speed, so
+    long sessions can be fast-forwarded.
+    """
+
+    def __init__(self, feed=None, starting_balance=PAPER_STARTING_BALANCE, history_minutes=PAPER_HISTORY_MINUTES,
+                 taker_fee=PAPER_TAKER_FEE, seed=None):
+        self.feed = feed or SyntheticPriceFeed(DEFAULT_PAPER_SYMBOLS, seed=seed)
+        self.symbols = list(self.feed.symbols)
+        self.symbol_index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.taker_fee = taker_fee
+        self.lock = threading.RLock()
+
+        n = len(self.symbols)
+        self.capacity = history_minutes
+        self.closes = np.zeros((history_minutes, n))
+        self.highs = np.zeros((history_minutes, n))
+        self.lows = np.zeros((history_minutes, n))
+        self.volumes = np.zeros((history_minutes, n))
+        self.count = 0  # Minutes written so far; the ring holds the last `capacity`
+        self.rng = np.random.default_rng(seed)
+
+        self.start_minute = int(time.time() // 60) - history_minutes
+        self.balance = float(starting_balance)
+        self.fees_paid = 0.0
+        self.funding_paid = 0.0
+        self.sizes = np.zeros(n)  # Signed position size per symbol
+        self.avg_prices = np.zeros(n)
+        self.funding_rates = np.full(n, 0.0001)
+        self.funding_history = deque(maxlen=PAPER_FUNDING_HISTORY)
+        self.orders = deque(maxlen=1000)
+
+        self._thread = None
+        self._running = False
+        self.minutes_per_second = PAPER_MINUTES_PER_SECOND
+
+        # Pre-fill history so charts have data immediately
+        self.advance(history_minutes)
+
+    # Simulation clock
+
+    @property
+    def now_minute(self):
+        return self.start_minute + self.count - 1
+
+    def advance(self, minutes):
+        minutes = int(minutes)
+        if minutes <= 0:
+            return
+        with self.lock:
+            previous = self.last_prices() if self.count else self.feed.last
+            closes = self.feed.next_closes(minutes)
+            opens = np.vstack([previous, closes[:-1]])
+            wick = np.abs(self.rng.standard_normal(closes.shape)) * closes * 0.0003
+            highs = np.maximum(opens, closes) + wick
+            lows = np.maximum(np.minimum(opens, closes) - wick, 1e-12)
+            volumes = self.rng.gamma(2.0, 50.0, closes.shape) / closes * 1000
+
+            first_minute = self.start_minute + self.count
+            self._write(closes, highs, lows, volumes)
+            self._apply_funding(first_minute, minutes)
+
+    def _write(self, closes, highs, lows, volumes):
+        minutes = len(closes)
+        if minutes > self.capacity:
+            closes, highs, lows, volumes = closes[-self.capacity:], highs[-self.capacity:], lows[-self.capacity:], volumes[-self.capacity:]
+            self.count += minutes - self.capacity
+            minutes = self.capacity
+        rows = (self.count + np.arange(minutes)) % self.capacity
+        self.closes[rows] = closes
+        self.highs[rows] = highs
+        self.lows[rows] = lows
+        self.volumes[rows] = volumes
+        self.count += minutes
+
+    def _apply_funding(self, first_minute, minutes):
+        # Every 8-hour boundary crossed settles funding at that minute's close
+        last_minute = first_minute + minutes - 1
+        epoch = (first_minute + FUNDING_EPOCH_MINUTES - 1) // FUNDING_EPOCH_MINUTES * FUNDING_EPOCH_MINUTES
+        while epoch <= last_minute:
+            prices = self._closes_at(epoch)
+            # Longs pay positive funding, shorts receive it
+            payments = self.sizes * prices * self.funding_rates
+            self.balance -= payments.sum()
+            self.funding_paid += payments.sum()
+            for i, symbol in enumerate(self.symbols):
+                self.funding_history.append((epoch * MINUTE_MS, symbol, float(self.funding_rates[i])))
+            self.funding_rates = np.clip(self.funding_rates + self.rng.normal(0, 0.00005, len(self.symbols)), -0.0075, 0.0075)
+            epoch += FUNDING_EPOCH_MINUTES
+
+    def _closes_at(self, minute):
+        offset = self.now_minute - minute
+        if offset < 0 or offset >= min(self.count, self.capacity):
+            return self.last_prices()
+        return self.closes[(self.count - 1 - offset) % self.capacity]
+
+    def last_prices(self):
+        return self.closes[(self.count - 1) % self.capacity]
+
+    def start(self, minutes_per_second=None):
+        if minutes_per_second is not None:
+            self.minutes_per_second = minutes_per_second
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="paper-exchange", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _run(self):
+        pending = 0.0
+        last = time.monotonic()
+        while self._running:
+            time.sleep(0.05)
+            now = time.monotonic()
+            pending += (now - last) * self.minutes_per_second
+            last = now
+            if pending >= 1:
+                self.advance(int(pending))
+                pending -= int(pending)
+
+    # Simulated book
+
+    def _fill_price(self, index, side, qty):
+        mid = self.last_prices()[index]
+        half_spread = mid * PAPER_SPREAD_BPS / 20000
+        level_size = PAPER_BOOK_DEPTH_USD / mid
+        levels = np.arange(PAPER_BOOK_LEVELS)
+        direction = 1 if side == 'Buy' else -1
+        level_prices = mid + direction * (half_spread + levels * mid * PAPER_LEVEL_STEP_BPS / 10000)
+        # Walk the book: full levels first, then the remainder on the next level (or the last one)
+        full_levels = min(int(qty // level_size), PAPER_BOOK_LEVELS - 1)
+        remainder = qty - full_levels * level_size
+        cost = level_prices[:full_levels].sum() * level_size + remainder * level_prices[full_levels]
+        return cost / qty
+
+    # BybitAPIClient surface
+
+    def get_kline_data(self, symbol, interval, limit, end=None):
+        index = self.symbol_index.get(symbol)
+        if index is None:
+            return error(10001, f"params error: symbol invalid: {symbol}")
+        interval_minutes = KLINE_INTERVAL_MINUTES.get(str(interval))
+        if interval_minutes is None:
+            return error(10001, f"params error: invalid interval: {interval}")
+        with self.lock:
+            now_minute = self.now_minute
+            if end is not None:
+                # Page back: drop the minutes after `end`
+                skipped = max(0, now_minute - int(end) // MINUTE_MS)
+                now_minute -= skipped
+            else:
+                skipped = 0
+            available = max(0, min(self.count, self.capacity) - skipped)
+            if not available:
+                return ok({'category': BYBIT_CATEGORY, 'symbol': symbol, 'list': []})
+            # Cover `limit` buckets aligned to the interval, ending at the current minute
+            first_bucket = (now_minute // interval_minutes - int(limit) + 1) * interval_minutes
+            minutes = min(now_minute - first_bucket + 1, available)
+            rows = (self.count - skipped - minutes + np.arange(minutes)) % self.capacity
+            closes = self.closes[rows, index]
+            highs = self.highs[rows, index]
+            lows = self.lows[rows, index]
+            volumes = self.volumes[rows, index]
+            previous = self.closes[(rows[0] - 1) % self.capacity, index] if available > minutes else closes[0]
+        minute_ids = now_minute - minutes + 1 + np.arange(minutes)
+        opens = np.concatenate([[previous], closes[:-1]])
+        buckets = minute_ids // interval_minutes
+        starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+        ends = np.append(starts[1:], minutes) - 1
+        kline = np.column_stack([
+            buckets[starts] * interval_minutes * MINUTE_MS,
+            opens[starts],
+            np.maximum.reduceat(highs, starts),
+            np.minimum.reduceat(lows, starts),
+            closes[ends],
+            np.add.reduceat(volumes, starts),
+            np.add.reduceat(volumes * closes, starts),
+        ])[::-1]
+        return ok({
+            'category': BYBIT_CATEGORY,
+            'symbol': symbol,
+            'list': [[str(int(row[0]))] + [f"{value:.10g}" for value in row[1:]] for row in kline],
+        })
+
+    def _ticker(self, index, prices, day_ago):
+        symbol = self.symbols[index]
+        price = prices[index]
+        half_spread = price * PAPER_SPREAD_BPS / 20000
+        next_funding = (self.now_minute // FUNDING_EPOCH_MINUTES + 1) * FUNDING_EPOCH_MINUTES * MINUTE_MS
+        return {
+            'symbol': symbol,
+            'lastPrice': f"{price:.10g}",
+            'markPrice': f"{price:.10g}",
+            'indexPrice': f"{price:.10g}",
+            'bid1Price': f"{price - half_spread:.10g}",
+            'ask1Price': f"{price + half_spread:.10g}",
+            'price24hPcnt': f"{price / day_ago[index] - 1:.6f}",
+            'fundingRate': f"{self.funding_rates[index]:.8f}",
+            'nextFundingTime': str(next_funding),
+        }
+
+    def get_tickers(self, category, symbol=None):
+        with self.lock:
+            prices = self.last_prices().copy()
+            day_ago = self._closes_at(self.now_minute - 1440)
+            if symbol is not None:
+                index = self.symbol_index.get(symbol)
+                if index is None:
+                    return error(10001, f"params error: symbol invalid: {symbol}")
+                return ok({'category': category, 'list': [self._ticker(index, prices, day_ago)]}, self.now_minute * MINUTE_MS)
+            # Stamped with the simulated clock, which funding settlements follow
+            return ok({'category': category, 'list': [self._ticker(i, prices, day_ago) for i in range(len(self.symbols))]},
+                      self.now_minute * MINUTE_MS)
+
+    def get_last_prices(self, symbols):
+        with self.lock:
+            prices = self.last_prices()
+            return {symbol: float(prices[self.symbol_index[symbol]]) for symbol in symbols if symbol in self.symbol_index}
+
+    def get_current_prices(self, symbol1, symbol2):
+        return self.get_current_price(symbol1), self.get_current_price(symbol2)
+
+    def get_current_price(self, symbol):
+        return self.get_last_prices([symbol]).get(symbol)
+
+    def unrealised_pnl(self):
+        return self.sizes * (self.last_prices() - self.avg_prices)
+
+    def get_wallet_balance(self, accountType):
+        with self.lock:
+            upnl = self.unrealised_pnl().sum()
+            return ok({'list': [{
+                'accountType': accountType,
+                'totalEquity': f"{self.balance + upnl:.8f}",
+                'totalWalletBalance': f"{self.balance:.8f}",
+                'totalPerpUPL': f"{upnl:.8f}",
+            }]})
+
+    def get_positions(self, category, settleCoin):
+        with self.lock:
+            prices = self.last_prices()
+            upnl = self.unrealised_pnl()
+            positions = [{
+                'symbol': self.symbols[i],
+                'side': 'Buy' if self.sizes[i] > 0 else 'Sell',
+                'size': f"{abs(self.sizes[i]):.10g}",
+                'avgPrice': f"{self.avg_prices[i]:.10g}",
+                'markPrice': f"{prices[i]:.10g}",
+                'positionValue': f"{abs(self.sizes[i]) * self.avg_prices[i]:.8f}",
+                'unrealisedPnl': f"{upnl[i]:.8f}",
+                'positionIdx': 0,
+                'category': category,
+            } for i in np.flatnonzero(self.sizes)]
+            return ok({'category': category, 'list': positions})
+
+    def place_order(self, symbol, side, order_type, qty, reduce_only=False):
+        index = self.symbol_index.get(symbol)
+        if index is None:
+            return error(10001, f"params error: symbol invalid: {symbol}")
+        if order_type != "Market":
+            return error(10001, "paper exchange only supports market orders")
+        qty = float(qty)
+        if qty <= 0:
+            return error(10001, "params error: qty must be positive")
+        with self.lock:
+            size = self.sizes[index]
+            direction = 1 if side == 'Buy' else -1
+            if reduce_only:
+                if size == 0 or np.sign(size) == direction:
+                    return error(110017, "current position is zero, cannot fix reduce-only order qty")
+                qty = min(qty, abs(size))
+
+            price = self._fill_price(index, side, qty)
+            fee = qty * price * self.taker_fee
+            if not reduce_only and fee + qty * price / PAPER_LEVERAGE > self.balance + self.unrealised_pnl().sum():
+                return error(110007, "ab not enough for new order")
+
+            signed_qty = direction * qty
+            if size == 0 or np.sign(size) == direction:
+                self.avg_prices[index] = (self.avg_prices[index] * abs(size) + price * qty) / (abs(size) + qty)
+            else:
+                closed = min(qty, abs(size))
+                self.balance += closed * (price - self.avg_prices[index]) * np.sign(size)
+                if qty > abs(size):
+                    self.avg_prices[index] = price
+            self.sizes[index] = size + signed_qty
+            if abs(self.sizes[index]) < 1e-12:
+                self.sizes[index] = 0.0
+                self.avg_prices[index] = 0.0
+            self.balance -= fee
+            self.fees_paid += fee
+
+            order_id = str(uuid.uuid4())
+            self.orders.append({'orderId': order_id, 'symbol': symbol, 'side': side, 'qty': qty, 'avgPrice': price,
+                                'fee': fee, 'time': self.now_minute * MINUTE_MS})
+            return ok({'orderId': order_id, 'orderLinkId': ''})
+
+    def _instrument(self, index):
+        price = self.last_prices()[index]
+        # Roughly $10-$100 per step, never coarser than one contract
+        qty_step = 10.0 ** min(0, 1 - math.floor(math.log10(price)))
+        qty_step_text = f"{qty_step:.10f}".rstrip('0').rstrip('.') if qty_step < 1 else "1"
+        return {
+            'symbol': self.symbols[index],
+            'contractType': 'LinearPerpetual',
+            'status': 'Trading',
+            'baseCoin': self.symbols[index][:-4],
+            'quoteCoin': 'USDT',
+            'settleCoin': 'USDT',
+            'lotSizeFilter': {
+                'qtyStep': qty_step_text,
+                'minOrderQty': qty_step_text,
+                'maxOrderQty': "1000000",
+                'minNotionalValue': "5",
+            },
+            'priceFilter': {'tickSize': f"{10.0 ** (math.floor(math.log10(price)) - 4):.10f}".rstrip('0')},
+        }
+
+    def get_instruments_info(self, category, symbol=None, cursor=None):
+        with self.lock:
+            if symbol is not None:
+                index = self.symbol_index.get(symbol)
+                instruments = [] if index is None else [self._instrument(index)]
+            else:
+                instruments = [self._instrument(i) for i in range(len(self.symbols))]
+        return ok({'category': category, 'list': instruments, 'nextPageCursor': ''})
+
+    def get_funding_rate_history(self, category, symbol, startTime=None, endTime=None, limit=200):
+        with self.lock:
+            if symbol not in self.symbol_index:
+                return error(10001, f"params error: symbol invalid: {symbol}")
+            start = startTime or 0
+            end = endTime if endTime is not None else math.inf
+            rows = [(timestamp, rate) for timestamp, row_symbol, rate in self.funding_history
+                    if row_symbol == symbol and start <= timestamp <= end]
+        # Newest first, like Bybit
+        return ok({'category': category, 'list': [
+            {'symbol': symbol, 'fundingRate': f"{rate:.8f}", 'fundingRateTimestamp': str(timestamp)}
+            for timestamp, rate in reversed(rows[-limit:])
+        ]})
+
+    def get_quantity_precision(self, symbol):
+        info = self.get_instruments_info(BYBIT_CATEGORY, symbol)
+        for instrument in info['result']['list']:
+            step = instrument['lotSizeFilter']['qtyStep']
+            return len(step.split('.')[1]) if '.' in step else 0
+        return 8
+
+class PaperTickerStream:
+    """Stand-in for BybitPublicStream over a PaperExchangeClient.
+
+    Publishes the simulated last price of each subscribed symbol into a
+    LivePrices book whenever it changed, stamped with the simulated minute
+    it belongs to.
+    """
+
+    def __init__(self, exchange, live_prices, interval_ms=PAPER_TICK_INTERVAL_MS):
+        self.exchange = exchange
+        self.live_prices = live_prices
+        self.interval = interval_ms / 1000
+        self.subscribed = set()
+        self.last_sent = {}
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="paper-tickers", daemon=True)
+        self._thread.start()
+        return True
+
+    def subscribe(self, symbols):
+        self.subscribed |= set(symbols) & set(self.exchange.symbol_index)
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def is_connected(self):
+        return self._running
+
+    def _run(self):
+        while self._running:
+            time.sleep(self.interval)
+            with self.exchange.lock:
+                prices = self.exchange.last_prices().copy()
+                ts = self.exchange.now_minute * MINUTE_MS
+            for symbol in list(self.subscribed):
+                price = float(prices[self.exchange.symbol_index[symbol]])
+                if self.last_sent.get(symbol) != (price, ts):
+                    self.last_sent[symbol] = (price, ts)
+                    self.live_prices.update(symbol, price, ts)
+                else:
+                    self.live_prices.touch(symbol, ts)
+
+# Fast-forward benchmark
+if __name__ == "__main__":
+    exchange = PaperExchangeClient(seed=1)
+    minutes = 500000
+    start = time.perf_counter()
+    for _ in range(minutes // 1000):
+        exchange.advance(1000)
+    elapsed = time.perf_counter() - start
+    print(f"Simulated {minutes:,} minutes in {elapsed:.2f}s ({minutes / elapsed:,.0f} sim minutes/s)")
+
+    exchange.place_order("BTCUSDT", "Sell", "Market", 0.05)
+    exchange.place_order("ETHUSDT", "Buy", "Market", 1)
+    exchange.advance(FUNDING_EPOCH_MINUTES * 3)
+    print(exchange.get_positions(BYBIT_CATEGORY, BYBIT_SETTLE_COIN)['result']['list'])
+    print(exchange.get_wallet_balance(BYBIT_ACCOUNT_TYPE)['result']['list'][0])
+    print(f"Fees paid: {exchange.fees_paid:.4f}, funding paid: {exchange.funding_paid:.4f}")
+    print(exchange.get_kline_data("BTCUSDT", "60", 3)['result']['list'])